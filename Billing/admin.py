@@ -135,15 +135,12 @@ class TemplatesAdmin(admin.ModelAdmin):
     )
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related(
-            'allowed_plans',
-            'user_cards'
-        ).annotate(
+        return super().get_queryset(request).annotate(
             usage_count=Count('user_cards')
         )
 
     def get_allowed_plans_display(self, obj):
-        """Display allowed plans."""
+        """Display allowed plans from the template catalog."""
         plan_values = obj.get_allowed_plan_values()
         if 'all' in plan_values:
             return "همه پلن‌ها"
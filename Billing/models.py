@@ -221,11 +221,9 @@ class Template(models.Model):
         Returns:
             bool: True if template is allowed for the plan
         """
+        plan_values = self.get_allowed_plan_values()
         # If no plans specified, template is available to all
-        if not self.allowed_plans.exists():
-            return True
-
-        return self.allowed_plans.filter(value=plan_value).exists()
+        return 'all' in plan_values or plan_value in plan_values
 
     def get_allowed_plan_values(self):
         """
@@ -234,10 +232,17 @@ class Template(models.Model):
         Returns:
             list: List of allowed plan values
         """
-        if not self.allowed_plans.exists():
-            return ['all']
+        # Read from the cached catalog; it is rebuilt whenever templates or
+        # their allowed plans change.
+        from core.services.template_catalog import get_template_catalog
+
+        entry = get_template_catalog().get(self.pk) if self.pk else None
+        if entry is None:
+            plan_values = list(self.allowed_plans.values_list('value', flat=True)) if self.pk else []
+        else:
+            plan_values = list(entry.allowed_plan_values)
 
-        return list(self.allowed_plans.values_list('value', flat=True))
+        return plan_values or ['all']
 
     def __str__(self):
         """
@@ -1,3 +1,5 @@
+import gzip
+
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.core.cache import cache
@@ -100,3 +102,63 @@ class BillingViewsTestCase(XLinkTestCase):
         self.assertTemplateUsed(response, 'Billing/landing.html')
         self.assertIn('plans', response.context)
         self.assertIn('customers', response.context)
+
+    def test_landing_view_budget(self):
+        """Test the landing page stays in budget and skips queries once cached"""
+        self.assert_within_query_budget(self.client.get(reverse('home')))
+
+        metrics = self.assert_within_query_budget(self.client.get(reverse('home')))
+        self.assertEqual(metrics.queries, 0)
+
+    def test_landing_cache_invalidated_on_plan_change(self):
+        """Test saving a plan evicts the cached landing data"""
+        self.client.get(reverse('home'))
+        self.monthly_plan.name = "Renamed Monthly"
+        self.monthly_plan.save()
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, "Renamed Monthly")
+
+    def test_landing_cache_invalidated_on_customer_delete(self):
+        """Test deleting a customer evicts the cached landing data"""
+        self.client.get(reverse('home'))
+        self.customer.delete()
+
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['customers'], [])
+
+    def test_anonymous_landing_page_served_from_stored_variants(self):
+        """Test anonymous visitors get the rendered, compressed landing page from cache"""
+        first = self.client.get(reverse('home'))
+
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('home'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertIsNone(second.context)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(second.content), first.content)
+
+    def test_landing_page_cached_only_for_canonical_urls(self):
+        """Test unknown query strings are rendered without storing a page"""
+        self.client.get(reverse('home'), {'period': 'annual'})
+        self.client.get(reverse('home'), {'x': 'random'})
+
+        response = self.client.get(reverse('home'), {'period': 'annual'})
+        self.assertIsNone(response.context)
+        response = self.client.get(reverse('home'), {'x': 'random'})
+        self.assertTemplateUsed(response, 'Billing/landing.html')
+
+    def test_landing_page_not_shared_with_logged_in_users(self):
+        """Test a logged-in user's landing page is rendered for them"""
+        self.client.get(reverse('home'))
+        user = self.create_test_user()
+        self.login_user(user)
+
+        response = self.client.get(reverse('home'))
+        self.assertTemplateUsed(response, 'Billing/landing.html')
+
+    def test_landing_cache_hit_skips_queries(self):
+        """Test unchanged landing data is served from cache"""
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('home'))
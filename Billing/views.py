@@ -1,9 +1,16 @@
+import secrets
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
 from django.shortcuts import render
 from django.contrib import messages
 from site_management.models import Customer
 from django.views.decorators.cache import cache_page
+from core.services.cache_keys import landing_data_key, landing_page_key
+from core.services.compression import compress_variants, variant_response
+from core.services.conditional import release_token
+from core.services.request_metrics import query_budget, record_cache_lookup
 from .models import Plan, Template
 
 BASE_SEO_KEYWORDS = [
@@ -56,6 +63,7 @@ def build_landing_seo_data(templates):
     }
 
 
+@query_budget(6)
 def landing_view(request):
     """
     Landing page displaying plans, templates, and customers.
@@ -68,8 +76,8 @@ def landing_view(request):
     ):
         period = Plan.Period.MONTHLY
 
-    cache_key = f"landing_data_{period}"
-    data = cache.get(cache_key)
+    cache_key = landing_data_key(period)
+    data = record_cache_lookup(cache.get(cache_key))
 
     if data is None:
         plans = list(
@@ -85,23 +93,46 @@ def landing_view(request):
             "plans": plans,
             "templates": templates,
             "customers": customers,
+            "version": secrets.token_hex(4),
         }
-        cache.set(cache_key, data, 60 * 60) # Cache for 1 hour
+        cache.set(cache_key, data, settings.LANDING_PAGE_CACHE_TIMEOUT)
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return render(request, 'Billing/partials/pricing_cards.html', {'plans': data['plans'], "current_period": period})
 
+    # Anonymous visitors without flash messages all get the same page; keep
+    # it rendered and compressed. Only the canonical URLs are stored, so
+    # arbitrary query strings can't fill the cache.
+    page_key = None
+    if (
+        not request.user.is_authenticated
+        and set(request.GET) <= {"period"}
+        and request.GET.get("period", period) == period
+        and not len(messages.get_messages(request))
+    ):
+        origin = f"{request.scheme}://{request.get_host()}"
+        page_key = landing_page_key(period, f'{data.get("version", "")}.{release_token()}', origin)
+        variants = record_cache_lookup(cache.get(page_key))
+        if variants is not None:
+            return variant_response(request, variants)
+
     context = {
         **data,
         "current_period": period,
         **build_landing_seo_data(data["templates"]),
     }
 
-    return render(
+    response = render(
         request,
         "Billing/landing.html",
         context
     )
+    if page_key is None:
+        return response
+
+    variants = compress_variants(response.content)
+    cache.set(page_key, variants, settings.LANDING_HTML_CACHE_TIMEOUT)
+    return variant_response(request, variants)
 
 
 @login_required
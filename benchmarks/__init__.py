@@ -0,0 +1 @@
+# Benchmark tooling for X-Link public and authenticated endpoints.
@@ -0,0 +1,391 @@
+"""
+Reproducible latency benchmark for the main X-Link endpoints.
+
+Creates a throwaway test database, seeds it with ``--users`` users that
+each own a published card, a subdomain and a shop, then drives every
+scenario through the Django test client and reports p50/p95/p99 latency,
+throughput, queries per request and RSS growth::
+
+    python -m benchmarks.endpoints --users 500 --iterations 300 --json bench.json
+
+``--server`` additionally serves the app from a local threaded WSGI server
+and drives the GET scenarios over HTTP with ``benchmarks.http_load``.
+``--compare`` checks the run against an earlier JSON result and exits
+non-zero when a scenario's p95 latency or query count regressed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from benchmarks.http_load import percentile, run_load
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str
+    method: str = "get"
+    host: str = None
+    login: bool = False
+    data: dict = field(default_factory=dict)
+    # Paths cycled through instead of ``path``, e.g. one per seeded card
+    paths: list = None
+    hosts: list = None
+
+
+def peak_rss_kb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def rss_kb():
+    """
+    Returns:
+        int: current resident set size, or the process peak where
+        /proc is not available
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return peak_rss_kb()
+
+
+def build_scenarios(dataset, base_domain):
+    from django.urls import reverse
+
+    usernames = dataset["usernames"]
+    owner = usernames[0]
+
+    return [
+        Scenario(
+            "view_card",
+            reverse("view_card", kwargs={"username": owner}),
+            paths=[reverse("view_card", kwargs={"username": name}) for name in usernames],
+        ),
+        Scenario(
+            "view_card_by_subdomain",
+            "/",
+            host=f"{owner}.{base_domain}",
+            hosts=[f"{name}.{base_domain}" for name in usernames],
+        ),
+        Scenario("landing_view", reverse("home")),
+        Scenario("sitemap_xml_view", reverse("sitemap_xml")),
+        Scenario("shop_view", reverse("shop_view", args=[dataset["shop_ids"][0]])),
+        Scenario("dashboard_view", reverse("dashboard"), login=True),
+        Scenario("card_builder_view", reverse("card_builder"), login=True),
+        Scenario(
+            "card_builder_view_post",
+            reverse("card_builder"),
+            method="post",
+            login=True,
+            data=builder_post_data(owner),
+        ),
+    ]
+
+
+def builder_post_data(username):
+    """
+    Re-submit the seeded card unchanged, including its inline formsets.
+    """
+    from cards.models import UserCard
+
+    card = UserCard.objects.prefetch_related("skills", "services", "portfolio_items").get(username=username)
+    data = {
+        "username": card.username,
+        "name": card.name,
+        "short_bio": card.short_bio,
+        "template": card.template_id,
+        "color": card.color,
+    }
+    for prefix, items, fields in (
+        ("skill", card.skills.all(), ("name",)),
+        ("service", card.services.all(), ("title", "description")),
+        ("portfolio", card.portfolio_items.all(), ("title", "description", "url")),
+    ):
+        items = list(items)
+        data[f"{prefix}-TOTAL_FORMS"] = len(items)
+        data[f"{prefix}-INITIAL_FORMS"] = len(items)
+        for index, item in enumerate(items):
+            data[f"{prefix}-{index}-id"] = item.pk
+            for name in fields:
+                data[f"{prefix}-{index}-{name}"] = getattr(item, name)
+    return data
+
+
+def _request(client, scenario, index):
+    path = scenario.paths[index % len(scenario.paths)] if scenario.paths else scenario.path
+    host = scenario.hosts[index % len(scenario.hosts)] if scenario.hosts else scenario.host
+    extra = {"HTTP_HOST": host} if host else {}
+    if scenario.method == "post":
+        return client.post(path, scenario.data, **extra)
+    return client.get(path, **extra)
+
+
+def run_client_scenario(scenario, iterations, warmup=5, username=None, password=None):
+    """
+    Time ``iterations`` requests for one scenario through the test client.
+
+    Returns:
+        dict: latency percentiles (ms), throughput, queries per request,
+        status counts and the RSS the scenario added
+    """
+    from django.test import Client
+
+    rss_before = rss_kb()
+    client = Client()
+    if scenario.login:
+        client.login(username=username, password=password)
+
+    for index in range(warmup):
+        _request(client, scenario, index)
+
+    latencies = []
+    queries = []
+    statuses = {}
+    started = time.perf_counter()
+    for index in range(iterations):
+        request_started = time.perf_counter()
+        response = _request(client, scenario, warmup + index)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        metrics = getattr(response.wsgi_request, "request_metrics", None)
+        if metrics is not None:
+            queries.append(metrics.queries)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    duration = time.perf_counter() - started
+
+    return {
+        "scenario": scenario.name,
+        "mode": "client",
+        "requests": iterations,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(iterations / duration, 1) if duration else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies) if latencies else None,
+        "queries_mean": statistics.fmean(queries) if queries else None,
+        "queries_max": max(queries) if queries else None,
+        "statuses": statuses,
+        # The process peak covers every earlier scenario; report growth
+        "rss_delta_kb": rss_kb() - rss_before,
+    }
+
+
+class LocalWSGIServer:
+    """
+    The project's WSGI app on a threaded server bound to a free local port.
+    """
+
+    def __init__(self):
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+        from django.core.wsgi import get_wsgi_application
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler, allow_reuse_address=True)
+        self.httpd.set_app(get_wsgi_application())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def run_server_scenario(server, scenario, requests, concurrency, cookies=None):
+    rss_before = rss_kb()
+    result = asyncio.run(run_load(
+        server.url + scenario.path,
+        requests,
+        concurrency,
+        host=scenario.host,
+        cookies=cookies if scenario.login else None,
+    ))
+    result.update(scenario=scenario.name, mode="wsgi", rss_delta_kb=rss_kb() - rss_before)
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns:
+        list[str]: scenarios whose p95 latency grew by more than
+        ``threshold`` percent or that now run more queries
+    """
+    previous = {(row["scenario"], row["mode"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        old = previous.get((row["scenario"], row["mode"]))
+        if not old:
+            continue
+        if old.get("p95_ms") and row["p95_ms"] > old["p95_ms"] * (1 + threshold / 100):
+            regressions.append(f"{row['scenario']} ({row['mode']}): p95 {old['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms")
+        if old.get("queries_max") is not None and (row.get("queries_max") or 0) > old["queries_max"]:
+            regressions.append(f"{row['scenario']} ({row['mode']}): queries {old['queries_max']} -> {row['queries_max']}")
+    return regressions
+
+
+def run(args):
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+    from core.test_utils import seed_benchmark_data
+
+    # A fresh key prefix keeps cached pages of earlier runs (same ids, new data) out
+    caches = {alias: {**config, "KEY_PREFIX": f"bench-{uuid.uuid4().hex[:8]}"} for alias, config in settings.CACHES.items()}
+    media_root = tempfile.mkdtemp(prefix="xlink-bench-")
+    overrides = override_settings(
+        CACHES=caches,
+        MEDIA_ROOT=media_root,
+        SECURE_SSL_REDIRECT=False,
+        ALLOWED_HOSTS=["*"],
+        IMAGE_PIPELINE_WORKERS=0,
+    )
+
+    setup_test_environment()
+    overrides.enable()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        seeded = time.perf_counter()
+        dataset = seed_benchmark_data(
+            users=args.users,
+            items_per_card=args.items,
+            products_per_shop=args.products,
+        )
+        seed_seconds = time.perf_counter() - seeded
+
+        scenarios = [
+            scenario for scenario in build_scenarios(dataset, settings.BASE_DOMAIN)
+            if not args.only or scenario.name in args.only
+        ]
+        owner = dataset["usernames"][0]
+
+        results = []
+        for scenario in scenarios:
+            results.append(run_client_scenario(
+                scenario, args.iterations, username=owner, password=dataset["password"],
+            ))
+            print(_summary(results[-1]), file=sys.stderr)
+
+        if args.server:
+            from django.test import Client
+
+            client = Client()
+            client.login(username=owner, password=dataset["password"])
+            cookies = {name: morsel.value for name, morsel in client.cookies.items()}
+
+            with LocalWSGIServer() as server:
+                for scenario in scenarios:
+                    if scenario.method != "get":
+                        continue
+                    results.append(run_server_scenario(
+                        server, scenario, args.server_requests, args.concurrency, cookies=cookies,
+                    ))
+                    print(_summary(results[-1]), file=sys.stderr)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        overrides.disable()
+        teardown_test_environment()
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    return {
+        "meta": {
+            "label": args.label,
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "cache_backend": settings.CACHES["default"]["BACKEND"],
+            "users": args.users,
+            "items_per_card": args.items,
+            "products_per_shop": args.products,
+            "iterations": args.iterations,
+            "seed_s": round(seed_seconds, 3),
+            "peak_rss_kb": peak_rss_kb(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def _summary(row):
+    queries = f" queries={row['queries_max']}" if row.get("queries_max") is not None else ""
+    return (
+        f"{row['scenario']:<24} {row['mode']:<6} p50={row['p50_ms']:.1f}ms "
+        f"p95={row['p95_ms']:.1f}ms p99={row['p99_ms']:.1f}ms "
+        f"rps={row['throughput_rps']}{queries}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="Users/cards/shops to seed")
+    parser.add_argument("--items", type=int, default=3, help="Skills, services and portfolio items per card")
+    parser.add_argument("--products", type=int, default=6, help="Products per shop")
+    parser.add_argument("--iterations", type=int, default=200, help="Test client requests per scenario")
+    parser.add_argument("--only", nargs="*", help="Scenario names to run")
+    parser.add_argument("--server", action="store_true", help="Also benchmark GET scenarios over a local WSGI server")
+    parser.add_argument("--server-requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--json", dest="json_path", help="Write the run to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Allowed p95 growth in percent")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+
+    django.setup()
+
+    report = run(args)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            regressions = compare(report["results"], json.load(fh), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Concurrent HTTP load generator for comparing WSGI and ASGI deployments.
+
+Start the two servers side by side, e.g.::
+
+    gunicorn config.wsgi:application --config gunicorn_config.py --bind 127.0.0.1:8000
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker --bind 127.0.0.1:8001
+
+then drive the same card page through each::
+
+    python -m benchmarks.http_load http://127.0.0.1:8000/someuser/ --label wsgi
+    python -m benchmarks.http_load http://127.0.0.1:8001/someuser/ --label asgi
+
+``--read-delay`` makes every client read the body in small chunks with a
+pause in between, which is how slow mobile connections tie up workers.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def _fetch(session, url, host, read_delay, chunk_size):
+    headers = {"Host": host} if host else {}
+    started = time.perf_counter()
+    async with session.get(url, headers=headers) as response:
+        if read_delay:
+            while await response.content.read(chunk_size):
+                await asyncio.sleep(read_delay)
+        else:
+            await response.read()
+        status = response.status
+    return status, time.perf_counter() - started
+
+
+async def run_load(url, requests, concurrency, host=None, read_delay=0.0, chunk_size=4096, cookies=None):
+    """
+    Issue ``requests`` GETs against ``url`` with ``concurrency`` clients.
+
+    Returns:
+        dict: Latency percentiles (ms), throughput and status counts
+    """
+    latencies = []
+    statuses = {}
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=120)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, cookies=cookies) as session:
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    status, elapsed = await _fetch(session, url, host, read_delay, chunk_size)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                statuses[status] = statuses.get(status, 0) + 1
+                latencies.append(elapsed * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - started
+
+    return {
+        "url": url,
+        "requests": requests,
+        "concurrency": concurrency,
+        "read_delay": read_delay,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies) if latencies else None,
+        "statuses": statuses,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--label", default="", help="Name stored with the result")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--host", help="Host header, e.g. someuser.x-link.ir for subdomain pages")
+    parser.add_argument("--read-delay", type=float, default=0.0, help="Seconds to pause between body chunks")
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--json", dest="json_path", help="Append the result to this JSON lines file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(
+        args.url,
+        args.requests,
+        args.concurrency,
+        host=args.host,
+        read_delay=args.read_delay,
+        chunk_size=args.chunk_size,
+    ))
+    result["label"] = args.label
+
+    print(json.dumps(result, indent=2))
+    if args.json_path:
+        with open(args.json_path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -119,7 +119,8 @@ class UserCardAdmin(admin.ModelAdmin):
 
     def get_user_plans(self, obj):
         """Display user's active plans."""
-        plans = obj.user.get_active_plans()
+        # Read the prefetched plans; get_active_plans() would query per row
+        plans = [plan.value for plan in obj.user.plan.all()]
         if plans:
             return ", ".join(plans)
         return "بدون پلن"
@@ -127,7 +128,7 @@ class UserCardAdmin(admin.ModelAdmin):
 
     def get_views_display(self, obj):
         """Display formatted view count."""
-        return f"{obj.views:,}"
+        return f"{obj.get_total_views():,}"
     get_views_display.short_description = 'بازدیدها'
     get_views_display.admin_order_field = 'views'
 
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='usercard',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized WebP/JPEG copies of the profile picture'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-18 01:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardSnapshot',
+            fields=[
+                ('card', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='cards.usercard')),
+                ('username', models.SlugField(max_length=32, unique=True)),
+                ('subdomain', models.CharField(blank=True, max_length=30, null=True, unique=True)),
+                ('data', models.JSONField(help_text='Serialized card, skills, services and portfolio items')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0004_card_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardViewEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewed_at', models.DateTimeField()),
+                ('source', models.CharField(choices=[('path', 'x-link.ir/username'), ('subdomain', 'username.x-link.ir')], max_length=16)),
+                ('referrer_host', models.CharField(blank=True, max_length=255)),
+                ('card', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='view_events', to='cards.usercard')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CardViewRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour or (local) day')),
+                ('source', models.CharField(choices=[('path', 'x-link.ir/username'), ('subdomain', 'username.x-link.ir')], max_length=16)),
+                ('referrer_host', models.CharField(blank=True, max_length=255)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('card', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='view_rollups', to='cards.usercard')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket'], name='card_view_rollup_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('card', 'period', 'bucket', 'source', 'referrer_host'), name='card_view_rollup_unique')],
+            },
+        ),
+    ]
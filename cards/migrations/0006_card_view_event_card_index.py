@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0005_card_view_analytics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cardviewevent',
+            name='card',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_events', to='cards.usercard'),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.conf import settings
 
 from Billing.models import Template
 from core.models import CustomUser
+from core.services.entitlements import get_entitlements
 
 
 class UserCard(models.Model):
@@ -54,6 +55,12 @@ class UserCard(models.Model):
         upload_to='profile_pics',
         help_text="Profile picture for the card"
     )
+    profile_picture_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Resized WebP/JPEG copies of the profile picture"
+    )
 
     # Contact Information
     phone_number = models.CharField(
@@ -206,6 +213,17 @@ class UserCard(models.Model):
         self.views = models.F('views') + 1
         self.save(update_fields=['views'])
 
+    def get_total_views(self):
+        """
+        Get the view count including views not yet flushed to the database.
+
+        Returns:
+            int: Persisted views plus the pending buffered delta
+        """
+        from cards.services.view_counter import get_pending_views
+
+        return self.views + get_pending_views(self.id)
+
     def has_social_links(self):
         """
         Check if user has any social media links configured.
@@ -251,7 +269,7 @@ class UserCard(models.Model):
         if color == 'default':
             return True
 
-        return user.has_plan('Basic') or user.has_plan('Pro')
+        return get_entitlements(user).can_use_custom_colors
 
     def clean(self):
         super().clean()
@@ -301,6 +319,7 @@ class Portfolio(models.Model):
     title = models.CharField(max_length=255)
     description = models.CharField(max_length=500, blank=True)
     image = models.ImageField(upload_to='portfolio')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     url = models.URLField(blank=True, help_text="Project URL or external link")
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -309,3 +328,90 @@ class Portfolio(models.Model):
 
     def __str__(self):
         return f"{self.user_card.name} - {self.title}"
+
+
+class CardSnapshot(models.Model):
+    """
+    Denormalized copy of a published card and its sections.
+
+    Public card pages read this single row instead of the card, its skills,
+    services and portfolio items. Rows are rebuilt by
+    ``cards.services.snapshots`` whenever any of them change.
+    """
+
+    card = models.OneToOneField(
+        UserCard,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot',
+    )
+    username = models.SlugField(max_length=32, unique=True)
+    subdomain = models.CharField(max_length=30, unique=True, null=True, blank=True)
+    data = models.JSONField(help_text="Serialized card, skills, services and portfolio items")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Snapshot of @{self.username}"
+
+
+class CardViewSource(models.TextChoices):
+    PATH = 'path', 'x-link.ir/username'
+    SUBDOMAIN = 'subdomain', 'username.x-link.ir'
+
+
+class CardViewEvent(models.Model):
+    """
+    One public card view, waiting to be rolled up.
+
+    Written in batches by ``cards.services.view_counter`` and deleted by
+    ``manage.py rollup_card_views`` once counted in CardViewRollup.
+    """
+
+    # Indexed so deleting a card doesn't scan the whole events table.
+    card = models.ForeignKey(
+        UserCard,
+        on_delete=models.CASCADE,
+        related_name='view_events',
+    )
+    viewed_at = models.DateTimeField()
+    source = models.CharField(max_length=16, choices=CardViewSource.choices)
+    referrer_host = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return f"View of card {self.card_id} at {self.viewed_at}"
+
+
+class CardViewRollup(models.Model):
+    """
+    Views per card, hour or day bucket, source and referring host.
+    """
+
+    class Period(models.TextChoices):
+        HOUR = 'hour', 'Hour'
+        DAY = 'day', 'Day'
+
+    card = models.ForeignKey(
+        UserCard,
+        on_delete=models.CASCADE,
+        related_name='view_rollups',
+        db_index=False,
+    )
+    period = models.CharField(max_length=4, choices=Period.choices)
+    bucket = models.DateTimeField(help_text="Start of the hour or (local) day")
+    source = models.CharField(max_length=16, choices=CardViewSource.choices)
+    referrer_host = models.CharField(max_length=255, blank=True)
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['card', 'period', 'bucket', 'source', 'referrer_host'],
+                name='card_view_rollup_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'bucket'], name='card_view_rollup_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.views} views of card {self.card_id} ({self.period} {self.bucket})"
@@ -0,0 +1 @@
+# Services package for public card rendering and caching logic.
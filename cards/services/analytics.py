@@ -0,0 +1,176 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from cards.models import CardViewEvent, CardViewRollup, CardViewSource
+
+
+# Public card lookup ("username" or "subdomain") -> CardViewEvent.source
+SOURCE_BY_LOOKUP = {
+    "username": CardViewSource.PATH,
+    "subdomain": CardViewSource.SUBDOMAIN,
+}
+
+
+@dataclass(frozen=True)
+class RollupResult:
+    events: int
+    rows: int
+    pruned: int
+
+
+@dataclass(frozen=True)
+class CardViewSummary:
+    days: int
+    total: int
+    # [(date, views)] for every day in the window, oldest first
+    by_day: list
+    by_source: dict
+    # [(host, views)], most views first; "" is direct traffic
+    top_referrers: list
+
+
+def referrer_host(request):
+    """
+    Returns:
+        str: host of the page that linked to ``request``, without "www."
+        and port; "" for direct visits
+    """
+    host = (urlsplit(request.META.get("HTTP_REFERER", "")).hostname or "").lower()
+    return host.removeprefix("www.")[:255]
+
+
+def _upsert_rollups(rows):
+    """
+    Add ``rows`` of (card_id, period, bucket, source, referrer_host, views)
+    to their rollups, creating missing ones.
+    """
+    table = connection.ops.quote_name(CardViewRollup._meta.db_table)
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    params = []
+    for card_id, period, bucket, source, host, views in rows:
+        params += [card_id, period, connection.ops.adapt_datetimefield_value(bucket), source, host, views]
+
+    # Same syntax on PostgreSQL and SQLite
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (card_id, period, bucket, source, referrer_host, views) "
+            f"VALUES {placeholders} "
+            f"ON CONFLICT (card_id, period, bucket, source, referrer_host) "
+            f"DO UPDATE SET views = {table}.views + excluded.views",
+            params,
+        )
+
+
+def _rollup_chunk(event_ids):
+    hourly = (
+        CardViewEvent.objects
+        .filter(id__in=event_ids)
+        .annotate(hour=TruncHour("viewed_at"))
+        .values_list("card_id", "hour", "source", "referrer_host")
+        .annotate(views=Count("id"))
+        .order_by()
+    )
+
+    rows = {}
+    for card_id, hour, source, host, views in hourly:
+        day = timezone.localtime(hour).replace(hour=0)
+        for key in ((card_id, CardViewRollup.Period.HOUR, hour, source, host),
+                    (card_id, CardViewRollup.Period.DAY, day, source, host)):
+            rows[key] = rows.get(key, 0) + views
+
+    # Sorted keys keep row lock order stable across concurrent rollups.
+    items = sorted(rows.items())
+    for start in range(0, len(items), 500):
+        _upsert_rollups([(*key, views) for key, views in items[start:start + 500]])
+    CardViewEvent.objects.filter(id__in=event_ids).delete()
+    return len(items)
+
+
+def rollup_view_events(chunk_size=None):
+    """
+    Fold raw view events into hourly and daily rollups, then delete them.
+
+    Each chunk of ``chunk_size`` events is locked, counted and deleted in
+    one transaction, so an event is never counted twice or lost. Locked
+    rows are skipped, so concurrent runs take disjoint chunks.
+
+    Returns:
+        RollupResult: events consumed, rollup rows touched and expired
+        rollups pruned
+    """
+    chunk_size = chunk_size or getattr(settings, "CARD_VIEW_ROLLUP_CHUNK_SIZE", 5000)
+    events = rows = 0
+    while True:
+        with transaction.atomic():
+            event_ids = list(
+                CardViewEvent.objects
+                .select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not event_ids:
+                break
+            rows += _rollup_chunk(event_ids)
+        events += len(event_ids)
+        if len(event_ids) < chunk_size:
+            break
+
+    return RollupResult(events=events, rows=rows, pruned=prune_view_rollups())
+
+
+def prune_view_rollups():
+    """
+    Drop hourly rollups older than CARD_VIEW_HOURLY_RETENTION days and
+    daily ones older than CARD_VIEW_DAILY_RETENTION days.
+
+    Returns:
+        int: Number of rollup rows removed
+    """
+    now = timezone.now()
+    hourly_cutoff = now - timedelta(days=getattr(settings, "CARD_VIEW_HOURLY_RETENTION", 14))
+    daily_cutoff = now - timedelta(days=getattr(settings, "CARD_VIEW_DAILY_RETENTION", 400))
+    removed, _ = CardViewRollup.objects.filter(period=CardViewRollup.Period.HOUR, bucket__lt=hourly_cutoff).delete()
+    removed_daily, _ = CardViewRollup.objects.filter(period=CardViewRollup.Period.DAY, bucket__lt=daily_cutoff).delete()
+    return removed + removed_daily
+
+
+def card_view_summary(card_id, days=30):
+    """
+    Summarize the last ``days`` days of views from the daily rollups in one
+    query. Views not rolled up yet are not included.
+
+    Returns:
+        CardViewSummary
+    """
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    since = today - timedelta(days=days - 1)
+    rollups = CardViewRollup.objects.filter(
+        card_id=card_id,
+        period=CardViewRollup.Period.DAY,
+        bucket__gte=since,
+    ).values_list("bucket", "source", "referrer_host", "views")
+
+    by_day = {(since + timedelta(days=offset)).date(): 0 for offset in range(days)}
+    by_source = {source: 0 for source in CardViewSource.values}
+    referrers = {}
+    for bucket, source, host, views in rollups:
+        day = timezone.localtime(bucket).date()
+        if day in by_day:
+            by_day[day] += views
+        by_source[source] = by_source.get(source, 0) + views
+        referrers[host] = referrers.get(host, 0) + views
+
+    return CardViewSummary(
+        days=days,
+        total=sum(by_day.values()),
+        by_day=list(by_day.items()),
+        by_source=by_source,
+        top_referrers=sorted(referrers.items(), key=lambda item: (-item[1], item[0]))[:10],
+    )
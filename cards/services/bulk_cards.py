@@ -0,0 +1,652 @@
+import codecs
+import csv
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.validators import validate_image_file_extension
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from Billing.models import UserPlan
+from cards.models import Portfolio, Service, Skill, UserCard
+from cards.services.snapshots import SECTIONS, rebuild_card_snapshots
+from core.models import CustomUser, UserSubdomain
+from core.services.images import schedule_variants
+from core.services.subdomain_filter import taken_subdomains
+from core.services.subdomain_resolver import subdomain_resolver
+from core.subdomains import is_reserved_subdomain, normalize_subdomain_name, validate_subdomain_format
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+# UserCard fields copied as they are between records and cards. Colors,
+# templates and premium effects are left out: imported users start on
+# the Free plan.
+CARD_FIELDS = (
+    "name",
+    "phone_number",
+    "email",
+    "website",
+    "short_bio",
+    "description",
+    "instagram_username",
+    "telegram_username",
+    "linkedin_username",
+    "youtube_username",
+    "twitter_username",
+    "github_username",
+    "show_views",
+    "is_published",
+)
+BOOLEAN_FIELDS = ("show_views", "is_published")
+LIST_FIELDS = ("skills", "services", "portfolio")
+EXPORT_FIELDS = ("username", "phone", *CARD_FIELDS, "profile_picture", *LIST_FIELDS)
+
+PHONE_PATTERN = re.compile(r"^09\d{9}$")
+
+IMPORT_JOB_KEY_PREFIX = "card_import:job"
+IMPORT_JOB_TIMEOUT = 60 * 60 * 24
+# Rejected records listed in an import report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+_import_executor = None
+_import_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class RowError:
+    line: int
+    username: str
+    errors: dict
+
+
+class ImportEncodingError(ValueError):
+    """A line of the import file is not valid UTF-8."""
+
+    def __init__(self, line):
+        super().__init__(f"Line {line} is not valid UTF-8.")
+        self.line = line
+
+
+@dataclass(frozen=True)
+class ImportResult:
+    # Cards created, or that would be created on a dry run
+    created: int
+    batches: int
+    errors: list
+
+
+class ImageArchive:
+    """
+    Images referenced by import records, read from a directory or a zip
+    file by their relative path.
+    """
+
+    def __init__(self, source):
+        self._zip = None
+        self._root = None
+        if zipfile.is_zipfile(source):
+            self._zip = zipfile.ZipFile(source)
+            self._names = set(self._zip.namelist())
+        elif isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+            self._root = os.path.realpath(source)
+        else:
+            raise ValueError("images must be a zip file or a directory")
+
+    def _path(self, name):
+        path = os.path.realpath(os.path.join(self._root, name))
+        # Records must not reach outside the archive directory.
+        return path if path.startswith(self._root + os.sep) else None
+
+    def __contains__(self, name):
+        if not name:
+            return False
+        if self._zip is not None:
+            return name in self._names
+        path = self._path(name)
+        return path is not None and os.path.isfile(path)
+
+    def read(self, name):
+        if self._zip is not None:
+            return self._zip.read(name)
+        with open(self._path(name), "rb") as fh:
+            return fh.read()
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+
+def format_for(filename, default="jsonl"):
+    """
+    Returns:
+        str: the import/export format matching ``filename``'s extension
+    """
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    return {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}.get(extension, default)
+
+
+def decode_lines(lines):
+    """
+    Decode an iterable of UTF-8 (optionally BOM-prefixed) byte lines.
+
+    Raises:
+        ImportEncodingError: naming the first line that doesn't decode
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    for line, raw in enumerate(lines, 1):
+        try:
+            text = decoder.decode(raw)
+        except UnicodeDecodeError:
+            raise ImportEncodingError(line) from None
+        if text:
+            yield text
+
+
+def iter_records(lines, fmt):
+    """
+    Yield ``(line, record)`` pairs from an iterable of text lines.
+
+    CSV records are keyed by the header row. A JSONL line that does not
+    hold a JSON object yields a ``None`` record.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError:
+            record = None
+        yield line, record if isinstance(record, dict) else None
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def _boolean(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def _items(value):
+    # JSONL records hold lists; CSV cells hold a JSON array or "a|b|c".
+    if isinstance(value, list):
+        return value
+    value = _text(value)
+    if not value:
+        return []
+    if value.startswith("["):
+        items = json.loads(value)
+        if not isinstance(items, list):
+            raise ValueError
+        return items
+    return [item.strip() for item in value.split("|") if item.strip()]
+
+
+def _model_errors(instance, exclude):
+    try:
+        instance.clean_fields(exclude=exclude)
+    except ValidationError as exc:
+        return exc.message_dict
+    return {}
+
+
+def _check_image(name, archive):
+    if archive is None or name not in archive:
+        return "Image not found in the archive."
+    try:
+        validate_image_file_extension(ContentFile(b"", name=name))
+    except ValidationError as exc:
+        return exc.messages[0]
+    return None
+
+
+def _clean_record(record, archive):
+    """
+    Validate one record without touching the database.
+
+    Returns:
+        tuple: ``(row, errors)``; ``row`` holds the unsaved card, its
+        sections and the account phone
+    """
+    errors = {}
+    username = normalize_subdomain_name(_text(record.get("username")))
+    if not validate_subdomain_format(username):
+        errors["username"] = ["Use 3-30 lowercase letters, numbers and hyphens."]
+    elif is_reserved_subdomain(username):
+        errors["username"] = ["This username is reserved."]
+
+    phone = _text(record.get("phone"))
+    if phone and not PHONE_PATTERN.fullmatch(phone):
+        errors["phone"] = ["Phone must look like 09xxxxxxxxx."]
+
+    fields = {name: _text(record.get(name)) for name in CARD_FIELDS if name not in BOOLEAN_FIELDS}
+    fields["show_views"] = _boolean(record.get("show_views"), False)
+    fields["is_published"] = _boolean(record.get("is_published"), True)
+    card = UserCard(username=username, **fields)
+    errors.update(_model_errors(card, exclude=["user", "template", "profile_picture", "username"]))
+
+    card.profile_picture = _text(record.get("profile_picture"))
+    image_error = _check_image(card.profile_picture.name, archive)
+    if image_error:
+        errors["profile_picture"] = [image_error]
+
+    sections = {}
+    for name in LIST_FIELDS:
+        try:
+            sections[name] = _items(record.get(name))
+        except ValueError:
+            errors[name] = ["Expected a list."]
+            sections[name] = []
+
+    skills = [Skill(name=_text(item)) for item in sections["skills"]]
+    services = [
+        Service(title=_text(item.get("title")), description=_text(item.get("description")))
+        if isinstance(item, dict) else Service(title=_text(item))
+        for item in sections["services"]
+    ]
+    portfolio = [
+        Portfolio(
+            title=_text(item.get("title")),
+            description=_text(item.get("description")),
+            url=_text(item.get("url")),
+            image=_text(item.get("image")),
+        )
+        for item in sections["portfolio"] if isinstance(item, dict)
+    ]
+    if len(portfolio) != len(sections["portfolio"]):
+        errors["portfolio"] = ["Portfolio items must be objects."]
+
+    for name, objects in (("skills", skills), ("services", services), ("portfolio", portfolio)):
+        for index, obj in enumerate(objects):
+            item_errors = _model_errors(obj, exclude=["user_card", "image"])
+            if isinstance(obj, Portfolio):
+                image_error = _check_image(obj.image.name, archive)
+                if image_error:
+                    item_errors["image"] = [image_error]
+            for field, messages in item_errors.items():
+                errors[f"{name}[{index}].{field}"] = messages
+
+    row = {
+        "phone": phone or None,
+        "card": card,
+        "skills": skills,
+        "services": services,
+        "portfolio": portfolio,
+    }
+    return row, errors
+
+
+def _validate_batch(batch, archive, seen):
+    """
+    Validate a batch of records; usernames and phones are checked against
+    earlier records and the database with one query per table.
+
+    Returns:
+        tuple: ``(rows, errors)``, the valid rows and a RowError per
+        rejected record
+    """
+    rows = []
+    errors = []
+    for line, record in batch:
+        if record is None:
+            errors.append(RowError(line=line, username="", errors={"record": ["Not a JSON object."]}))
+            continue
+        row, row_errors = _clean_record(record, archive)
+        if row_errors:
+            errors.append(RowError(line=line, username=row["card"].username, errors=row_errors))
+        else:
+            rows.append((line, row))
+
+    usernames = [row["card"].username for _line, row in rows]
+    phones = [row["phone"] for _line, row in rows if row["phone"]]
+    taken_usernames = set(UserCard.objects.filter(username__in=usernames).values_list("username", flat=True))
+    taken_usernames.update(
+        UserSubdomain.objects.filter(subdomain__in=usernames).values_list("subdomain", flat=True)
+    )
+    taken_phones = set()
+    users = CustomUser.objects.filter(Q(username__in=usernames) | Q(phone__in=phones))
+    for username, phone in users.values_list("username", "phone"):
+        taken_usernames.add(username)
+        taken_phones.add(phone)
+
+    valid = []
+    for line, row in rows:
+        username, phone = row["card"].username, row["phone"]
+        row_errors = {}
+        if username in taken_usernames or username in seen["username"]:
+            row_errors["username"] = ["This username is already taken."]
+        if phone and (phone in taken_phones or phone in seen["phone"]):
+            row_errors["phone"] = ["This phone number is already registered."]
+        if row_errors:
+            errors.append(RowError(line=line, username=username, errors=row_errors))
+            continue
+        seen["username"].add(username)
+        if phone:
+            seen["phone"].add(phone)
+        valid.append(row)
+    return valid, errors
+
+
+def _store_images(rows, archive):
+    """
+    Copy the images the rows reference from the archive into storage.
+
+    Returns:
+        list: names written to storage
+    """
+    stored = {}
+    for row in rows:
+        images = [(row["card"].profile_picture, "profile_pics")]
+        images += [(item.image, "portfolio") for item in row["portfolio"]]
+        for field_file, upload_to in images:
+            source = field_file.name
+            if source not in stored:
+                name = f"{upload_to}/{os.path.basename(source)}"
+                stored[source] = default_storage.save(name, ContentFile(archive.read(source)))
+            field_file.name = stored[source]
+    return list(stored.values())
+
+
+def _after_import(cards, portfolio):
+    for card in cards:
+        # bulk_create skips the UserSubdomain signals
+        taken_subdomains.add(card.username)
+        subdomain_resolver.invalidate(subdomain=card.username)
+        schedule_variants("cards.UserCard", card.pk, card.profile_picture.name)
+    for item in portfolio:
+        schedule_variants("cards.Portfolio", item.pk, item.image.name)
+
+
+def _create_batch(rows):
+    """
+    Insert a validated batch with one bulk_create per table.
+
+    ``bulk_create`` sends no signals, so the Free plan links and card
+    snapshots are written here, and the subdomain filter, resolver and
+    image variants are updated once the batch commits.
+    """
+    free_plan, _ = UserPlan.objects.get_or_create(value=UserPlan.PlanChoices.Free)
+    # Imported accounts sign in with an OTP to their phone.
+    password = make_password(None)
+    users = CustomUser.objects.bulk_create([
+        CustomUser(
+            username=row["card"].username,
+            full_name=row["card"].name[:100],
+            phone=row["phone"],
+            password=password,
+        )
+        for row in rows
+    ])
+    # SQLite and PostgreSQL return primary keys from bulk_create
+    CustomUser.plan.through.objects.bulk_create([
+        CustomUser.plan.through(customuser_id=user.pk, userplan_id=free_plan.id) for user in users
+    ])
+    UserSubdomain.objects.bulk_create([
+        UserSubdomain(user_id=user.pk, subdomain=user.username) for user in users
+    ])
+
+    for user, row in zip(users, rows):
+        row["card"].user_id = user.pk
+    cards = UserCard.objects.bulk_create([row["card"] for row in rows])
+
+    children = {Skill: [], Service: [], Portfolio: []}
+    for card, row in zip(cards, rows):
+        for name, model in (("skills", Skill), ("services", Service), ("portfolio", Portfolio)):
+            for obj in row[name]:
+                obj.user_card = card
+                children[model].append(obj)
+    for model, objects in children.items():
+        model.objects.bulk_create(objects)
+
+    rebuild_card_snapshots([card.pk for card in cards])
+    transaction.on_commit(partial(_after_import, cards, children[Portfolio]))
+    return len(cards)
+
+
+def _batches(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def import_cards(lines, fmt, archive=None, batch_size=None, dry_run=False):
+    """
+    Create users with published cards, subdomains and card sections from
+    CSV or JSONL records.
+
+    Records are read lazily and handled CARD_IMPORT_BATCH_SIZE at a time:
+    each batch is validated with a fixed number of queries, then its valid
+    rows are inserted in one transaction. Invalid records are reported and
+    skipped. Images (``profile_picture`` and portfolio ``image``) are paths
+    inside ``archive``. The username is also the card's username and
+    subdomain, as in the card builder.
+
+    Returns:
+        ImportResult
+    """
+    batch_size = batch_size or getattr(settings, "CARD_IMPORT_BATCH_SIZE", 500)
+    seen = {"username": set(), "phone": set()}
+    created = batches = 0
+    errors = []
+
+    for batch in _batches(iter_records(lines, fmt), batch_size):
+        batches += 1
+        rows, batch_errors = _validate_batch(batch, archive, seen)
+        errors += batch_errors
+        if not rows:
+            continue
+        if dry_run:
+            created += len(rows)
+            continue
+
+        stored = _store_images(rows, archive)
+        try:
+            with transaction.atomic():
+                created += _create_batch(rows)
+        except Exception:
+            for name in stored:
+                default_storage.delete(name)
+            raise
+
+    return ImportResult(created=created, batches=batches, errors=errors)
+
+
+def import_report(result):
+    """
+    Returns:
+        dict: JSON-ready summary of an ImportResult
+    """
+    return {
+        "created": result.created,
+        "batches": result.batches,
+        "rejected": len(result.errors),
+        "errors": [
+            {"line": error.line, "username": error.username, "errors": error.errors}
+            for error in result.errors[:MAX_REPORTED_ERRORS]
+        ],
+    }
+
+
+def _job_key(job_id):
+    return f"{IMPORT_JOB_KEY_PREFIX}:{job_id}"
+
+
+def _set_job(job_id, **state):
+    cache.set(_job_key(job_id), state, IMPORT_JOB_TIMEOUT)
+
+
+def get_import_job(job_id):
+    """
+    Returns:
+        dict or None: ``status`` (queued, running, done or failed) and,
+        once done, the import report, or once failed, the ``error``
+    """
+    return cache.get(_job_key(job_id))
+
+
+def _get_import_executor():
+    global _import_executor
+
+    with _import_executor_lock:
+        if _import_executor is None:
+            _import_executor = ThreadPoolExecutor(
+                max_workers=settings.CARD_IMPORT_WORKERS,
+                thread_name_prefix="card-import",
+            )
+        return _import_executor
+
+
+def _spool(upload, path):
+    with open(path, "wb") as fh:
+        for chunk in upload.chunks():
+            fh.write(chunk)
+
+
+def _run_import_job(job_id, spool, fmt, has_images, dry_run):
+    _set_job(job_id, status="running")
+    archive = ImageArchive(os.path.join(spool, "images.zip")) if has_images else None
+    try:
+        records = os.path.join(spool, "records")
+        # Checked in full first, so a bad line can't fail the job after
+        # earlier batches were saved.
+        with open(records, "rb") as source:
+            for _line in decode_lines(source):
+                pass
+        with open(records, "rb") as source:
+            result = import_cards(decode_lines(source), fmt, archive=archive, dry_run=dry_run)
+    except ImportEncodingError as exc:
+        _set_job(job_id, status="failed", error=str(exc))
+        return
+    except Exception as exc:
+        logger.exception("Card import job %s failed", job_id)
+        _set_job(job_id, status="failed", error=str(exc) or exc.__class__.__name__)
+        return
+    finally:
+        if archive is not None:
+            archive.close()
+        shutil.rmtree(spool, ignore_errors=True)
+        close_old_connections()
+
+    logger.info("Card import job %s: %d cards, %d rejected", job_id, result.created, len(result.errors))
+    _set_job(job_id, status="done", **import_report(result))
+
+
+def queue_import(upload, fmt, images=None, dry_run=False):
+    """
+    Spool an uploaded import (and its ``images`` zip) to disk and run it
+    on one of CARD_IMPORT_WORKERS background threads (0 runs it inline).
+
+    Returns:
+        str: job id for ``get_import_job``
+    """
+    job_id = uuid.uuid4().hex
+    spool = tempfile.mkdtemp(prefix="card-import-")
+    _spool(upload, os.path.join(spool, "records"))
+    if images is not None:
+        _spool(images, os.path.join(spool, "images.zip"))
+
+    _set_job(job_id, status="queued")
+    job = partial(_run_import_job, job_id, spool, fmt, images is not None, dry_run)
+    if getattr(settings, "CARD_IMPORT_WORKERS", 1) > 0:
+        _get_import_executor().submit(job)
+    else:
+        job()
+    return job_id
+
+
+def export_record(card):
+    """
+    Returns:
+        dict: ``card`` in the import record format; image paths are
+        relative to MEDIA_ROOT, so it can serve as the import archive
+    """
+    return {
+        "username": card.username,
+        "phone": card.user.phone or "",
+        **{name: getattr(card, name) for name in CARD_FIELDS},
+        "profile_picture": card.profile_picture.name,
+        "skills": [skill.name for skill in card.skills.all()],
+        "services": [
+            {"title": service.title, "description": service.description}
+            for service in card.services.all()
+        ],
+        "portfolio": [
+            {"title": item.title, "description": item.description, "url": item.url, "image": item.image.name}
+            for item in card.portfolio_items.all()
+        ],
+    }
+
+
+def iter_card_export(fmt, queryset=None, chunk_size=None):
+    """
+    Yield every card in ``queryset`` as CSV or JSONL text, one chunk per
+    CARD_EXPORT_CHUNK_SIZE cards.
+
+    Cards are streamed with ``iterator()``, their sections prefetched per
+    chunk, so memory use does not grow with the number of cards.
+    """
+    chunk_size = chunk_size or getattr(settings, "CARD_EXPORT_CHUNK_SIZE", 500)
+    cards = (
+        (queryset if queryset is not None else UserCard.objects.all())
+        .select_related("user")
+        .prefetch_related(*SECTIONS)
+        .order_by("id")
+    )
+
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+
+    for count, card in enumerate(cards.iterator(chunk_size=chunk_size), 1):
+        record = export_record(card)
+        if writer is not None:
+            for name in LIST_FIELDS:
+                record[name] = json.dumps(record[name], ensure_ascii=False)
+            writer.writerow(record)
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            buffer.write("\n")
+
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from core.services.cache_keys import SITE_TOKEN_KEY
+from core.services.conditional import release_token
+from core.services.request_metrics import record_cache_lookup
+
+
+# v4 entries hold the page's compressed variants (core.services.compression),
+# the card's updated_at for the ETag and the site token the page
+# was rendered with. Keys carry the release token, so a deploy starts afresh.
+PAGE_KEY_PREFIX = "card_page:v4"
+
+
+def _timeout():
+    return getattr(settings, "CARD_PAGE_CACHE_TIMEOUT", 60 * 60 * 24)
+
+
+def page_cache_key(lookup, value):
+    return f"{PAGE_KEY_PREFIX}:{release_token()}:{lookup}:{value}"
+
+
+def _index_key(card_id):
+    return f"{PAGE_KEY_PREFIX}:keys:{card_id}"
+
+
+def _current_entry(found, key):
+    entry = found.get(key)
+    if entry is not None and entry[3] != found.get(SITE_TOKEN_KEY):
+        # Rendered before the site context last changed
+        entry = None
+    return record_cache_lookup(entry)
+
+
+def get_cached_page(lookup, value):
+    """
+    Return ``(card_id, variants, updated_at, site_token)`` for a cached
+    public card page, or ``None``. The site token is read in the same
+    round trip.
+    """
+    key = page_cache_key(lookup, value)
+    return _current_entry(cache.get_many([key, SITE_TOKEN_KEY]), key)
+
+
+async def aget_cached_page(lookup, value):
+    key = page_cache_key(lookup, value)
+    return _current_entry(await cache.aget_many([key, SITE_TOKEN_KEY]), key)
+
+
+def set_cached_page(card_id, lookup, value, variants, updated_at, site_token):
+    key = page_cache_key(lookup, value)
+    timeout = _timeout()
+    cache.set(key, (card_id, variants, updated_at, site_token), timeout)
+
+    # Remember every key rendered for this card so a single invalidation
+    # also drops pages cached under an old username or subdomain.
+    index_key = _index_key(card_id)
+    keys = set(cache.get(index_key) or ())
+    keys.add(key)
+    cache.set(index_key, keys, timeout)
+
+
+def invalidate_card_page(card_id):
+    if not card_id:
+        return
+    index_key = _index_key(card_id)
+    keys = cache.get(index_key) or ()
+    cache.delete_many([*keys, index_key])
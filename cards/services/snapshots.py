@@ -0,0 +1,287 @@
+import datetime
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cards.models import CardSnapshot, UserCard
+from cards.services.page_cache import invalidate_card_page
+from core.models import UserSubdomain
+
+
+# Reverse relations rendered on the public card, stored next to the card.
+SECTIONS = ("skills", "services", "portfolio_items")
+
+@dataclass(frozen=True)
+class SnapshotRebuildResult:
+    snapshots: int
+    chunks: int
+    removed: int
+
+
+# Card ids collected by an active batch_snapshot_rebuilds() block.
+_pending_rebuilds = ContextVar("card_snapshot_pending_rebuilds", default=None)
+# Cards whose sections changed inside the block, touched once on exit.
+_pending_touches = ContextVar("card_snapshot_pending_touches", default=None)
+
+
+class _SnapshotEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds; keep updated_at
+    # exact, it versions the card's template fragments.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _serialize(objects):
+    return json.loads(serializers.serialize("json", objects, cls=_SnapshotEncoder))
+
+
+def _deserialize(entries):
+    return [item.object for item in serializers.deserialize("python", entries, ignorenonexistent=True)]
+
+
+def build_snapshot_data(card):
+    """
+    Serialize ``card`` and its sections; prefetch them to avoid N+1 queries.
+    """
+    return {
+        "card": _serialize([card])[0],
+        **{name: _serialize(getattr(card, name).all()) for name in SECTIONS},
+    }
+
+
+def hydrate_card(data):
+    """
+    Rebuild an unsaved UserCard from snapshot data.
+
+    The sections are attached as prefetched results, so templates can use
+    ``user_card.skills.all`` and friends without touching the database.
+    """
+    card = _deserialize([data["card"]])[0]
+    card._prefetched_objects_cache = {}
+    for name in SECTIONS:
+        queryset = getattr(card, name).get_queryset()
+        queryset._result_cache = _deserialize(data.get(name, ()))
+        queryset._prefetch_done = True
+        card._prefetched_objects_cache[name] = queryset
+    return card
+
+
+def rebuild_card_snapshots(card_ids):
+    """
+    Rebuild the snapshots of ``card_ids`` in one transaction.
+
+    Unpublished and deleted cards lose their snapshot. Works on any number
+    of ids with a fixed number of queries.
+
+    Returns:
+        int: Number of snapshots written
+    """
+    card_ids = list(card_ids)
+    if not card_ids:
+        return 0
+
+    with transaction.atomic():
+        cards = list(
+            UserCard.objects
+            .filter(id__in=card_ids, is_published=True)
+            .order_by()
+            .prefetch_related(*SECTIONS)
+        )
+        published_ids = {card.id for card in cards}
+        subdomains = dict(
+            UserSubdomain.objects
+            .filter(user_id__in=[card.user_id for card in cards], is_active=True)
+            .values_list("user_id", "subdomain")
+        )
+
+        snapshots = [
+            CardSnapshot(
+                card_id=card.id,
+                username=card.username,
+                subdomain=subdomains.get(card.user_id),
+                data=build_snapshot_data(card),
+            )
+            for card in cards
+        ]
+
+        # Usernames and subdomains are unique on their source tables, so a
+        # snapshot of another card still holding one is stale; its own
+        # rebuild is queued by the change that freed the name.
+        taken = Q(username__in=[s.username for s in snapshots])
+        taken |= Q(subdomain__in=[s.subdomain for s in snapshots if s.subdomain])
+        CardSnapshot.objects.filter(
+            Q(card_id__in=set(card_ids) - published_ids) | (taken & ~Q(card_id__in=published_ids))
+        ).delete()
+
+        CardSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=["card"],
+            update_fields=["username", "subdomain", "data", "updated_at"],
+        )
+    return len(snapshots)
+
+
+def _card_id_chunks(queryset, chunk_size):
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        if len(ids) < chunk_size:
+            return
+        last_id = ids[-1]
+
+
+def _rebuild_chunk(card_ids):
+    try:
+        return rebuild_card_snapshots(card_ids)
+    finally:
+        # Worker threads open their own connections; don't leak them.
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def rebuild_all_snapshots(chunk_size=None, workers=None, missing_only=False):
+    """
+    Backfill or rebuild the snapshots of every published card.
+
+    Cards are rebuilt in chunks of ``chunk_size`` ids, each chunk in its own
+    transaction, spread over ``workers`` threads. SQLite allows a single
+    writer, so it always runs with one.
+
+    Returns:
+        SnapshotRebuildResult: number of snapshots written, chunks run and
+        stale snapshots removed
+    """
+    chunk_size = chunk_size or getattr(settings, "CARD_SNAPSHOT_CHUNK_SIZE", 500)
+    workers = workers or getattr(settings, "CARD_SNAPSHOT_WORKERS", 4)
+    if connection.vendor == "sqlite":
+        workers = 1
+
+    removed, _ = CardSnapshot.objects.filter(card__is_published=False).delete()
+
+    cards = UserCard.objects.filter(is_published=True)
+    if missing_only:
+        cards = cards.filter(snapshot__isnull=True)
+    chunks = _card_id_chunks(cards, chunk_size)
+
+    if workers == 1:
+        written = [rebuild_card_snapshots(ids) for ids in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            written = list(executor.map(_rebuild_chunk, chunks))
+
+    return SnapshotRebuildResult(snapshots=sum(written), chunks=len(written), removed=removed)
+
+
+def get_card_snapshot(**lookup):
+    """
+    Return the snapshot matching ``lookup`` (``username``, ``subdomain``
+    or ``card_id``).
+
+    A published card without a snapshot yet (e.g. before the backfill has
+    run) gets one built on the spot.
+
+    Returns:
+        CardSnapshot or None: None if no published card matches
+    """
+    snapshot = CardSnapshot.objects.filter(**lookup).first()
+    if snapshot is not None:
+        return snapshot
+
+    if "card_id" in lookup:
+        card_lookup = {"id": lookup["card_id"]}
+    elif "subdomain" in lookup:
+        card_lookup = {"user__subdomain__subdomain": lookup["subdomain"], "user__subdomain__is_active": True}
+    else:
+        card_lookup = lookup
+    card_id = UserCard.objects.filter(is_published=True, **card_lookup).values_list("id", flat=True).first()
+    if card_id is None or not rebuild_card_snapshots([card_id]):
+        return None
+    return CardSnapshot.objects.filter(card_id=card_id).first()
+
+
+async def aget_card_snapshot(**lookup):
+    snapshot = await CardSnapshot.objects.filter(**lookup).afirst()
+    if snapshot is None:
+        # Missing snapshots are built once per card; a thread hop is fine.
+        snapshot = await sync_to_async(get_card_snapshot)(**lookup)
+    return snapshot
+
+
+@contextmanager
+def batch_snapshot_rebuilds():
+    """
+    Collect snapshot refreshes and section changes, and rebuild and touch
+    each card once on exit.
+
+    Wrap multi-row writes (a card saved with its formsets) in this, inside
+    the same transaction, so the card is not rebuilt, or its updated_at
+    bumped, once per changed row.
+    """
+    pending = set()
+    touched = set()
+    token = _pending_rebuilds.set(pending)
+    touch_token = _pending_touches.set(touched)
+    try:
+        yield
+    finally:
+        _pending_touches.reset(touch_token)
+        _pending_rebuilds.reset(token)
+    _touch_cards(touched)
+    rebuild_card_snapshots(pending | touched)
+
+
+def _touch_cards(card_ids):
+    if not card_ids:
+        return
+    # Template fragments and validators are keyed by the card's updated_at
+    UserCard.objects.filter(id__in=card_ids).update(updated_at=timezone.now())
+    for card_id in card_ids:
+        invalidate_card_page(card_id)
+
+
+def touch_card(card_id):
+    """
+    Mark the card changed after one of its sections did: bump updated_at,
+    drop its cached pages and refresh its snapshot, now or once at the end
+    of the enclosing ``batch_snapshot_rebuilds`` block.
+    """
+    if not card_id:
+        return
+    touched = _pending_touches.get()
+    if touched is not None:
+        touched.add(card_id)
+    else:
+        _touch_cards([card_id])
+        rebuild_card_snapshots([card_id])
+
+
+def refresh_card_snapshot(card_id):
+    """
+    Rebuild the card's snapshot in the current transaction, or at the end
+    of the enclosing ``batch_snapshot_rebuilds`` block.
+    """
+    if not card_id:
+        return
+    pending = _pending_rebuilds.get()
+    if pending is not None:
+        pending.add(card_id)
+    else:
+        rebuild_card_snapshots([card_id])
@@ -0,0 +1,143 @@
+import json
+import os
+import re
+import secrets
+import time
+
+from django.conf import settings
+from django.core.files import File
+
+
+TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{32}$")
+
+
+def _root():
+    return str(getattr(settings, "TEMP_UPLOAD_ROOT", settings.BASE_DIR / "tmp_uploads"))
+
+
+def _ttl():
+    return getattr(settings, "TEMP_UPLOAD_TTL", 60 * 60 * 6)
+
+
+def _paths(token):
+    data_path = os.path.join(_root(), token)
+    return data_path, f"{data_path}.json"
+
+
+def save_upload(uploaded_file, owner_id, content_type=None):
+    """
+    Stream an uploaded file into the temporary store.
+
+    The file is written chunk by chunk, so large uploads never sit in
+    memory, and can later be attached to a model via its token.
+    ``content_type`` is what the file is served as later; pass the type
+    detected from its contents, never the one the client sent.
+
+    Returns:
+        str: token referencing the stored file
+    """
+    os.makedirs(_root(), exist_ok=True)
+    token = secrets.token_urlsafe(24)
+    data_path, meta_path = _paths(token)
+
+    with open(data_path, "wb") as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+
+    meta = {
+        "owner": owner_id,
+        "name": os.path.basename(uploaded_file.name),
+        "content_type": content_type,
+    }
+    with open(meta_path, "w") as out:
+        json.dump(meta, out)
+
+    return token
+
+
+def _load_meta(token, owner_id):
+    if not token or not TOKEN_RE.match(token):
+        return None
+
+    data_path, meta_path = _paths(token)
+    try:
+        if time.time() - os.path.getmtime(data_path) > _ttl():
+            return None
+        with open(meta_path) as handle:
+            meta = json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("owner") != owner_id:
+        return None
+    return meta
+
+
+def upload_info(token, owner_id):
+    """
+    Return ``(path, content_type)`` for a live upload owned by ``owner_id``, or ``None``.
+    """
+    meta = _load_meta(token, owner_id)
+    if meta is None:
+        return None
+    return _paths(token)[0], meta.get("content_type")
+
+
+def open_upload(token, owner_id):
+    """
+    Open a stored upload for attaching to a FileField.
+
+    Returns:
+        File | None: file named after the original upload, or ``None`` if the
+        token is unknown, expired or owned by someone else
+    """
+    meta = _load_meta(token, owner_id)
+    if meta is None:
+        return None
+    return File(open(_paths(token)[0], "rb"), name=meta["name"])
+
+
+def delete_upload(token):
+    if not token or not TOKEN_RE.match(token):
+        return
+    for path in _paths(token):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def purge_expired_uploads(max_age=None):
+    """
+    Delete stored uploads older than ``max_age`` seconds (TEMP_UPLOAD_TTL by default).
+
+    Returns:
+        int: number of uploads removed
+    """
+    max_age = _ttl() if max_age is None else max_age
+    cutoff = time.time() - max_age
+    removed = 0
+
+    try:
+        entries = list(os.scandir(_root()))
+    except FileNotFoundError:
+        return 0
+
+    for entry in entries:
+        name = entry.name
+        token = name[:-5] if name.endswith(".json") else name
+        if not TOKEN_RE.match(token):
+            continue
+        try:
+            expired = entry.stat().st_mtime < cutoff
+        except FileNotFoundError:
+            continue
+        if expired:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            if not name.endswith(".json"):
+                removed += 1
+
+    return removed
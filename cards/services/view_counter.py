@@ -0,0 +1,230 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from cards.models import CardViewEvent, UserCard
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY_PREFIX = "card_views:pending"
+
+_buffer = Counter()
+# (card_id, viewed_at, source, referrer_host) rows for CardViewEvent
+_events = []
+_lock = threading.Lock()
+_flusher = None
+
+
+def _flush_interval():
+    return getattr(settings, "CARD_VIEWS_FLUSH_INTERVAL", 10)
+
+
+def _batch_size():
+    return getattr(settings, "CARD_VIEWS_FLUSH_BATCH_SIZE", 500)
+
+
+def _event_batch_size():
+    return getattr(settings, "CARD_VIEWS_EVENT_FLUSH_SIZE", 5000)
+
+
+def _pending_key(card_id):
+    return f"{PENDING_KEY_PREFIX}:{card_id}"
+
+
+def _pending_timeout():
+    # Pending deltas only exist for display; if a worker dies before it
+    # flushes, the stale delta must not linger forever.
+    return max(_flush_interval(), 1) * 30
+
+
+def _adjust_pending(card_id, delta):
+    key = _pending_key(card_id)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if delta > 0 and not cache.add(key, delta, _pending_timeout()):
+            cache.incr(key, delta)
+
+
+async def _aadjust_pending(card_id, delta):
+    key = _pending_key(card_id)
+    try:
+        await cache.aincr(key, delta)
+    except ValueError:
+        if delta > 0 and not await cache.aadd(key, delta, _pending_timeout()):
+            await cache.aincr(key, delta)
+
+
+def _buffer_view(card_id, source, referrer_host):
+    """
+    Returns:
+        bool: whether the buffers are full enough to flush in this request
+    """
+    with _lock:
+        _buffer[card_id] += 1
+        if source:
+            _events.append((card_id, timezone.now(), source, referrer_host))
+        # Counters grow per card, events per view; a hot card would fill a
+        # counter-sized event buffer every few hundred requests.
+        full = len(_buffer) >= _batch_size() or len(_events) >= _event_batch_size()
+
+    _ensure_flusher()
+    return full
+
+
+def record_view(card_id, source=None, referrer_host=""):
+    """
+    Buffer a view for ``card_id`` instead of updating its row right away.
+
+    With a ``source`` the view is also kept as a CardViewEvent for the
+    analytics rollups.
+    """
+    full = _buffer_view(card_id, source, referrer_host)
+    _adjust_pending(card_id, 1)
+
+    if full:
+        flush_pending_views()
+
+
+async def arecord_view(card_id, source=None, referrer_host=""):
+    full = _buffer_view(card_id, source, referrer_host)
+    await _aadjust_pending(card_id, 1)
+
+    if full:
+        await sync_to_async(flush_pending_views)()
+
+
+def get_pending_views(card_id):
+    return max(cache.get(_pending_key(card_id), 0), 0)
+
+
+def _apply_deltas(deltas):
+    # Sorted ids keep row lock order stable across concurrent flushes.
+    items = sorted(deltas.items())
+
+    if connection.vendor == "postgresql":
+        table = UserCard._meta.db_table
+        values = ", ".join(["(%s, %s)"] * len(items))
+        params = [value for item in items for value in item]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS card SET views = card.views + v.delta "
+                f"FROM (VALUES {values}) AS v(id, delta) WHERE card.id = v.id",
+                params,
+            )
+        return
+
+    UserCard.objects.filter(id__in=deltas).update(
+        views=F("views") + Case(
+            *[When(id=card_id, then=Value(delta)) for card_id, delta in items],
+            default=Value(0),
+            output_field=PositiveIntegerField(),
+        )
+    )
+
+
+def _write_events(events):
+    # A card deleted since it was viewed would fail its whole batch on the
+    # foreign key, so its events are dropped up front.
+    existing = set(
+        UserCard.objects.filter(id__in={event[0] for event in events})
+        .order_by().values_list("id", flat=True)
+    )
+    events = [event for event in events if event[0] in existing]
+
+    batch_size = _batch_size()
+    for start in range(0, len(events), batch_size):
+        batch = events[start:start + batch_size]
+        try:
+            CardViewEvent.objects.bulk_create([
+                CardViewEvent(card_id=card_id, viewed_at=viewed_at, source=source, referrer_host=referrer_host)
+                for card_id, viewed_at, source, referrer_host in batch
+            ])
+        except Exception:
+            # Analytics are best effort.
+            logger.exception("Writing %s card view events failed", len(batch))
+
+
+def flush_pending_views():
+    """
+    Write buffered view counts to the database in batched UPDATEs, and
+    buffered view events in batched INSERTs.
+
+    Returns:
+        int: Number of cards whose counters were flushed
+    """
+    with _lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+        events = _events[:]
+        _events.clear()
+
+    if events:
+        _write_events(events)
+    if not pending:
+        return 0
+
+    items = list(pending.items())
+    batch_size = _batch_size()
+    flushed = 0
+    for start in range(0, len(items), batch_size):
+        batch = dict(items[start:start + batch_size])
+        try:
+            _apply_deltas(batch)
+        except Exception:
+            logger.exception("Flushing %s card view counters failed", len(batch))
+            with _lock:
+                _buffer.update(batch)
+            continue
+
+        for card_id, delta in batch.items():
+            _adjust_pending(card_id, -delta)
+        flushed += len(batch)
+
+    return flushed
+
+
+def discard_pending_views():
+    with _lock:
+        _buffer.clear()
+        _events.clear()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(_flush_interval())
+        try:
+            flush_pending_views()
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    global _flusher
+
+    if _flush_interval() <= 0:
+        return
+    if _flusher is not None and _flusher.is_alive():
+        return
+
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            # Started lazily so each forked worker gets its own thread.
+            _flusher = threading.Thread(
+                target=_flush_loop,
+                name="card-views-flusher",
+                daemon=True,
+            )
+            _flusher.start()
+
+
+atexit.register(flush_pending_views)
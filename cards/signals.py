@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import UserSubdomain
+from core.services.subdomain_resolver import subdomain_resolver
+from .models import UserCard, Skill, Service, Portfolio
+from .services.page_cache import invalidate_card_page
+from .services.snapshots import refresh_card_snapshot, touch_card
+
+
+@receiver([post_save, post_delete], sender=UserCard)
+def invalidate_card_on_change(sender, instance, **kwargs):
+    invalidate_card_page(instance.id)
+    refresh_card_snapshot(instance.id)
+    subdomain_resolver.invalidate(card_id=instance.id)
+
+    # Drop a negative entry cached before this card was created or published
+    subdomain = (
+        UserSubdomain.objects.filter(user_id=instance.user_id)
+        .values_list("subdomain", flat=True)
+        .first()
+    )
+    subdomain_resolver.invalidate(subdomain=subdomain)
+
+
+@receiver([post_save, post_delete], sender=Skill)
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Portfolio)
+def invalidate_card_on_child_change(sender, instance, **kwargs):
+    touch_card(instance.user_card_id)
+
+
+@receiver([post_save, post_delete], sender=UserSubdomain)
+def invalidate_card_on_subdomain_change(sender, instance, **kwargs):
+    card_id = (
+        UserCard.objects.filter(user_id=instance.user_id)
+        .values_list("id", flat=True)
+        .first()
+    )
+    invalidate_card_page(card_id)
+    refresh_card_snapshot(card_id)
+    subdomain_resolver.invalidate(subdomain=instance.subdomain, card_id=card_id)
@@ -1,13 +1,41 @@
+import gzip
+import io
 import json
-from django.test import TestCase, Client
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.test import AsyncRequestFactory, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
+from django.core.management import CommandError, call_command
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.exceptions import ValidationError
 
-from .models import UserCard, Skill, Service, Portfolio
+from .models import CardSnapshot, CardViewEvent, CardViewRollup, CardViewSource, UserCard, Skill, Service, Portfolio
 from Billing.models import UserPlan, Template
 from core.forms import UserCardForm, SkillInlineFormSet, ServiceInlineFormSet, PortfolioInlineFormSet
+from asgiref.sync import sync_to_async
+from PIL import Image
+from cards.services.analytics import card_view_summary, rollup_view_events
+from cards.services.bulk_cards import ImageArchive, import_cards, iter_card_export
+from cards.services.page_cache import invalidate_card_page
+from cards.services.snapshots import batch_snapshot_rebuilds, hydrate_card
+from cards.services.upload_store import purge_expired_uploads
+from cards.services.view_counter import flush_pending_views, get_pending_views, record_view
+from cards import views
+from cards.views import view_card_async, view_card_by_subdomain_async
+from core.middleware import SubdomainMiddleware
+from core.models import UserSubdomain
+from site_management.models import SiteContext
 from core.test_utils import XLinkTestCase
 
 User = get_user_model()
@@ -151,7 +179,8 @@ class CardViewsTestCase(XLinkTestCase):
         self.assertTemplateUsed(response, 'cards/card_view.html')
         self.assertEqual(response.context['user_card'], user_card)
         
-        # Check views incremented
+        # Check views incremented once the buffer is flushed
+        flush_pending_views()
         user_card.refresh_from_db()
         self.assertEqual(user_card.views, 1)
 
@@ -167,3 +196,1007 @@ class CardViewsTestCase(XLinkTestCase):
 
         response = self.client.get(reverse('view_card', kwargs={'username': 'unpublished'}))
         self.assertEqual(response.status_code, 404)
+
+
+class CardPageCacheTestCase(XLinkTestCase):
+    """Test cases for the public card page cache"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.user_card = self.create_test_user_card(user=self.user, username="cachedcard")
+        self.url = reverse('view_card', kwargs={'username': 'cachedcard'})
+
+    def test_second_request_served_from_cache(self):
+        """Test a cache hit skips the card queries and template rendering"""
+        first = self.client.get(self.url)
+        self.assertTemplateUsed(first, 'cards/card_view.html')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_cache_hit_serves_stored_gzip_variant(self):
+        """Test a cache hit sends the stored gzip body to clients that accept it"""
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', second['Vary'])
+        self.assertEqual(gzip.decompress(second.content), first.content)
+
+    def test_cache_invalidated_on_skill_change(self):
+        """Test adding a skill evicts the cached page"""
+        self.client.get(self.url)
+        Skill.objects.create(user_card=self.user_card, name="Rust")
+
+        response = self.client.get(self.url)
+        self.assertContains(response, "Rust")
+
+    def test_cache_invalidated_on_unpublish(self):
+        """Test unpublishing a card evicts the cached page"""
+        self.client.get(self.url)
+        self.user_card.is_published = False
+        self.user_card.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+
+class CardConditionalGetTestCase(XLinkTestCase):
+    """Test cases for ETag revalidation of public cards"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.user_card = self.create_test_user_card(user=self.user, username="etagcard")
+        self.url = reverse('view_card', kwargs={'username': 'etagcard'})
+
+    def test_responses_carry_validators(self):
+        """Test rendered and cached responses share the ETag and carry no Last-Modified"""
+        first = self.client.get(self.url)
+        cached = self.client.get(self.url)
+
+        self.assertFalse(first.has_header('Last-Modified'))
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertEqual(cached['ETag'], first['ETag'])
+
+    def test_if_modified_since_alone_gets_the_page(self):
+        """Test a date-only revalidation can't pin a page from before a release"""
+        self.client.get(self.url)
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_page_revalidates_without_queries(self):
+        """Test a revalidation against the page cache returns 304 with no queries"""
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_revalidation_skips_snapshot_and_render(self):
+        """Test a page cache miss revalidates from the card's timestamp alone"""
+        first = self.client.get(self.url)
+        invalidate_card_page(self.user_card.id)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(get_pending_views(self.user_card.id), 2)
+
+    def test_child_change_changes_etag(self):
+        """Test adding a skill invalidates the client's copy"""
+        etag = self.client.get(self.url)['ETag']
+        Skill.objects.create(user_card=self.user_card, name="Go")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, "Go")
+
+    def test_site_context_change_changes_etag(self):
+        """Test a site context edit misses the page cache and changes the ETag"""
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            SiteContext.objects.create(
+                site_name="Renamed",
+                logo=SimpleUploadedFile("logo.png", b"logo", content_type="image/png"),
+                hero_section_text_part1="Part 1",
+                hero_section_text_part2="Part 2",
+                hero_section_text_description="Desc",
+                footer_section_text_part1="Footer",
+            )
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_release_changes_etag(self):
+        """Test a new release token invalidates the client's copy"""
+        etag = self.client.get(self.url)['ETag']
+
+        with mock.patch('cards.views.release_token', return_value='next'):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+class CardFragmentCacheTestCase(XLinkTestCase):
+    """Test cases for the cached card page fragments"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.user_card = self.create_test_user_card(user=self.user, username="fragmentcard")
+        Skill.objects.create(user_card=self.user_card, name="Python")
+        self.url = reverse('view_card', kwargs={'username': 'fragmentcard'})
+
+    def test_fragments_skip_section_queries(self):
+        """Test a re-render with warm fragments does not query card sections"""
+        first = self.client.get(self.url)
+        invalidate_card_page(self.user_card.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.content, first.content)
+        self.assertFalse([q for q in queries if "cards_skill" in q["sql"]])
+
+    def test_fragments_versioned_by_child_changes(self):
+        """Test a new skill bumps the card's updated_at and shows up"""
+        before = self.user_card.updated_at
+        self.client.get(self.url)
+        Skill.objects.create(user_card=self.user_card, name="Rust")
+
+        self.user_card.refresh_from_db()
+        self.assertGreater(self.user_card.updated_at, before)
+        self.assertContains(self.client.get(self.url), "Rust")
+
+
+class CardSnapshotTestCase(XLinkTestCase):
+    """Test cases for the denormalized public card snapshots"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.user_card = self.create_test_user_card(user=self.user, username="snapcard")
+        self.url = reverse('view_card', kwargs={'username': 'snapcard'})
+
+    def test_snapshot_follows_card_and_sections(self):
+        """Test snapshots are rebuilt on card, section and subdomain changes"""
+        Skill.objects.create(user_card=self.user_card, name="Go")
+        UserSubdomain.objects.create(user=self.user, subdomain="snapcard")
+
+        snapshot = CardSnapshot.objects.get(card=self.user_card)
+        self.assertEqual(snapshot.username, "snapcard")
+        self.assertEqual(snapshot.subdomain, "snapcard")
+
+        card = hydrate_card(snapshot.data)
+        self.assertEqual(card.name, self.user_card.name)
+        self.assertEqual(card.updated_at, UserCard.objects.get(id=self.user_card.id).updated_at)
+        with self.assertNumQueries(0):
+            self.assertEqual([skill.name for skill in card.skills.all()], ["Go"])
+
+    def test_public_view_reads_one_row(self):
+        """Test a page cache miss reads the snapshot, not the card tables"""
+        Skill.objects.create(user_card=self.user_card, name="Go")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertContains(response, "Go")
+        tables = [q["sql"] for q in queries if "cards_usercard" in q["sql"] or "cards_skill" in q["sql"]]
+        self.assertEqual(tables, [])
+
+    def test_batched_section_writes_touch_card_once(self):
+        """Test section rows saved in a batch bump the card and rebuild its snapshot once"""
+        stamp = UserCard.objects.get(id=self.user_card.id).updated_at
+
+        with CaptureQueriesContext(connection) as queries, batch_snapshot_rebuilds():
+            for name in ("Go", "Rust", "SQL"):
+                Skill.objects.create(user_card=self.user_card, name=name)
+
+        touches = [q for q in queries if q["sql"].startswith('UPDATE "cards_usercard"')]
+        self.assertEqual(len(touches), 1)
+        self.assertGreater(UserCard.objects.get(id=self.user_card.id).updated_at, stamp)
+        card = hydrate_card(CardSnapshot.objects.get(card=self.user_card).data)
+        self.assertEqual(sorted(skill.name for skill in card.skills.all()), ["Go", "Rust", "SQL"])
+
+    def test_unpublish_removes_snapshot(self):
+        """Test unpublished cards lose their snapshot"""
+        self.user_card.is_published = False
+        self.user_card.save()
+
+        self.assertFalse(CardSnapshot.objects.filter(card=self.user_card).exists())
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_missing_snapshot_built_on_read(self):
+        """Test a card without a snapshot is still served and backfilled"""
+        CardSnapshot.objects.all().delete()
+
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertTrue(CardSnapshot.objects.filter(card=self.user_card).exists())
+
+    def test_rebuild_command(self):
+        """Test the rebuild command backfills every published card"""
+        other = self.create_test_user_card(user=self.create_test_user(username="other"), username="othercard")
+        self.create_test_user_card(
+            user=self.create_test_user(username="draft"), username="draftcard", is_published=False
+        )
+        CardSnapshot.objects.filter(card=other).delete()
+
+        out = io.StringIO()
+        call_command('rebuild_card_snapshots', '--missing', '--chunk-size', '1', stdout=out)
+        self.assertIn("Rebuilt 1 card snapshots", out.getvalue())
+
+        CardSnapshot.objects.all().delete()
+        call_command('rebuild_card_snapshots', '--chunk-size', '1', stdout=io.StringIO())
+        self.assertEqual(
+            set(CardSnapshot.objects.values_list("username", flat=True)),
+            {"snapcard", "othercard"},
+        )
+
+
+class ViewCounterTestCase(XLinkTestCase):
+    """Test cases for the buffered card view counter"""
+
+    def setUp(self):
+        super().setUp()
+        self.user_card = self.create_test_user_card(username="countedcard", views=5)
+        self.url = reverse('view_card', kwargs={'username': 'countedcard'})
+
+    def test_views_buffered_until_flush(self):
+        """Test views are not written per request but are visible as pending"""
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        self.user_card.refresh_from_db()
+        self.assertEqual(self.user_card.views, 5)
+        self.assertEqual(get_pending_views(self.user_card.id), 2)
+        self.assertEqual(self.user_card.get_total_views(), 7)
+
+    def test_flush_writes_deltas_in_one_query(self):
+        """Test flushing applies all pending deltas with a single UPDATE (plus one card lookup and one INSERT of view events)"""
+        other_user = self.create_test_user(username="otheruser")
+        other_card = self.create_test_user_card(user=other_user, username="othercard")
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(reverse('view_card', kwargs={'username': 'othercard'}))
+
+        with self.assertNumQueries(3):
+            self.assertEqual(flush_pending_views(), 2)
+
+        self.user_card.refresh_from_db()
+        other_card.refresh_from_db()
+        self.assertEqual(self.user_card.views, 7)
+        self.assertEqual(other_card.views, 1)
+        self.assertEqual(self.user_card.get_total_views(), 7)
+
+    @override_settings(CARD_VIEWS_FLUSH_BATCH_SIZE=2, CARD_VIEWS_EVENT_FLUSH_SIZE=4)
+    def test_hot_card_events_use_their_own_threshold(self):
+        """Test views of one card flush at the event threshold, not the counter one"""
+        for _ in range(3):
+            record_view(self.user_card.id, CardViewSource.PATH)
+        self.assertEqual(CardViewEvent.objects.count(), 0)
+
+        record_view(self.user_card.id, CardViewSource.PATH)
+
+        self.assertEqual(CardViewEvent.objects.count(), 4)
+        self.user_card.refresh_from_db()
+        self.assertEqual(self.user_card.views, 9)
+
+
+
+class CardViewAnalyticsTestCase(XLinkTestCase):
+    """Test cases for card view events and their rollups"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.user_card = self.create_test_user_card(user=self.user, username="statscard")
+
+    def add_events(self, *events):
+        CardViewEvent.objects.bulk_create([
+            CardViewEvent(card=self.user_card, viewed_at=viewed_at, source=source, referrer_host=host)
+            for viewed_at, source, host in events
+        ])
+
+    def test_views_are_recorded_as_events(self):
+        """Test public views buffer an event with source and referring host"""
+        url = reverse('view_card', kwargs={'username': 'statscard'})
+        self.client.get(url, HTTP_REFERER="https://www.Instagram.com:443/p/1")
+        self.client.get(url)
+        self.assertFalse(CardViewEvent.objects.exists())
+
+        flush_pending_views()
+
+        events = list(CardViewEvent.objects.order_by("id").values_list("card_id", "source", "referrer_host"))
+        self.assertEqual(events, [
+            (self.user_card.id, CardViewSource.PATH, "instagram.com"),
+            (self.user_card.id, CardViewSource.PATH, ""),
+        ])
+
+    def test_events_of_deleted_cards_are_dropped(self):
+        """Test a card deleted before the flush doesn't lose the other cards' events"""
+        other = self.create_test_user_card(user=self.create_test_user(username="other"), username="gonecard")
+        record_view(self.user_card.id, source=CardViewSource.PATH)
+        record_view(other.id, source=CardViewSource.PATH)
+        other.delete()
+
+        flush_pending_views()
+
+        self.assertEqual(
+            list(CardViewEvent.objects.values_list("card_id", flat=True)),
+            [self.user_card.id],
+        )
+
+    def test_rollup_counts_and_prunes_events(self):
+        """Test events fold into hourly and daily rows and are then deleted"""
+        hour = timezone.localtime().replace(minute=10, second=0, microsecond=0) - timedelta(hours=1)
+        self.add_events(
+            (hour, CardViewSource.PATH, ""),
+            (hour + timedelta(minutes=5), CardViewSource.PATH, ""),
+            (hour + timedelta(minutes=5), CardViewSource.SUBDOMAIN, "t.me"),
+        )
+
+        result = rollup_view_events(chunk_size=2)
+
+        self.assertEqual(result.events, 3)
+        self.assertFalse(CardViewEvent.objects.exists())
+        hourly = CardViewRollup.objects.get(
+            card=self.user_card, period=CardViewRollup.Period.HOUR, source=CardViewSource.PATH
+        )
+        self.assertEqual(hourly.views, 2)
+        self.assertEqual(hourly.bucket, hour.replace(minute=0))
+
+        # A second run adds to the existing rows
+        self.add_events((hour, CardViewSource.PATH, ""))
+        rollup_view_events()
+        hourly.refresh_from_db()
+        self.assertEqual(hourly.views, 3)
+        daily_views = CardViewRollup.objects.filter(
+            card=self.user_card, period=CardViewRollup.Period.DAY
+        ).values_list("views", flat=True)
+        self.assertEqual(sum(daily_views), 4)
+
+    def test_rollup_drops_expired_hourly_rows(self):
+        """Test hourly rollups older than the retention window are removed"""
+        old = timezone.now() - timedelta(days=30)
+        self.add_events((old, CardViewSource.PATH, ""))
+
+        result = rollup_view_events()
+
+        self.assertEqual(result.pruned, 1)
+        self.assertEqual(
+            list(CardViewRollup.objects.values_list("period", flat=True)),
+            [CardViewRollup.Period.DAY],
+        )
+
+    def test_summary_reads_daily_rollups(self):
+        """Test the summary covers the window and groups by source and referrer"""
+        now = timezone.localtime()
+        self.add_events(
+            (now, CardViewSource.PATH, "google.com"),
+            (now, CardViewSource.SUBDOMAIN, "google.com"),
+            (now - timedelta(days=3), CardViewSource.SUBDOMAIN, ""),
+            (now - timedelta(days=20), CardViewSource.SUBDOMAIN, ""),
+        )
+        rollup_view_events()
+
+        with self.assertNumQueries(1):
+            summary = card_view_summary(self.user_card.id, days=7)
+
+        self.assertEqual(summary.total, 3)
+        self.assertEqual(len(summary.by_day), 7)
+        self.assertEqual(summary.by_day[-1], (now.date(), 2))
+        self.assertEqual(summary.by_source, {"path": 1, "subdomain": 2})
+        self.assertEqual(summary.top_referrers, [("google.com", 2), ("", 1)])
+
+    def test_analytics_api(self):
+        """Test the owner's analytics endpoint"""
+        self.add_events((timezone.now(), CardViewSource.PATH, ""))
+        rollup_view_events()
+        url = reverse('card_analytics_api')
+        self.assert_response_unauthenticated(url)
+
+        self.login_user(self.user)
+        response = self.client.get(url, {'days': '90'})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(len(data['by_day']), 90)
+        self.assertEqual(self.client.get(url, {'days': '5'}).status_code, 400)
+
+get_pending_views_async = sync_to_async(get_pending_views)
+
+
+class AsyncCardViewTestCase(XLinkTestCase):
+    """Test cases for the async public card serving path"""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+        self.user = self.create_test_user(username="asyncuser")
+        self.user_card = self.create_test_user_card(user=self.user, username="asynccard", name="Async Owner")
+        UserSubdomain.objects.create(user=self.user, subdomain="asynccard")
+
+    async def test_async_view_renders_and_caches(self):
+        """Test the async view renders a card and serves repeats from cache"""
+        url = reverse('view_card', kwargs={'username': 'asynccard'})
+        response = await view_card_async(self.factory.get(url), "asynccard")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Async Owner", response.content.decode())
+
+        cached = await view_card_async(self.factory.get(url), "asynccard")
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(await get_pending_views_async(self.user_card.id), 2)
+
+    async def test_async_subdomain_view_renders(self):
+        """Test the async subdomain view renders the resolved card"""
+        request = self.factory.get("/")
+        request.subdomain = "asynccard"
+        request.subdomain_card_id = self.user_card.id
+
+        response = await view_card_by_subdomain_async(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Async Owner", response.content.decode())
+
+    async def test_async_subdomain_revalidation(self):
+        """Test the async subdomain view answers revalidations with 304"""
+        request = self.factory.get("/")
+        request.subdomain = "asynccard"
+        request.subdomain_card_id = self.user_card.id
+        etag = (await view_card_by_subdomain_async(request))["ETag"]
+        await sync_to_async(invalidate_card_page)(self.user_card.id)
+
+        request = self.factory.get("/", headers={"If-None-Match": etag})
+        request.subdomain = "asynccard"
+        request.subdomain_card_id = self.user_card.id
+        response = await view_card_by_subdomain_async(request)
+
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_view_missing_card(self):
+        """Test the async view raises 404 for unknown cards"""
+        with self.assertRaises(Http404):
+            await view_card_async(self.factory.get("/missing/"), "missing")
+
+    async def test_middleware_resolves_subdomain_in_async_mode(self):
+        """Test SubdomainMiddleware awaits resolution when the stack is async"""
+        async def get_response(request):
+            return HttpResponse(str(request.subdomain_card_id))
+
+        middleware = SubdomainMiddleware(get_response)
+        request = self.factory.get("/")
+        request.META["HTTP_HOST"] = f"asynccard.{settings.BASE_DOMAIN}"
+        response = await middleware(request)
+
+        self.assertEqual(response.content.decode(), str(self.user_card.id))
+        self.assertEqual(request.urlconf, "config.subdomain_urls")
+
+
+def make_jpeg(size=(1600, 1200), name="photo.jpg"):
+    """Build an uploadable JPEG carrying an EXIF orientation tag"""
+    image = Image.new("RGB", size, (200, 60, 60))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees clockwise
+    exif[0x010F] = "TestCamera"
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(IMAGE_PIPELINE_WORKERS=0, IMAGE_VARIANT_WIDTHS=(320, 640, 1080, 4000))
+class ImageVariantTestCase(XLinkTestCase):
+    """Test cases for the responsive image variant pipeline"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def test_variants_built_on_upload(self):
+        """Test WebP and JPEG variants are generated, rotated and stripped"""
+        with self.captureOnCommitCallbacks(execute=True):
+            user_card = self.create_test_user_card(profile_picture=make_jpeg())
+
+        user_card.refresh_from_db()
+        variants = user_card.profile_picture_variants
+        self.assertEqual(variants["source"], user_card.profile_picture.name)
+        # Never upscaled past the (rotated) 1200px source width
+        self.assertEqual(sorted(variants["webp"], key=int), ["320", "640", "1080"])
+
+        with default_storage.open(variants["jpeg"]["640"]) as handle, Image.open(handle) as jpeg:
+            self.assertEqual(jpeg.format, "JPEG")
+            self.assertEqual(jpeg.size, (640, 853))
+            self.assertEqual(len(jpeg.getexif()), 0)
+        with default_storage.open(variants["webp"]["320"]) as handle, Image.open(handle) as webp:
+            self.assertEqual(webp.format, "WEBP")
+
+    def test_small_image_keeps_original_width(self):
+        """Test images narrower than every variant get a single full-size copy"""
+        with self.captureOnCommitCallbacks(execute=True):
+            user_card = self.create_test_user_card(profile_picture=make_jpeg(size=(100, 200)))
+
+        user_card.refresh_from_db()
+        self.assertEqual(list(user_card.profile_picture_variants["webp"]), ["200"])
+
+    def test_unreadable_image_is_skipped(self):
+        """Test a broken upload leaves the card without variants"""
+        with self.assertLogs("core.services.images", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                user_card = self.create_test_user_card()
+
+        user_card.refresh_from_db()
+        self.assertEqual(user_card.profile_picture_variants, {})
+
+    def test_stored_variants_bump_updated_at(self):
+        """Test storing variants changes the card's version so cached pages pick them up"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            user_card = self.create_test_user_card(profile_picture=make_jpeg())
+        user_card.refresh_from_db()
+        before = user_card.updated_at
+        etag = self.client.get(reverse('view_card', kwargs={'username': user_card.username}))['ETag']
+
+        for callback in callbacks:
+            callback()
+
+        user_card.refresh_from_db()
+        self.assertGreater(user_card.updated_at, before)
+        response = self.client.get(reverse('view_card', kwargs={'username': user_card.username}), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "image/webp")
+
+    def test_unchanged_image_is_not_rebuilt(self):
+        """Test saving other fields does not schedule new variants"""
+        with self.captureOnCommitCallbacks(execute=True):
+            user_card = self.create_test_user_card(profile_picture=make_jpeg())
+        user_card.refresh_from_db()
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            user_card.name = "Renamed"
+            user_card.save()
+        self.assertEqual(callbacks, [])
+
+    def test_replaced_and_deleted_images_drop_variants(self):
+        """Test variant files are removed when their image is replaced or its row deleted"""
+        with self.captureOnCommitCallbacks(execute=True):
+            user_card = self.create_test_user_card(profile_picture=make_jpeg())
+        user_card.refresh_from_db()
+        old_files = list(user_card.profile_picture_variants["webp"].values())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user_card.profile_picture = make_jpeg(size=(400, 300), name="new.jpg")
+            user_card.save()
+        user_card.refresh_from_db()
+        new_files = list(user_card.profile_picture_variants["webp"].values())
+
+        self.assertFalse(any(default_storage.exists(name) for name in old_files))
+        self.assertTrue(all(default_storage.exists(name) for name in new_files))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user_card.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in new_files))
+
+    def test_cleared_image_drops_variants(self):
+        """Test clearing an image removes its variants and their record"""
+        with self.captureOnCommitCallbacks(execute=True):
+            user_card = self.create_test_user_card(profile_picture=make_jpeg())
+        user_card.refresh_from_db()
+        files = list(user_card.profile_picture_variants["jpeg"].values())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user_card.profile_picture = None
+            user_card.save()
+
+        user_card.refresh_from_db()
+        self.assertEqual(user_card.profile_picture_variants, {})
+        self.assertFalse(any(default_storage.exists(name) for name in files))
+
+    def test_card_page_renders_picture_srcset(self):
+        """Test the public card emits WebP and JPEG srcsets"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_test_user_card(username="pictured", profile_picture=make_jpeg())
+
+        response = self.client.get(reverse('view_card', kwargs={'username': 'pictured'}))
+        content = response.content.decode()
+        self.assertIn('<source type="image/webp" srcset="', content)
+        self.assertIn("-640.jpg 640w", content)
+
+
+class TemporaryUploadTestCase(XLinkTestCase):
+    """Test cases for token-based image uploads in the card builder"""
+
+    def setUp(self):
+        super().setUp()
+        upload_root = tempfile.mkdtemp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.upload_root = upload_root
+        paths_override = override_settings(TEMP_UPLOAD_ROOT=upload_root, MEDIA_ROOT=media_root)
+        paths_override.enable()
+        self.addCleanup(paths_override.disable)
+
+        self.user = self.create_test_user()
+        self.template = self.create_test_template()
+        self.login_user(self.user)
+
+    def upload(self, name="photo.jpg"):
+        response = self.client.post(reverse('temp_image_upload'), {'file': make_jpeg(size=(64, 64), name=name)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["token"]
+
+    def builder_data(self, **extra):
+        data = {
+            'username': 'tokencard',
+            'name': 'Token User',
+            'template': self.template.id,
+            'color': UserCard.COLOR_CHOICES[0][0],
+        }
+        for prefix in ('skill', 'service', 'portfolio'):
+            data[f'{prefix}-TOTAL_FORMS'] = 0
+            data[f'{prefix}-INITIAL_FORMS'] = 0
+        data.update(extra)
+        return data
+
+    def test_upload_returns_token_and_preview(self):
+        """Test an uploaded image can be previewed by its owner only"""
+        token = self.upload()
+
+        preview_url = reverse('temp_image_preview', kwargs={'token': token})
+        response = self.client.get(preview_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        response.close()
+
+        self.login_user(self.create_test_user(username="other"))
+        self.assertEqual(self.client.get(preview_url).status_code, 404)
+
+    def test_preview_ignores_client_content_type(self):
+        """Test previews are served as the type Pillow detected, with nosniff"""
+        upload = SimpleUploadedFile("photo.jpg", make_jpeg(size=(64, 64)).read(), content_type="text/html")
+        token = self.client.post(reverse('temp_image_upload'), {'file': upload}).json()["token"]
+
+        response = self.client.get(reverse('temp_image_preview', kwargs={'token': token}))
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        response.close()
+
+    def test_upload_rejects_non_images(self):
+        """Test the upload endpoint validates the file"""
+        response = self.client.post(reverse('temp_image_upload'), {'file': self.test_image})
+        self.assertEqual(response.status_code, 400)
+
+    def test_builder_saves_card_from_token(self):
+        """Test the builder attaches a token's image and removes the temp file"""
+        token = self.upload()
+
+        response = self.client.post(reverse('card_builder'), self.builder_data(profile_picture_token=token))
+
+        user_card = UserCard.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('card_success', kwargs={'card_id': user_card.id}), fetch_redirect_response=False)
+        self.assertTrue(user_card.profile_picture.name.startswith("profile_pics/photo"))
+        self.assertEqual(os.listdir(self.upload_root), [])
+
+    def test_builder_saves_portfolio_image_from_token(self):
+        """Test portfolio items accept image tokens too"""
+        token = self.upload(name="work.jpg")
+        data = self.builder_data(
+            profile_picture_token=self.upload(),
+            **{
+                'portfolio-TOTAL_FORMS': 1,
+                'portfolio-0-title': 'Work',
+                'portfolio-0-image_token': token,
+            },
+        )
+
+        self.client.post(reverse('card_builder'), data)
+
+        portfolio = Portfolio.objects.get(user_card__user=self.user)
+        self.assertTrue(portfolio.image.name.startswith("portfolio/work"))
+
+    def test_builder_rejects_foreign_token(self):
+        """Test tokens owned by another user are refused"""
+        token = self.upload()
+        self.login_user(self.create_test_user(username="other"))
+
+        response = self.client.post(reverse('card_builder'), self.builder_data(profile_picture_token=token))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('profile_picture', response.context['form'].errors)
+        self.assertFalse(UserCard.objects.exists())
+
+    def test_purge_removes_expired_uploads(self):
+        """Test expired uploads are garbage-collected"""
+        self.upload()
+        self.assertEqual(purge_expired_uploads(), 0)
+        self.assertEqual(purge_expired_uploads(max_age=-1), 1)
+        self.assertEqual(os.listdir(self.upload_root), [])
+
+
+class CardQueryBudgetTestCase(XLinkTestCase):
+    """Test cases keeping card views within their declared query budgets"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.user_card = self.create_test_user_card(user=self.user, username="budgetcard")
+        UserSubdomain.objects.create(user=self.user, subdomain="budgetcard")
+        for index in range(5):
+            Skill.objects.create(user_card=self.user_card, name=f"Skill {index}")
+            Service.objects.create(user_card=self.user_card, title=f"Service {index}")
+            Portfolio.objects.create(user_card=self.user_card, title=f"Work {index}", image=self.test_image)
+
+    def test_public_card_budget(self):
+        """Test the public card stays in budget cold and is query-free when cached"""
+        url = reverse('view_card', kwargs={'username': 'budgetcard'})
+        self.assert_within_query_budget(self.client.get(url))
+
+        metrics = self.assert_within_query_budget(self.client.get(url))
+        self.assertEqual(metrics.queries, 0)
+        self.assertEqual(metrics.lookup_hits, 1)
+
+    def test_subdomain_card_budget(self):
+        """Test the subdomain card view stays in budget"""
+        response = self.client.get("/", HTTP_HOST=f"budgetcard.{settings.BASE_DOMAIN}")
+        self.assertEqual(response.status_code, 200)
+        self.assert_within_query_budget(response)
+
+    def test_card_builder_budget(self):
+        """Test the builder does not query per skill, service or portfolio item"""
+        self.login_user(self.user)
+        self.assert_within_query_budget(self.client.get(reverse('card_builder')))
+
+    def test_card_builder_post_budget(self):
+        """Test builder submissions are measured against their own budget"""
+        self.login_user(self.user)
+        response = self.client.post(reverse('card_builder'), {})
+        metrics = self.assert_within_query_budget(response)
+        self.assertEqual(metrics.query_budget, views.card_builder_view.method_query_budgets["POST"])
+
+    def test_card_success_budget(self):
+        """Test the success page stays in budget"""
+        self.login_user(self.user)
+        url = reverse('card_success', kwargs={'card_id': self.user_card.id})
+        self.assert_within_query_budget(self.client.get(url))
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Test request metrics are exposed as a Server-Timing header"""
+        response = self.client.get(reverse('view_card', kwargs={'username': 'budgetcard'}))
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertIn('tpl;dur=', response["Server-Timing"])
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=False)
+    def test_server_timing_header_disabled(self):
+        """Test the Server-Timing header is only sent when enabled"""
+        response = self.client.get(reverse('view_card', kwargs={'username': 'budgetcard'}))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_over_budget_is_logged(self):
+        """Test a view exceeding its budget logs a warning"""
+        url = reverse('view_card', kwargs={'username': 'budgetcard'})
+        with mock.patch.object(views.view_card, "query_budget", 1):
+            with self.assertLogs("core.middleware", "WARNING") as logs:
+                self.client.get(url)
+        self.assertIn("Query budget exceeded", logs.output[0])
+
+
+@override_settings(IMAGE_PIPELINE_WORKERS=0)
+class BulkCardImportTestCase(XLinkTestCase):
+    """Test cases for bulk card import and export"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.images = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.images, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        os.makedirs(os.path.join(self.images, "team"))
+        for name in ("team/ali.jpg", "team/project.jpg"):
+            with open(os.path.join(self.images, name), "wb") as fh:
+                fh.write(make_jpeg(size=(64, 64)).read())
+
+    def _record(self, username, **fields):
+        record = {
+            "username": username,
+            "name": f"Employee {username}",
+            "profile_picture": "team/ali.jpg",
+        }
+        record.update(fields)
+        return record
+
+    def _import(self, records, **kwargs):
+        lines = [json.dumps(record) + "\n" for record in records]
+        return import_cards(lines, "jsonl", archive=ImageArchive(self.images), **kwargs)
+
+    def test_import_creates_cards_with_sections(self):
+        """Test a record becomes a user, subdomain, published card and sections"""
+        result = self._import([self._record(
+            "acme-ali",
+            phone="09120000001",
+            skills=["Sales", "CRM"],
+            services=[{"title": "Consulting", "description": "B2B"}],
+            portfolio=[{"title": "Launch", "image": "team/project.jpg", "url": "https://acme.ir"}],
+        )])
+
+        self.assertEqual((result.created, result.errors), (1, []))
+        user = User.objects.get(username="acme-ali")
+        self.assertEqual(user.phone, "09120000001")
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.get_active_plans(), ["Free"])
+        self.assertEqual(user.subdomain.subdomain, "acme-ali")
+
+        card = user.user_card
+        self.assertEqual(list(card.skills.values_list("name", flat=True)), ["Sales", "CRM"])
+        self.assertEqual(card.services.get().description, "B2B")
+        self.assertTrue(default_storage.exists(card.portfolio_items.get().image.name))
+        self.assertTrue(CardSnapshot.objects.filter(card=card).exists())
+
+        response = self.client.get(reverse('view_card', kwargs={'username': 'acme-ali'}))
+        self.assertContains(response, "Consulting")
+
+    def test_invalid_and_taken_records_are_reported(self):
+        """Test bad records are rejected with their line while the rest import"""
+        self.create_test_user_card(username="taken")
+        result = self._import([
+            self._record("acme-one"),
+            self._record("taken"),
+            self._record("acme-one"),
+            self._record("ab", phone="123"),
+            self._record("acme-two", profile_picture="team/missing.jpg"),
+        ])
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual([error.line for error in result.errors], [4, 5, 2, 3])
+        self.assertEqual(set(result.errors[0].errors), {"username", "phone"})
+        self.assertIn("profile_picture", result.errors[1].errors)
+        self.assertFalse(User.objects.filter(username="acme-two").exists())
+
+    def test_batch_validation_queries_do_not_grow_with_records(self):
+        """Test a dry run checks collisions with a fixed number of queries"""
+        records = [self._record(f"acme-{index}", phone=f"0912000{index:04d}") for index in range(20)]
+
+        with self.assertNumQueries(3):
+            result = self._import(records, dry_run=True)
+
+        self.assertEqual(result.created, 20)
+        self.assertFalse(UserCard.objects.exists())
+
+    def test_import_command_reads_csv(self):
+        """Test import_cards reads CSV with pipe-separated skills"""
+        path = os.path.join(self.images, "cards.csv")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("username,name,profile_picture,skills\n")
+            fh.write("acme-csv,Csv User,team/ali.jpg,Go|Rust\n")
+
+        out = io.StringIO()
+        call_command("import_cards", path, images=self.images, stdout=out)
+
+        self.assertIn("Imported 1 cards", out.getvalue())
+        card = UserCard.objects.get(username="acme-csv")
+        self.assertEqual(list(card.skills.values_list("name", flat=True)), ["Go", "Rust"])
+
+    def test_import_command_rejects_missing_images(self):
+        """Test --images must be an existing directory or a zip file"""
+        path = os.path.join(self.images, "cards.jsonl")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps(self._record("noimages")) + "\n")
+
+        for images in (os.path.join(self.images, "missing"), os.path.join(self.images, "team/ali.jpg")):
+            with self.assertRaises(CommandError):
+                call_command("import_cards", path, images=images, stdout=io.StringIO())
+
+    def test_export_round_trips_through_import(self):
+        """Test exported CSV re-imports the same card from MEDIA_ROOT"""
+        user_card = self.create_test_user_card(username="roundtrip", short_bio="Exported")
+        Skill.objects.create(user_card=user_card, name="Go")
+        Service.objects.create(user_card=user_card, title="Audit", description="Yearly")
+
+        exported = "".join(iter_card_export("csv"))
+        user_card.user.delete()
+
+        result = import_cards(
+            io.StringIO(exported),
+            "csv",
+            archive=ImageArchive(settings.MEDIA_ROOT),
+        )
+
+        self.assertEqual((result.created, result.errors), (1, []))
+        card = UserCard.objects.get(username="roundtrip")
+        self.assertEqual(card.short_bio, "Exported")
+        self.assertEqual(list(card.skills.values_list("name", flat=True)), ["Go"])
+        self.assertEqual(card.services.get().description, "Yearly")
+
+    def test_export_api_is_staff_only(self):
+        """Test the export API streams JSONL to staff and refuses other users"""
+        user_card = self.create_test_user_card(username="exported")
+        self.login_user(user_card.user)
+        url = reverse('bulk_export_cards_api')
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        User.objects.filter(pk=user_card.user.pk).update(is_staff=True)
+        response = self.client.get(url)
+        records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record["username"] for record in records], ["exported"])
+
+    def _staff_client(self):
+        staff = self.create_test_user(username="importer")
+        User.objects.filter(pk=staff.pk).update(is_staff=True)
+        self.login_user(staff)
+
+    def test_import_api_rejects_non_zip_images(self):
+        """Test an images upload that is not a zip is a 400, not a server error"""
+        self._staff_client()
+        response = self.client.post(reverse('bulk_import_cards_api'), {
+            'file': SimpleUploadedFile("cards.jsonl", json.dumps(self._record("nozip")).encode()),
+            'images': SimpleUploadedFile("images.tar", b"not a zip"),
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserCard.objects.filter(username="nozip").exists())
+
+    @override_settings(CARD_IMPORT_SYNC_MAX_SIZE=0, CARD_IMPORT_WORKERS=0)
+    def test_large_import_runs_as_job(self):
+        """Test an import over the synchronous limit is queued and reported by job id"""
+        self._staff_client()
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.write(os.path.join(self.images, "team/ali.jpg"), "team/ali.jpg")
+
+        response = self.client.post(reverse('bulk_import_cards_api'), {
+            'file': SimpleUploadedFile("cards.jsonl", json.dumps(self._record("queued")).encode()),
+            'images': SimpleUploadedFile("images.zip", archive.getvalue()),
+        })
+
+        self.assertEqual(response.status_code, 202)
+        report = self.client.get(response.json()['status_url']).json()
+        self.assertEqual((report['status'], report['created'], report['rejected']), ("done", 1, 0))
+        self.assertTrue(UserCard.objects.filter(username="queued").exists())
+
+    def _cp1256_upload(self):
+        records = json.dumps(self._record("first")) + "\n" + json.dumps(self._record("دوم"), ensure_ascii=False) + "\n"
+        return SimpleUploadedFile("cards.jsonl", records.encode("cp1256"))
+
+    def test_import_api_rejects_non_utf8_file(self):
+        """Test a file in another encoding is a 400 naming the line, and nothing is imported"""
+        self._staff_client()
+        response = self.client.post(reverse('bulk_import_cards_api'), {'file': self._cp1256_upload()})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['line'], 2)
+        self.assertFalse(UserCard.objects.exists())
+
+    @override_settings(CARD_IMPORT_SYNC_MAX_SIZE=0, CARD_IMPORT_WORKERS=0)
+    def test_failed_job_reports_its_error(self):
+        """Test a queued import that can't be read fails with the reason in its status"""
+        self._staff_client()
+        response = self.client.post(reverse('bulk_import_cards_api'), {'file': self._cp1256_upload()})
+
+        report = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(report, {'status': 'failed', 'error': 'Line 2 is not valid UTF-8.'})
+        self.assertFalse(UserCard.objects.exists())
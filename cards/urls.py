@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Public card traffic uses the async views when served by config.asgi.
+view_card = views.view_card_async if settings.ASYNC_PUBLIC_CARDS else views.view_card
+
 urlpatterns = [
     # Card Builder and Management
     path('card/builder/', views.card_builder_view, name='card_builder'),
@@ -13,7 +17,13 @@ urlpatterns = [
     path('api/service/add/', views.add_service_ajax, name='add_service_ajax'),
     path('api/service/<int:service_id>/delete/', views.delete_service_ajax, name='delete_service_ajax'),
     path('api/portfolio/<int:portfolio_id>/delete/', views.delete_portfolio_ajax, name='delete_portfolio_ajax'),
+    path('api/analytics/', views.card_analytics_api, name='card_analytics_api'),
+    path('api/cards/import/', views.bulk_import_cards_api, name='bulk_import_cards_api'),
+    path('api/cards/import/<str:job_id>/', views.bulk_import_status_api, name='bulk_import_status_api'),
+    path('api/cards/export/', views.bulk_export_cards_api, name='bulk_export_cards_api'),
+    path('api/upload/', views.upload_temp_image, name='temp_image_upload'),
+    path('api/upload/<str:token>/', views.temp_image_preview, name='temp_image_preview'),
     # Deprecated fallback route during migration to subdomain architecture.
-    path('<str:username>/', views.view_card, name='view_card'),
+    path('<str:username>/', view_card, name='view_card'),
 
 ]
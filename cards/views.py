@@ -1,24 +1,68 @@
 import json
 import logging
-import base64
-from django.core.files.base import ContentFile
+import zipfile
+from asgiref.sync import sync_to_async
 
 # Django imports
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import F
 
 # Third-party imports
 from environs import Env
+from PIL import Image
 
 # Local app imports
-from core.models import UserPlan
+from core.services.compression import compress_level, compress_variants, variant_response
+from core.services.conditional import (
+    aget_site_token,
+    get_site_token,
+    is_conditional,
+    not_modified_response,
+    release_token,
+    set_version_headers,
+    version_etag,
+)
+from core.services.entitlements import get_entitlements
+from core.services.request_metrics import query_budget
 from core.services.subdomains import assign_subdomain_to_user
-from cards.models import UserCard, Skill, Service, Portfolio, Template
-from core.forms import UserCardForm, SkillInlineFormSet, ServiceInlineFormSet, PortfolioInlineFormSet
+from core.services.template_catalog import get_template_catalog
+from cards.models import UserCard, Skill, Service, Portfolio
+from cards.services.analytics import SOURCE_BY_LOOKUP, card_view_summary, referrer_host
+from cards.services.bulk_cards import (
+    CONTENT_TYPES,
+    FORMATS,
+    ImageArchive,
+    ImportEncodingError,
+    decode_lines,
+    format_for,
+    get_import_job,
+    import_cards,
+    import_report,
+    iter_card_export,
+    queue_import,
+)
+from cards.services.upload_store import save_upload, upload_info
+from cards.services.page_cache import aget_cached_page, get_cached_page, set_cached_page
+from cards.services.snapshots import (
+    aget_card_snapshot,
+    batch_snapshot_rebuilds,
+    get_card_snapshot,
+    hydrate_card,
+)
+from cards.services.view_counter import arecord_view, record_view
+from core.forms import (
+    UserCardForm,
+    SkillInlineFormSet,
+    ServiceInlineFormSet,
+    PortfolioInlineFormSet,
+    TemporaryImageUploadForm,
+)
 
 # Logger setup
 logger = logging.getLogger(__name__)
@@ -27,41 +71,60 @@ logger = logging.getLogger(__name__)
 env = Env()
 env.read_env()
 
-def base64_file(data, name):
-    if not data or not data.startswith('data:image'):
-        return None
-    
-    try:
-        format, imgstr = data.split(';base64,')
-        ext = format.split('/')[-1]
-        return ContentFile(base64.b64decode(imgstr), name=f'{name}.{ext}')
-    except Exception:
-        return None
+@login_required
+@require_http_methods(["POST"])
+def upload_temp_image(request):
+    """
+    Store an image picked in the card builder and return its token.
+
+    The builder submits tokens instead of re-sending the files, so an image
+    is uploaded once no matter how often the form is re-rendered.
+    """
+    form = TemporaryImageUploadForm(files=request.FILES)
+    if not form.is_valid():
+        return JsonResponse({"success": False, "errors": form.errors}, status=400)
+
+    image = form.cleaned_data["file"]
+    # ImageField verified the file with Pillow; serve it as what Pillow found
+    token = save_upload(image, request.user.pk, content_type=Image.MIME.get(image.image.format))
+    return JsonResponse({
+        "success": True,
+        "token": token,
+        "url": reverse("temp_image_preview", kwargs={"token": token}),
+    })
+
+
+@login_required
+@compress_level(0)  # already-compressed image bytes
+def temp_image_preview(request, token):
+    info = upload_info(token, request.user.pk)
+    if info is None:
+        raise Http404("Upload not found")
+
+    path, content_type = info
+    if not (content_type or "").startswith("image/"):
+        content_type = "application/octet-stream"
+    response = FileResponse(open(path, "rb"), content_type=content_type)
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+def _release_uploads(form, portfolio_formset, delete=True):
+    form.release_uploads(delete=delete)
+    for p_form in portfolio_formset:
+        p_form.release_uploads(delete=delete)
+
 
 @login_required
+@query_budget(12, post=55)
 def card_builder_view(request):
-    user_card = (
-        UserCard.objects
-        .prefetch_related(
-            'skills',
-            'services',
-            'portfolio_items'
-        )
-        .filter(user=request.user)
-        .first()
-    )
-    
-    # Optimize plan checks - one query instead of multiple
-    user_plans_list = list(request.user.plan.all())
-    user_plan_values = {p.value for p in user_plans_list}
-    user_plan_ids = {p.id for p in user_plans_list}
+    # The inline formsets query their own rows, so nothing is prefetched here
+    user_card = UserCard.objects.filter(user=request.user).first()
     
-    has_pro_plan = UserPlan.PlanChoices.Pro in user_plan_values
-    has_basic_plan = UserPlan.PlanChoices.Basic in user_plan_values
-    can_use_custom_colors = has_pro_plan or has_basic_plan
+    entitlements = get_entitlements(request.user)
+    has_pro_plan = entitlements.has_pro_plan
 
     if request.method == 'POST':
-        form = UserCardForm(request.POST, request.FILES, instance=user_card)
+        form = UserCardForm(request.POST, request.FILES, instance=user_card, upload_owner=request.user)
         
         # Assign user before validation so clean() can check plan permissions
         if not user_card:
@@ -69,7 +132,13 @@ def card_builder_view(request):
             
         skill_formset = SkillInlineFormSet(request.POST, instance=user_card, prefix='skill')
         service_formset = ServiceInlineFormSet(request.POST, instance=user_card, prefix='service')
-        portfolio_formset = PortfolioInlineFormSet(request.POST, request.FILES, instance=user_card, prefix='portfolio')
+        portfolio_formset = PortfolioInlineFormSet(
+            request.POST,
+            request.FILES,
+            instance=user_card,
+            prefix='portfolio',
+            form_kwargs={'upload_owner': request.user},
+        )
 
         if (
             form.is_valid()
@@ -80,43 +149,30 @@ def card_builder_view(request):
             card = form.save(commit=False)
             card.user = request.user
 
-            # Handle persisted profile picture if no new file uploaded
-            if not request.FILES.get('profile_picture'):
-                persisted_data = form.cleaned_data.get('profile_picture_data')
-                if persisted_data:
-                    card.profile_picture = base64_file(persisted_data, f"profile_{request.user.id}")
-
             if has_pro_plan:
                 card.black_background = bool(request.POST.get("black_bg"))
                 card.stars_background = bool(request.POST.get("stars_bg"))
                 card.blue_tick = bool(request.POST.get("blue_tick"))
 
-            subdomain_result = assign_subdomain_to_user(request.user, card.username)
-            if not subdomain_result.available:
-                messages.error(request, f"Subdomain error: {subdomain_result.reason}")
-                return redirect("card_builder")
-            card.save()
+            # Save everything together and rebuild the public snapshot once
+            with transaction.atomic(), batch_snapshot_rebuilds():
+                subdomain_result = assign_subdomain_to_user(request.user, card.username)
+                if not subdomain_result.available:
+                    _release_uploads(form, portfolio_formset, delete=False)
+                    messages.error(request, f"Subdomain error: {subdomain_result.reason}")
+                    return redirect("card_builder")
+                card.save()
 
-            skill_formset.instance = card
-            skill_formset.save()
+                skill_formset.instance = card
+                skill_formset.save()
 
-            service_formset.instance = card
-            service_formset.save()
+                service_formset.instance = card
+                service_formset.save()
 
-            portfolio_formset.instance = card
-            
-            # Handle persisted portfolio images
-            for p_form in portfolio_formset:
-                if p_form.is_valid() and not p_form.cleaned_data.get('DELETE'):
-                    if not p_form.cleaned_data.get('image'):
-                        p_img_data = p_form.cleaned_data.get('image_data')
-                        if p_img_data:
-                            p_instance = p_form.save(commit=False)
-                            p_instance.image = base64_file(p_img_data, f"portfolio_{p_instance.title or 'item'}")
-                            # The formset.save() will handle the actual save, 
-                            # but we need to ensure the image is set on the instance.
-
-            portfolio_formset.save()
+                portfolio_formset.instance = card
+                portfolio_formset.save()
+
+            _release_uploads(form, portfolio_formset)
 
             logger.info(
                 "Card saved for user %s, card_id=%s",
@@ -125,6 +181,8 @@ def card_builder_view(request):
             )
             return redirect('card_success', card_id=card.id)
         else:
+            # Keep the stored uploads: their tokens are re-rendered into the form
+            _release_uploads(form, portfolio_formset, delete=False)
             messages.error(request, "خطایی در اطلاعات وارد شده وجود دارد. لطفا فیلدها را بررسی کنید.")
             logger.warning(
                 "Card form validation failed for user %s",
@@ -141,15 +199,9 @@ def card_builder_view(request):
         service_formset = ServiceInlineFormSet(instance=user_card, prefix='service')
         portfolio_formset = PortfolioInlineFormSet(instance=user_card, prefix='portfolio')
 
-    templates = Template.objects.prefetch_related("allowed_plans")
-
-    for t in templates:
-        # Optimize by checking in memory instead of triggering queries in a loop
-        allowed_plan_ids = {p.id for p in t.allowed_plans.all()}
-        t.is_allowed = (
-                not allowed_plan_ids or
-                not allowed_plan_ids.isdisjoint(user_plan_ids)
-        )
+    # Plan restrictions are precomputed in the shared template catalog
+    templates = get_template_catalog().templates
+    allowed_template_ids = entitlements.allowed_template_ids
 
     context = {
         'form': form,
@@ -157,15 +209,17 @@ def card_builder_view(request):
         'service_formset': service_formset,
         'portfolio_formset': portfolio_formset,
         'templates': templates,
+        'allowed_template_ids': allowed_template_ids,
         'has_pro_plan':has_pro_plan,
-        'has_basic_plan': has_basic_plan,
-        'can_use_custom_colors': can_use_custom_colors,
+        'has_basic_plan': entitlements.has_basic_plan,
+        'can_use_custom_colors': entitlements.can_use_custom_colors,
         'color_choices': UserCard.COLOR_CHOICES
     }
 
     return render(request, 'cards/card_builder.html', context)
 
 @login_required
+@query_budget(9)
 def card_success_view(request, card_id):
     user_card = get_object_or_404(
         UserCard.objects.prefetch_related("skills", "services", "portfolio_items"),
@@ -181,35 +235,304 @@ def card_success_view(request, card_id):
         'card_url': card_url,
     })
 
-def view_card(request, username):
-    user_card = get_object_or_404(
-        UserCard.objects.prefetch_related("skills", "services", "portfolio_items"),
-        username=username,
-        is_published=True
-    )
+@login_required
+@require_http_methods(["GET"])
+@query_budget(5)
+def card_analytics_api(request):
+    """Views of the user's card over the last 7, 30 or 90 days"""
+    days = request.GET.get('days', '30')
+    if days not in ('7', '30', '90'):
+        return JsonResponse({'error': 'days must be 7, 30 or 90'}, status=400)
+
+    card_id = UserCard.objects.filter(user=request.user).values_list('id', flat=True).first()
+    if card_id is None:
+        return JsonResponse({'error': 'User card not found'}, status=404)
 
-    UserCard.objects.filter(id=user_card.id).update(views=F('views') + 1)
+    summary = card_view_summary(card_id, int(days))
+    return JsonResponse({
+        'days': summary.days,
+        'total': summary.total,
+        'by_day': [{'date': day.isoformat(), 'views': views} for day, views in summary.by_day],
+        'by_source': summary.by_source,
+        'top_referrers': [{'host': host, 'views': views} for host, views in summary.top_referrers],
+    })
 
-    context = {
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_import_cards_api(request):
+    """
+    Staff-only bulk import of a CSV/JSONL ``file``, with the images it
+    references in an ``images`` zip.
+
+    Uploads over CARD_IMPORT_SYNC_MAX_SIZE are queued as a background job
+    and answered with 202 and the job's status URL.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'file is required'}, status=400)
+    fmt = request.POST.get('format') or format_for(upload.name)
+    if fmt not in FORMATS:
+        return JsonResponse({'error': 'format must be csv or jsonl'}, status=400)
+
+    images = request.FILES.get('images')
+    if images is not None and not zipfile.is_zipfile(images):
+        return JsonResponse({'error': 'images must be a zip file'}, status=400)
+    dry_run = request.POST.get('dry_run') == 'true'
+
+    size = upload.size + (images.size if images is not None else 0)
+    if size > settings.CARD_IMPORT_SYNC_MAX_SIZE:
+        job_id = queue_import(upload, fmt, images=images, dry_run=dry_run)
+        logger.info("Bulk import job %s queued by %s", job_id, request.user.username)
+        return JsonResponse({
+            'job': job_id,
+            'status_url': reverse('bulk_import_status_api', kwargs={'job_id': job_id}),
+        }, status=202)
+
+    try:
+        # Small enough to hold; decoding first keeps a bad line from
+        # failing the import after earlier batches were saved.
+        lines = list(decode_lines(upload))
+    except ImportEncodingError as exc:
+        return JsonResponse({'error': str(exc), 'line': exc.line}, status=400)
+
+    archive = ImageArchive(images) if images is not None else None
+    try:
+        result = import_cards(lines, fmt, archive=archive, dry_run=dry_run)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    logger.info("Bulk import by %s: %d cards, %d rejected", request.user.username, result.created, len(result.errors))
+    return JsonResponse(import_report(result))
+
+
+@login_required
+@require_http_methods(["GET"])
+def bulk_import_status_api(request, job_id):
+    """Staff-only status and report of a queued bulk import"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+
+    job = get_import_job(job_id)
+    if job is None:
+        return JsonResponse({'error': 'Unknown or expired import job'}, status=404)
+    return JsonResponse(job)
+
+
+@login_required
+@require_http_methods(["GET"])
+def bulk_export_cards_api(request):
+    """Staff-only streaming export of every card as CSV or JSONL"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in FORMATS:
+        return JsonResponse({'error': 'format must be csv or jsonl'}, status=400)
+
+    response = StreamingHttpResponse(iter_card_export(fmt), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="cards.{fmt}"'
+    return response
+
+
+def _record_view(request, card_id, lookup):
+    record_view(card_id, SOURCE_BY_LOOKUP[lookup], referrer_host(request))
+
+
+def _card_etag(card_id, updated_at, lookup, site_token):
+    # Child rows bump the card's updated_at (cards.signals), so the card
+    # stamp versions the card's content. The lookup picks the home link;
+    # the release and site tokens cover templates, static names and logo.
+    return version_etag("card", card_id, lookup, updated_at.isoformat(), release_token(), site_token)
+
+
+def _versioned_card_response(request, variants, card_id, updated_at, lookup, site_token):
+    etag = _card_etag(card_id, updated_at, lookup, site_token)
+    response = not_modified_response(request, etag)
+    if response is None:
+        response = set_version_headers(variant_response(request, variants), etag)
+    return response
+
+
+def _cached_card_response(request, lookup, value):
+    """
+    Serve a public card straight from the page cache, skipping the card
+    queries and template rendering. Returns None on a cache miss.
+    """
+    cached = get_cached_page(lookup, value)
+    if cached is None:
+        return None
+
+    card_id, variants, updated_at, site_token = cached
+    _record_view(request, card_id, lookup)
+    return _versioned_card_response(request, variants, card_id, updated_at, lookup, site_token)
+
+
+def _card_version_query(card_lookup):
+    return UserCard.objects.filter(is_published=True, **card_lookup).values_list("id", "updated_at")
+
+
+def _revalidate_card(request, lookup, **card_lookup):
+    """
+    Answer a conditional request with a 304 from one indexed query on the
+    card's updated_at, without loading its snapshot or rendering.
+    """
+    if not is_conditional(request):
+        return None
+    version = _card_version_query(card_lookup).first()
+    if version is None:
+        return None
+
+    card_id, updated_at = version
+    etag = _card_etag(card_id, updated_at, lookup, get_site_token())
+    response = not_modified_response(request, etag)
+    if response is not None:
+        _record_view(request, card_id, lookup)
+    return response
+
+
+def _card_page_context(user_card, home_url):
+    return {
         'user_card': user_card,
+        'home_url': home_url,
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
     }
 
-    return render(request, 'cards/card_view.html', context)
 
+def _get_published_card(**lookup):
+    # One indexed row holds the card and its sections (cards.services.snapshots)
+    snapshot = get_card_snapshot(**lookup)
+    if snapshot is None:
+        raise Http404("No UserCard matches the given query.")
+    return hydrate_card(snapshot.data)
+
+
+def _render_public_card(request, user_card, lookup, value, home_url):
+    _record_view(request, user_card.id, lookup)
+    site_token = get_site_token()
+    response = render(request, 'cards/card_view.html', _card_page_context(user_card, home_url))
+    # Compressed once here; cache hits send the stored bytes.
+    variants = compress_variants(response.content)
+    set_cached_page(user_card.id, lookup, value, variants, user_card.updated_at, site_token)
+    return _versioned_card_response(request, variants, user_card.id, user_card.updated_at, lookup, site_token)
 
+
+@query_budget(6)
+def view_card(request, username):
+    response = _cached_card_response(request, "username", username)
+    if response is None:
+        response = _revalidate_card(request, "username", username=username)
+    if response is not None:
+        return response
+
+    user_card = _get_published_card(username=username)
+    return _render_public_card(request, user_card, "username", username, reverse("home"))
+
+
+@query_budget(7)
 def view_card_by_subdomain(request):
     if not getattr(request, "subdomain", None):
         raise Http404("Subdomain not found.")
 
-    user_card = get_object_or_404(
-        UserCard.objects.select_related("user", "user__subdomain").prefetch_related("skills", "services", "portfolio_items"),
-        user__subdomain__subdomain=request.subdomain,
-        user__subdomain__is_active=True,
-        is_published=True,
+    # Resolved (and negatively cached) by SubdomainMiddleware. A positive
+    # entry may be stale on this worker, so the card itself is looked up by
+    # the snapshot's subdomain below.
+    if getattr(request, "subdomain_card_id", None) is None:
+        raise Http404("Card not found.")
+
+    response = _cached_card_response(request, "subdomain", request.subdomain)
+    if response is None:
+        response = _revalidate_card(request, "subdomain", snapshot__subdomain=request.subdomain)
+    if response is not None:
+        return response
+
+    # CardSnapshot.subdomain is unique, so this is one indexed row.
+    user_card = _get_published_card(subdomain=request.subdomain)
+
+    # The subdomain urlconf has no 'home' route; link back to the main site.
+    home_url = f"{request.scheme}://{settings.BASE_DOMAIN}/"
+    return _render_public_card(request, user_card, "subdomain", request.subdomain, home_url)
+
+
+async def _acached_card_response(request, lookup, value):
+    cached = await aget_cached_page(lookup, value)
+    if cached is None:
+        return None
+
+    card_id, variants, updated_at, site_token = cached
+    await arecord_view(card_id, SOURCE_BY_LOOKUP[lookup], referrer_host(request))
+    return _versioned_card_response(request, variants, card_id, updated_at, lookup, site_token)
+
+
+async def _arevalidate_card(request, lookup, **card_lookup):
+    if not is_conditional(request):
+        return None
+    version = await _card_version_query(card_lookup).afirst()
+    if version is None:
+        return None
+
+    card_id, updated_at = version
+    etag = _card_etag(card_id, updated_at, lookup, await aget_site_token())
+    response = not_modified_response(request, etag)
+    if response is not None:
+        await arecord_view(card_id, SOURCE_BY_LOOKUP[lookup], referrer_host(request))
+    return response
+
+
+async def _arender_public_card(request, user_card, lookup, value, home_url):
+    await arecord_view(user_card.id, SOURCE_BY_LOOKUP[lookup], referrer_host(request))
+    site_token = await aget_site_token()
+    # Context processors may still hit the database, so render in a thread.
+    response = await sync_to_async(render)(
+        request, 'cards/card_view.html', _card_page_context(user_card, home_url)
     )
+    variants = await sync_to_async(compress_variants)(response.content)
+    await sync_to_async(set_cached_page)(user_card.id, lookup, value, variants, user_card.updated_at, site_token)
+    return _versioned_card_response(request, variants, user_card.id, user_card.updated_at, lookup, site_token)
+
+
+async def _aget_published_card(**lookup):
+    snapshot = await aget_card_snapshot(**lookup)
+    if snapshot is None:
+        raise Http404("No UserCard matches the given query.")
+    return hydrate_card(snapshot.data)
+
+
+@query_budget(6)
+async def view_card_async(request, username):
+    """Async variant of view_card, routed when served over ASGI"""
+    response = await _acached_card_response(request, "username", username)
+    if response is None:
+        response = await _arevalidate_card(request, "username", username=username)
+    if response is not None:
+        return response
+
+    user_card = await _aget_published_card(username=username)
+    return await _arender_public_card(request, user_card, "username", username, reverse("home"))
+
+
+@query_budget(7)
+async def view_card_by_subdomain_async(request):
+    """Async variant of view_card_by_subdomain, routed when served over ASGI"""
+    if not getattr(request, "subdomain", None):
+        raise Http404("Subdomain not found.")
+
+    if getattr(request, "subdomain_card_id", None) is None:
+        raise Http404("Card not found.")
+
+    response = await _acached_card_response(request, "subdomain", request.subdomain)
+    if response is None:
+        response = await _arevalidate_card(request, "subdomain", snapshot__subdomain=request.subdomain)
+    if response is not None:
+        return response
 
-    UserCard.objects.filter(id=user_card.id).update(views=F('views') + 1)
-    return render(request, "cards/card_view.html", {"user_card": user_card})
+    user_card = await _aget_published_card(subdomain=request.subdomain)
+    home_url = f"{request.scheme}://{settings.BASE_DOMAIN}/"
+    return await _arender_public_card(request, user_card, "subdomain", request.subdomain, home_url)
 
 
 @require_http_methods(["POST"])
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Route public card pages to their async views (see cards.urls).
+os.environ.setdefault('ASYNC_PUBLIC_CARDS', 'true')
 
 application = get_asgi_application()
+
+# Build the taken-subdomain filter before the first availability check.
+from core.services.subdomain_filter import taken_subdomains  # noqa: E402
+
+taken_subdomains.warm()
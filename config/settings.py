@@ -6,6 +6,7 @@ organized by functionality for better maintainability.
 """
 
 import os
+import sys
 from pathlib import Path
 from environs import Env
 
@@ -24,6 +25,7 @@ PROJECT_ROOT = BASE_DIR.parent
 SECRET_KEY = env('SECRET_KEY')
 
 DEBUG = env.bool('DEBUG', default=False)
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
 BASE_DOMAIN = env('BASE_DOMAIN', default='x-link.ir').strip().lower()
 
 # Host configuration
@@ -90,7 +92,8 @@ INSTALLED_APPS = [
 # =============================================================================
 
 MIDDLEWARE = [
-    'django.middleware.gzip.GZipMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -108,6 +111,10 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Serve public card pages with async views; enabled by config.asgi
+ASYNC_PUBLIC_CARDS = env.bool('ASYNC_PUBLIC_CARDS', default=False)
 
 # =============================================================================
 # DATABASE CONFIGURATION
@@ -195,24 +202,56 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# collectstatic writes hashed, minified and pre-compressed (.gz/.br) files
+# that nginx serves with gzip_static and a one-year cache (core.staticfiles).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+STATICFILES_MINIFY = True  # needs rcssmin/rjsmin, skipped without them
+
+# Files concatenated into one asset at collectstatic time, included with
+# {% static_bundle %}; each page loads its sources separately until then.
+STATIC_BUNDLES = {
+    'site.bundle.js': ['script.js', 'carousel.js', 'pricing-landing.js', 'plan-ajax.js'],
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Prebuilt, gzip-compressed sitemap shards (see `manage.py build_sitemaps`)
+SITEMAP_ROOT = env.path('SITEMAP_ROOT', default=BASE_DIR / 'sitemaps')
+SITEMAP_SHARD_SIZE = 50000
+
+# Responsive image variants (see core.services.images). Generation runs in a
+# process pool of IMAGE_PIPELINE_WORKERS; 0 builds them inline on commit.
+IMAGE_VARIANT_WIDTHS = (320, 640, 1080)
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_PIPELINE_WORKERS = env.int('IMAGE_PIPELINE_WORKERS', default=2)
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Card builder images are uploaded once and referenced by token until the
+# card is saved (see `manage.py purge_temp_uploads`)
+TEMP_UPLOAD_ROOT = env.path('TEMP_UPLOAD_ROOT', default=BASE_DIR / 'tmp_uploads')
+TEMP_UPLOAD_TTL = 60 * 60 * 6  # 6 hours
+
 # =============================================================================
 # TEMPLATES CONFIGURATION
 # =============================================================================
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates',
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -221,6 +260,14 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.site_context',
             ],
+            # Compiled templates are kept per worker; the dev server's
+            # autoreloader resets them when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -229,20 +276,109 @@ TEMPLATES = [
 # CACHE CONFIGURATION
 # =============================================================================
 
+# Shared across gunicorn workers. Select the backend with CACHE_URL; the
+# default is Redis, whose atomic incr() the buffered view counters and the
+# OTP rate limits rely on. With DEBUG on it falls back to a file cache that
+# needs no external service, but whose incr() is not atomic across
+# processes and which scans its directory to cull once it nears
+# max_entries - fine for one developer, not for production.
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+    'default': env.dj_cache_url(
+        'CACHE_URL',
+        default=(
+            'file:///var/tmp/x-link-cache?max_entries=20000' if DEBUG
+            else 'redis://127.0.0.1:6379/1'
+        ),
+    ),
 }
+if TESTING:
+    # XLinkTestCase clears the cache before every test; never let that
+    # reach a cache shared with a running instance.
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'x-link-tests',
+        },
+    }
+CACHES['default'].setdefault('KEY_PREFIX', env('CACHE_KEY_PREFIX', default='xlink'))
+CACHES['default'].setdefault('VERSION', env.int('CACHE_VERSION', default=1))
+CACHE_MIDDLEWARE_KEY_PREFIX = 'pages'
+
+# Per-process subdomain -> card id cache used by SubdomainMiddleware
+SUBDOMAIN_RESOLVER_MAX_SIZE = 10000
+SUBDOMAIN_RESOLVER_TTL = 60 * 5            # 5 minutes
+SUBDOMAIN_RESOLVER_NEGATIVE_TTL = 60       # 1 minute for unknown subdomains
+
+# Per-process Bloom filter of taken subdomains for the live availability API
+SUBDOMAIN_FILTER_MAX_AGE = 60 * 10         # rebuild every 10 minutes
+# Builds never hold up a keystroke request; tests build inline because
+# their data lives in a transaction a thread cannot see.
+SUBDOMAIN_FILTER_BUILD_IN_BACKGROUND = not TESTING
+
+# Expose per-request query/template/lookup metrics (core.middleware.RequestMetricsMiddleware)
+# as a Server-Timing header; off in production, where any client could read them
+REQUEST_METRICS_SERVER_TIMING = env.bool('REQUEST_METRICS_SERVER_TIMING', default=DEBUG)
+
+# Versions ETags and cached pages (core.services.conditional.release_token);
+# set it per deploy, e.g. to the commit id. Defaults to the git HEAD.
+RELEASE_VERSION = env('RELEASE_VERSION', default='')
+
+# Response compression (core.middleware.CompressionMiddleware)
+COMPRESSION_DYNAMIC_LEVEL = 4    # gzip level for uncached responses, per view with compress_level
+COMPRESSION_GZIP_LEVEL = 9       # variants stored with cached pages are compressed once
+COMPRESSION_BROTLI_QUALITY = 9   # needs the brotli package
 
 # Cache time settings
-LANDING_PAGE_CACHE_TIMEOUT = 60 * 15  # 15 minutes
+# Site context and landing data are evicted by core.services.cache_invalidation
+# whenever their source rows change, so they never need to expire on their own.
+SITE_CONTEXT_CACHE_TIMEOUT = None
+LANDING_PAGE_CACHE_TIMEOUT = None
+LANDING_HTML_CACHE_TIMEOUT = 60 * 60  # rendered page per URL for anonymous visitors
 TEMPLATES_CACHE_TIMEOUT = 60 * 60     # 1 hour
 CUSTOMERS_CACHE_TIMEOUT = 60 * 60     # 1 hour
+CARD_PAGE_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day, invalidated on card changes
+ENTITLEMENTS_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day, invalidated on plan changes
+# {% cache %} fragments in card and shop pages, keyed by the owner's updated_at
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day
+SHOP_LISTING_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day, keyed by the shop's updated_at
+SHOP_PRODUCTS_PER_PAGE = 9
+
+# One-time passwords live only in the cache (core.services.otp)
+OTP_TTL = 60 * 2                # code lifetime
+OTP_MAX_ATTEMPTS = 5            # wrong guesses before the code is discarded
+OTP_RESEND_COOLDOWN = 60        # seconds between codes for one phone
+OTP_MAX_SENDS = 5               # codes per phone per OTP_SEND_WINDOW
+OTP_SEND_WINDOW = 60 * 60
+
+# Card view counters are buffered per worker and flushed in batches
+CARD_VIEWS_FLUSH_INTERVAL = env.int('CARD_VIEWS_FLUSH_INTERVAL', default=10)  # seconds, 0 disables the flusher thread
+CARD_VIEWS_FLUSH_BATCH_SIZE = 500
+CARD_VIEWS_EVENT_FLUSH_SIZE = 5000  # buffered view events that force a flush in the request
+
+# View events are folded into hourly/daily rollups by `manage.py rollup_card_views`
+CARD_VIEW_ROLLUP_CHUNK_SIZE = 5000
+CARD_VIEW_HOURLY_RETENTION = 14   # days
+CARD_VIEW_DAILY_RETENTION = 400   # days
+
+# Users moved back to the Free plan per transaction by `manage.py check_user_plans`
+PLAN_EXPIRY_CHUNK_SIZE = 2000
+
+# Cards per transaction and parallel workers for `manage.py rebuild_card_snapshots`
+CARD_SNAPSHOT_CHUNK_SIZE = 500
+CARD_SNAPSHOT_WORKERS = env.int('CARD_SNAPSHOT_WORKERS', default=4)
+
+# Records validated and inserted per transaction by `manage.py import_cards`,
+# cards fetched per query by `manage.py export_cards`
+CARD_IMPORT_BATCH_SIZE = 500
+CARD_EXPORT_CHUNK_SIZE = 500
+# Imports posted to the API above this size run as background jobs on
+# CARD_IMPORT_WORKERS threads (0 runs them inline)
+CARD_IMPORT_SYNC_MAX_SIZE = 1024 * 1024  # 1MB
+CARD_IMPORT_WORKERS = env.int('CARD_IMPORT_WORKERS', default=1)
 
 # Session settings - Use cache to reduce DB queries
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
 
 # =============================================================================
 # EMAIL CONFIGURATION
@@ -322,6 +458,23 @@ LOGGING = {
 MELIPAYAMAK_USERNAME = env('MELIPAYAMAK_USERNAME')
 MELIPAYAMAK_APIKEY = env('MELIPAYAMAK_APIKEY')
 MELIPAYAMAK_NUMBER = env('MELIPAYAMAK_NUMBER')
+SMS_API_URL = env('SMS_API_URL', default='https://rest.payamak-panel.com/api/SendSMS/SendSMS')
+
+# Telegram admin notifications
+TELEGRAM_BOT_TOKEN = env('TELEGRAM_BOT_TOKEN', default='')
+TELEGRAM_ADMIN_CHAT_IDS = env.list('TELEGRAM_ADMIN_CHAT_IDS', default=[])
+TELEGRAM_API_URL = env('TELEGRAM_API_URL', default='https://api.telegram.org')
+
+# Outbound message queue (manage.py send_outbound_messages)
+OUTBOUND_BATCH_SIZE = 100
+OUTBOUND_POLL_INTERVAL = 2  # seconds between polls when the queue is empty
+OUTBOUND_HTTP_TIMEOUT = 10
+OUTBOUND_MAX_ATTEMPTS = 6
+OUTBOUND_RETRY_BASE_DELAY = 30  # doubled after every failed attempt
+OUTBOUND_RETRY_MAX_DELAY = 60 * 60
+OUTBOUND_LEASE_SECONDS = 120
+OUTBOUND_RETENTION = 60 * 60 * 24 * 7  # sent and failed messages are purged after a week
+OUTBOUND_PURGE_INTERVAL = 60 * 60  # seconds between purges in the running worker
 
 # Payment gateway (placeholder for future implementation)
 PAYMENT_MERCHANT_ID = env('PAYMENT_MERCHANT_ID', default='')
@@ -1,8 +1,13 @@
+from django.conf import settings
 from django.urls import path
 
-from cards.views import view_card_by_subdomain
+from cards.views import view_card_by_subdomain, view_card_by_subdomain_async
 
 
 urlpatterns = [
-    path("", view_card_by_subdomain, name="subdomain_public_page"),
+    path(
+        "",
+        view_card_by_subdomain_async if settings.ASYNC_PUBLIC_CARDS else view_card_by_subdomain,
+        name="subdomain_public_page",
+    ),
 ]
@@ -3,7 +3,12 @@ from django.conf.urls.static import static
 from django.urls import path, include
 
 from django.contrib import admin
-from core.seo_views import robots_txt_view, sitemap_xml_view
+from core.seo_views import (
+    robots_txt_view,
+    sitemap_cards_view,
+    sitemap_index_view,
+    sitemap_static_view,
+)
 
 # Admin site configuration
 admin.site.site_header = "پنل مدیریت X-Link"
@@ -13,7 +18,10 @@ admin.site.index_title = "داشبورد مدیریت"
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("robots.txt", robots_txt_view, name="robots_txt"),
-    path("sitemap.xml", sitemap_xml_view, name="sitemap_xml"),
+    path("sitemap.xml", sitemap_index_view, name="sitemap_xml"),
+    path("sitemap-index.xml", sitemap_index_view, name="sitemap_index"),
+    path("sitemap-static.xml", sitemap_static_view, name="sitemap_static"),
+    path("sitemap-cards-<int:shard>.xml", sitemap_cards_view, name="sitemap_cards"),
     path('', include('core.urls')),
     path('', include('Billing.urls')),
     path('', include('cards.urls')),
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Build the taken-subdomain filter before the first availability check.
+from core.services.subdomain_filter import taken_subdomains  # noqa: E402
+
+taken_subdomains.warm()
@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.db.models import Prefetch, Count
 
 from cards.models import UserCard
-from .models import CustomUser, OTP, UserSubdomain
+from .models import CustomUser, OTP, OutboundMessage, UserSubdomain
 from .forms import CustomUserChangeForm
 
 
@@ -77,7 +77,8 @@ class CustomUserAdmin(UserAdmin):
     # Custom display methods
     def get_plans_display(self, obj):
         """Display user's active plans."""
-        plans = obj.get_active_plans()
+        # Read the prefetched plans; get_active_plans() would query per row
+        plans = [plan.value for plan in obj.plan.all()]
         if plans:
             return ", ".join(plans)
         return "بدون پلن"
@@ -252,3 +253,14 @@ class UserSubdomainAdmin(admin.ModelAdmin):
     list_filter = ("is_active", "created_at")
     search_fields = ("subdomain", "user__username", "user__email", "user__phone")
     ordering = ("subdomain",)
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ("channel", "recipient", "status", "sensitive", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("channel", "status", "sensitive", "created_at")
+    search_fields = ("recipient",)
+    # Bodies may hold OTP codes; like OTPAdmin, never show them.
+    fields = ("channel", "recipient", "status", "sensitive", "attempts", "next_attempt_at", "last_error", "created_at", "sent_at")
+    readonly_fields = ("channel", "recipient", "sensitive", "attempts", "last_error", "created_at", "sent_at")
+    ordering = ("-created_at",)
@@ -3,3 +3,19 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .services.request_metrics import install_query_counter
+        from .services.cache_invalidation import connect_cache_invalidation
+        from .services.images import connect_image_pipeline
+
+        connect_cache_invalidation()
+        connect_image_pipeline()
+
+        connection_created.connect(install_query_counter, dispatch_uid="request_metrics")
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(sender=None, connection=connection)
@@ -1,11 +1,14 @@
+from django.conf import settings
 from django.core.cache import cache
 from types import SimpleNamespace
 
+from core.services.cache_keys import SITE_CONTEXT_KEY
+from core.services.request_metrics import record_cache_lookup
 from site_management.models import SiteContext, Banners
 
 
 def site_context(request):
-    data = cache.get("site_context_data")
+    data = record_cache_lookup(cache.get(SITE_CONTEXT_KEY))
 
     if data is None:
         context = SiteContext.objects.first()
@@ -37,6 +40,6 @@ def site_context(request):
             "site_context": context,
             "banners": banners,
         }
-        cache.set("site_context_data", data, 60 * 60)
+        cache.set(SITE_CONTEXT_KEY, data, settings.SITE_CONTEXT_CACHE_TIMEOUT)
 
     return data
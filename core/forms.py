@@ -4,11 +4,61 @@ from django import forms
 from django.contrib.auth.forms import UserChangeForm, AuthenticationForm
 
 from cards.models import UserCard, Skill, Service, Portfolio
+from cards.services.upload_store import delete_upload, open_upload
 from django.core.validators import MinLengthValidator, MaxLengthValidator
 
 from .models import CustomUser
 from .services.subdomains import check_subdomain_availability
 
+class TemporaryUploadMixin:
+    """
+    Let an image field be filled from a temporary upload token instead of a file.
+
+    ``upload_fields`` maps each file field to the hidden field holding its
+    token. Claimed uploads are removed by ``release_uploads()`` once saved.
+    """
+
+    upload_fields = {}
+
+    def __init__(self, *args, upload_owner=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_owner = upload_owner
+        self.claimed_uploads = []
+        if self.is_bound:
+            for file_field, token_field in self.upload_fields.items():
+                if self.data.get(self.add_prefix(token_field)):
+                    self.fields[file_field].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for file_field, token_field in self.upload_fields.items():
+            token = cleaned_data.get(token_field)
+            if not token or self.files.get(self.add_prefix(file_field)):
+                continue
+
+            owner_id = getattr(self.upload_owner, "pk", None)
+            upload = open_upload(token, owner_id) if owner_id else None
+            if upload is None:
+                cleaned_data[token_field] = ""
+                self.add_error(file_field, "فایل آپلود شده منقضی شده است. لطفا دوباره آپلود کنید.")
+                continue
+
+            cleaned_data[file_field] = upload
+            self.claimed_uploads.append((token, upload))
+        return cleaned_data
+
+    def release_uploads(self, delete=True):
+        for token, upload in self.claimed_uploads:
+            upload.close()
+            if delete:
+                delete_upload(token)
+        self.claimed_uploads = []
+
+
+class TemporaryImageUploadForm(forms.Form):
+    file = forms.ImageField()
+
+
 class UserSignupForm(forms.ModelForm):
     password = forms.CharField(
         label="رمز عبور",
@@ -91,7 +141,7 @@ class UserLoginForm(AuthenticationForm):
         error_messages={"required": "رمز عبور الزامی است."},
     )
 
-class UserCardForm(forms.ModelForm):
+class UserCardForm(TemporaryUploadMixin, forms.ModelForm):
     username = forms.CharField(
         min_length=3,
         max_length=32,
@@ -193,8 +243,9 @@ class UserCardForm(forms.ModelForm):
             }),
         }
     
-    # Hidden field to persist image data across form errors
-    profile_picture_data = forms.CharField(widget=forms.HiddenInput(), required=False)
+    # Token of a temporary upload, kept across form errors
+    profile_picture_token = forms.CharField(widget=forms.HiddenInput(), required=False)
+    upload_fields = {'profile_picture': 'profile_picture_token'}
 
     def clean_username(self):
         username = self.cleaned_data.get("username", "")
@@ -269,7 +320,7 @@ ServiceInlineFormSet = forms.inlineformset_factory(
 )
 
 
-class PortfolioForm(forms.ModelForm):
+class PortfolioForm(TemporaryUploadMixin, forms.ModelForm):
     class Meta:
         model = Portfolio
         fields = ['title', 'description', 'image', 'url']
@@ -296,8 +347,9 @@ class PortfolioForm(forms.ModelForm):
             }),
         }
 
-    # Hidden field to persist image data across form errors
-    image_data = forms.CharField(widget=forms.HiddenInput(), required=False)
+    # Token of a temporary upload, kept across form errors
+    image_token = forms.CharField(widget=forms.HiddenInput(), required=False)
+    upload_fields = {'image': 'image_token'}
 
 
 class PortfolioFormSet(forms.BaseInlineFormSet):
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.sitemaps import build_card_shards, sitemap_root
+
+
+class Command(BaseCommand):
+    help = 'Precompute gzip-compressed card sitemap shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url',
+            default=f'https://{settings.BASE_DOMAIN}',
+            help='Absolute site URL used in <loc> entries',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild shards even if they have not changed',
+        )
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        written, skipped = build_card_shards(base_url, force=options['force'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Wrote {written} sitemap shards, skipped {skipped} unchanged '
+                f'({sitemap_root()})'
+            )
+        )
@@ -1,8 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.db.models import Q
-from core.models import CustomUser, UserPlan
-from cards.models import UserCard
+from core.models import CustomUser
+from core.services.plan_expiry import expire_plans, expired_plan_users
 
 
 class Command(BaseCommand):
@@ -14,6 +13,12 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be done without making changes',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Users expired per transaction (default: PLAN_EXPIRY_CHUNK_SIZE)',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -27,82 +32,37 @@ class Command(BaseCommand):
         now = timezone.now()
 
         # Find users with expired Billing
-        expired_users = CustomUser.objects.filter(
-            plan_expires_at__lt=now
-        ).exclude(
-            plan_expires_at__isnull=True
-        ).prefetch_related('plan')
+        expired_users = expired_plan_users(now)
+        expired_count = expired_users.count()
 
-        if not expired_users.exists():
+        if not expired_count:
             self.stdout.write(
                 self.style.SUCCESS('No expired Billing found.')
             )
             return
 
-        # Process expired users
-        processed_count = 0
-        for user in expired_users:
-            user_plans = list(user.plan.all())
-            plan_names = [plan.get_value_display() for plan in user_plans]
-
-            if dry_run:
+        if options['verbosity'] >= 2:
+            for user in expired_users.prefetch_related('plan').iterator(chunk_size=2000):
+                plan_names = [plan.get_value_display() for plan in user.plan.all()]
                 self.stdout.write(
-                    f'Would expire Billing for user {user.full_name or user.phone}: '
-                    f'{", ".join(plan_names)} → Would add Free plan (expired: {user.plan_expires_at})'
+                    f'{"Would expire" if dry_run else "Expiring"} Billing for user '
+                    f'{user.full_name or user.phone}: {", ".join(plan_names)} '
+                    f'(expired: {user.plan_expires_at})'
                 )
-            else:
-                # Remove all Billing from expired user
-                user.plan.clear()
-
-                # Add Free plan to expired user
-                try:
-                    free_plan, _ = UserPlan.objects.get_or_create(value='Free')
-                    user.plan.add(free_plan)
-                    user.plan_expires_at = None
-                    user.save()
-
-                    # Reset premium card features
-                    try:
-                        card = user.user_card
-                        card.black_background = False
-                        card.stars_background = False
-                        card.blue_tick = False
-                        card.color = 'default'
-                        card.save()
-                    except UserCard.DoesNotExist:
-                        pass
-
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Expired Billing for user {user.full_name or user.phone}: '
-                            f'{", ".join(plan_names)} → Added Free plan and reset features'
-                        )
-                    )
-                except Exception as e:
-                    # If error occurred, just clear Billing
-                    user.plan_expires_at = None
-                    user.save()
-
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f'Expired Billing for user {user.full_name or user.phone}: '
-                            f'{", ".join(plan_names)} → Error: {e}'
-                        )
-                    )
-
-            processed_count += 1
 
         # Show summary
         if dry_run:
             self.stdout.write(
                 self.style.WARNING(
-                    f'DRY RUN: Would process {processed_count} users with expired Billing'
+                    f'DRY RUN: Would process {expired_count} users with expired Billing'
                 )
             )
         else:
+            result = expire_plans(now=now, chunk_size=options['chunk_size'])
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Successfully processed {processed_count} users with expired Billing'
+                    f'Successfully processed {result.users} users with expired Billing '
+                    f'({result.cards} cards reset, {result.chunks} batches)'
                 )
             )
 
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from cards.models import UserCard
+from cards.services.bulk_cards import FORMATS, format_for, iter_card_export
+
+
+class Command(BaseCommand):
+    help = 'Stream every card with its sections to a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Output file, "-" for stdout')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default=None,
+            help='Record format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--published',
+            action='store_true',
+            help='Only export published cards',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Override CARD_EXPORT_CHUNK_SIZE',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+        cards = UserCard.objects.filter(is_published=True) if options['published'] else None
+
+        chunks = iter_card_export(fmt, queryset=cards, chunk_size=options['chunk_size'])
+
+        if path == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Exported cards to {path}'))
@@ -0,0 +1,70 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.services.bulk_cards import FORMATS, ImageArchive, format_for, import_cards
+
+
+class Command(BaseCommand):
+    help = 'Create users with cards, subdomains and card sections from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, "-" for stdin')
+        parser.add_argument(
+            '--images',
+            default=None,
+            help='Directory or zip file holding the images the records point to',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default=None,
+            help='Record format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Override CARD_IMPORT_BATCH_SIZE',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the records without creating anything',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+        try:
+            archive = ImageArchive(options['images']) if options['images'] else None
+        except (OSError, ValueError):
+            raise CommandError(f'--images must be a directory or a zip file: {options["images"]}')
+        try:
+            source = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            if archive is not None:
+                archive.close()
+            raise CommandError(exc)
+
+        try:
+            result = import_cards(
+                source,
+                fmt,
+                archive=archive,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if archive is not None:
+                archive.close()
+
+        for error in result.errors:
+            self.stderr.write(f'line {error.line} ({error.username or "-"}): {error.errors}')
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.created} cards in {result.batches} batches, '
+            f'{len(result.errors)} records rejected'
+        ))
@@ -1,4 +1,5 @@
-﻿from django.core.management.base import BaseCommand
+﻿from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from site_management.models import SiteContext, Banners, Customer
 from django.core.files.base import ContentFile
 import base64
@@ -6,7 +7,18 @@ import base64
 class Command(BaseCommand):
     help = 'Populates the database with high-quality Persian marketing content'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=0,
+            help='Also seed this many benchmark users with cards and shops',
+        )
+
     def handle(self, *args, **options):
+        if options['users'] and not settings.DEBUG:
+            raise CommandError('Benchmark users can only be seeded with DEBUG on.')
+
         self.stdout.write('Populating site data...')
 
         # Small 1x1 transparent GIF for placeholder
@@ -76,5 +88,13 @@ class Command(BaseCommand):
             Customer.objects.create(site_context=site_context, **item)
 
         self.stdout.write(self.style.SUCCESS('Customers populated.'))
+
+        if options['users']:
+            from core.test_utils import seed_benchmark_data
+
+            seeded = seed_benchmark_data(users=options['users'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Seeded {len(seeded['usernames'])} benchmark users (password: {seeded['password']})."
+            ))
         self.stdout.write(self.style.SUCCESS('Data population complete!'))
 
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.services.otp import purge_expired_otps
+
+
+class Command(BaseCommand):
+    help = 'Delete expired rows from the legacy OTP table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per statement',
+        )
+
+    def handle(self, *args, **options):
+        removed = purge_expired_otps(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired OTPs'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from cards.services.upload_store import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete card builder uploads older than TEMP_UPLOAD_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=None,
+            help='Override the age limit in seconds',
+        )
+
+    def handle(self, *args, **options):
+        removed = purge_expired_uploads(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} temporary uploads'))
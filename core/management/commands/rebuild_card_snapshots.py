@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from cards.services.snapshots import rebuild_all_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild the denormalized snapshots of published cards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only build snapshots for cards that have none yet',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Cards rebuilt per transaction (default: CARD_SNAPSHOT_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Chunks rebuilt in parallel (default: CARD_SNAPSHOT_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        result = rebuild_all_snapshots(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            missing_only=options['missing'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt {result.snapshots} card snapshots in {result.chunks} batches '
+                f'({result.removed} stale snapshots removed)'
+            )
+        )
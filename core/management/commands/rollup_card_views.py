@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from cards.services.analytics import rollup_view_events
+
+
+class Command(BaseCommand):
+    help = 'Fold raw card view events into hourly and daily rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Override CARD_VIEW_ROLLUP_CHUNK_SIZE',
+        )
+
+    def handle(self, *args, **options):
+        result = rollup_view_events(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {result.events} view events into {result.rows} rows, '
+            f'pruned {result.pruned} expired rollups'
+        ))
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.services.outbound import deliver_due_messages, purge_finished_messages
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued SMS and Telegram messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver every due message, then exit instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Override OUTBOUND_BATCH_SIZE',
+        )
+
+    def _purge(self):
+        removed = purge_finished_messages()
+        if removed:
+            self.stdout.write(f'Purged {removed} sent and failed messages')
+
+    def handle(self, *args, **options):
+        interval = getattr(settings, 'OUTBOUND_POLL_INTERVAL', 2)
+        purge_interval = getattr(settings, 'OUTBOUND_PURGE_INTERVAL', 60 * 60)
+        next_purge = 0
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() >= next_purge:
+                    self._purge()
+                    next_purge = time.monotonic() + purge_interval
+                result = deliver_due_messages(options['batch_size'])
+                if result:
+                    self.stdout.write(
+                        f'Sent {result.sent}, retrying {result.retried}, failed {result.failed}'
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Outbound worker stopped'))
@@ -1,14 +1,150 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware, re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+
+from core.services.compression import MIN_COMPRESS_SIZE, gzip_bytes
 from core.services.domain_routing import extract_subdomain_from_host
+from core.services.request_metrics import budget_for, collect_metrics
+from core.services.subdomain_resolver import subdomain_resolver
+from core.services.subdomains import subdomain_check_memo
+from core.services.template_catalog import template_catalog_memo
 
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, SQL/template time and cached lookups for each request.
+
+    Metrics are exposed as ``request.request_metrics``, a log line and,
+    with REQUEST_METRICS_SERVER_TIMING (DEBUG by default), a
+    ``Server-Timing`` header. The log line is a warning when the view
+    exceeds the budget it declared with
+    ``core.services.request_metrics.query_budget``.
+    """
+
+    sync_capable = True
+    async_capable = True
 
-class SubdomainMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        with collect_metrics() as metrics:
+            request.request_metrics = metrics
+            response = self.get_response(request)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        with collect_metrics() as metrics:
+            request.request_metrics = metrics
+            response = await self.get_response(request)
+        return self._finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = request.request_metrics
+        metrics.view_name = request.resolver_match.view_name if request.resolver_match else None
+        metrics.query_budget = budget_for(view_func, request.method)
+
+    def _finish(self, request, response, metrics):
+        if getattr(settings, "REQUEST_METRICS_SERVER_TIMING", False):
+            response["Server-Timing"] = metrics.server_timing()
+
+        fields = metrics.log_fields()
+        message = "%s %s %s " + " ".join(f"{name}=%s" for name in fields)
+        args = (request.method, request.path, response.status_code, *fields.values())
+        if metrics.over_budget:
+            logger.warning("Query budget exceeded: " + message, *args, extra={"metrics": fields})
+        else:
+            logger.debug(message, *args, extra={"metrics": fields})
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware with a per-view level.
+
+    Views pick their level with ``core.services.compression.compress_level``
+    (0 turns compression off), everything else uses
+    COMPRESSION_DYNAMIC_LEVEL. Responses that already carry a
+    Content-Encoding, such as pages served from stored variants, pass
+    through untouched.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.compression_level = getattr(view_func, "compression_level", None)
+
+    def process_response(self, request, response):
+        level = getattr(request, "compression_level", None)
+        if level is None:
+            level = getattr(settings, "COMPRESSION_DYNAMIC_LEVEL", 6)
+        if not level:
+            return response
+        if response.streaming:
+            return super().process_response(request, response)
+
+        if len(response.content) < MIN_COMPRESS_SIZE or response.has_header("Content-Encoding"):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if not re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            return response
+
+        compressed = gzip_bytes(response.content, level, self.max_random_bytes)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "gzip"
+        return response
+
+
+class SubdomainMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _route(self, request):
         request.subdomain = extract_subdomain_from_host(request.get_host())
+        request.subdomain_card_id = None
 
         if request.subdomain:
             request.urlconf = "config.subdomain_urls"
 
-        return self.get_response(request)
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        self._route(request)
+        if request.subdomain:
+            request.subdomain_card_id = subdomain_resolver.resolve(request.subdomain)
+
+        # Per-request memos: subdomain owners and the template catalog
+        with subdomain_check_memo(), template_catalog_memo():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        self._route(request)
+        if request.subdomain:
+            request.subdomain_card_id = await subdomain_resolver.aresolve(request.subdomain)
+
+        with subdomain_check_memo(), template_catalog_memo():
+            return await self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_usersubdomain'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='plan_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the current plan expires', null=True),
+        ),
+    ]
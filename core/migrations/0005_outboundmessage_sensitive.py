@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundmessage',
+            name='sensitive',
+            field=models.BooleanField(default=False, help_text='Body holds a secret such as an OTP; blanked once delivered or given up on'),
+        ),
+        migrations.AlterField(
+            model_name='outboundmessage',
+            name='body',
+            field=models.TextField(blank=True),
+        ),
+    ]
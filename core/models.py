@@ -93,6 +93,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     plan_expires_at = models.DateTimeField(
         blank=True,
         null=True,
+        db_index=True,
         help_text="When the current plan expires"
     )
 
@@ -171,7 +172,9 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         Returns:
             bool: True if user has the specified plan
         """
-        return self.plan.filter(value=plan_value).exists()
+        from .services.entitlements import get_entitlements
+
+        return plan_value in get_entitlements(self).plans
 
     def get_active_plans(self):
         """
@@ -180,7 +183,9 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         Returns:
             list: List of plan values (e.g., ['Basic', 'Pro'])
         """
-        return list(self.plan.values_list('value', flat=True))
+        from .services.entitlements import get_entitlements
+
+        return list(get_entitlements(self).plans)
 
     def __str__(self):
         """
@@ -195,6 +200,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 class OTP(models.Model):
     """
     One-Time Password model for user authentication.
+
+    Legacy: codes are now issued and verified in the cache by
+    core.services.otp. Expired rows are cleared by
+    ``manage.py purge_expired_otps``.
     """
 
     user = models.ForeignKey(
@@ -300,3 +309,50 @@ class UserSubdomain(models.Model):
 
     def __str__(self):
         return f"{self.subdomain} -> {self.user_id}"
+
+
+class OutboundMessage(models.Model):
+    """
+    SMS or Telegram message waiting for the outbound worker.
+
+    Rows are written in the caller's transaction and delivered by
+    ``manage.py send_outbound_messages`` (see core.services.outbound).
+    """
+
+    class Channel(models.TextChoices):
+        SMS = "sms", "SMS"
+        TELEGRAM = "telegram", "Telegram"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+
+    channel = models.CharField(max_length=16, choices=Channel.choices)
+    recipient = models.CharField(
+        max_length=64,
+        help_text="Phone number or Telegram chat id"
+    )
+    body = models.TextField(blank=True)
+    sensitive = models.BooleanField(
+        default=False,
+        help_text="Body holds a secret such as an OTP; blanked once delivered or given up on"
+    )
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Earliest time the worker may (re)try this message"
+    )
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
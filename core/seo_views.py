@@ -1,9 +1,20 @@
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from django.views.decorators.cache import cache_page
 
-from cards.models import UserCard
+from core.services.compression import BROTLI, GZIP, negotiate
+from core.services.sitemaps import (
+    XML_CONTENT_TYPE,
+    brotli_shard_path,
+    iter_card_urls,
+    iter_gzip_file,
+    iter_urlset,
+    render_index,
+    shard_entries,
+    shard_path,
+)
 
 
 def _base_url(request):
@@ -28,7 +39,20 @@ def robots_txt_view(request):
 
 
 @cache_page(60 * 30)
-def sitemap_xml_view(request):
+def sitemap_index_view(request):
+    base_url = _base_url(request)
+    today = timezone.now().date().isoformat()
+
+    entries = [(f"{base_url}{reverse('sitemap_static')}", today)]
+    for shard, lastmod in shard_entries():
+        loc = f"{base_url}{reverse('sitemap_cards', kwargs={'shard': shard})}"
+        entries.append((loc, lastmod.isoformat()))
+
+    return HttpResponse(render_index(entries), content_type=XML_CONTENT_TYPE)
+
+
+@cache_page(60 * 30)
+def sitemap_static_view(request):
     base_url = _base_url(request)
     today = timezone.now().date().isoformat()
 
@@ -39,27 +63,34 @@ def sitemap_xml_view(request):
         (reverse("card_builder"), today, "weekly", "0.8"),
     ]
 
-    rows = []
-    for path, lastmod, changefreq, priority in static_urls:
-        rows.append(
-            f"<url><loc>{base_url}{path}</loc><lastmod>{lastmod}</lastmod>"
-            f"<changefreq>{changefreq}</changefreq><priority>{priority}</priority></url>"
-        )
-
-    cards = UserCard.objects.filter(is_published=True).only("username", "updated_at")
-    for card in cards.iterator():
-        card_path = reverse("view_card", kwargs={"username": card.username})
-        card_lastmod = card.updated_at.date().isoformat()
-        rows.append(
-            f"<url><loc>{base_url}{card_path}</loc><lastmod>{card_lastmod}</lastmod>"
-            "<changefreq>weekly</changefreq><priority>0.6</priority></url>"
-        )
-
-    xml = (
-        '<?xml version="1.0" encoding="UTF-8"?>'
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
-        f"{''.join(rows)}"
-        "</urlset>"
-    )
-    return HttpResponse(xml, content_type="application/xml; charset=utf-8")
+    rows = [
+        f"<url><loc>{base_url}{path}</loc><lastmod>{lastmod}</lastmod>"
+        f"<changefreq>{changefreq}</changefreq><priority>{priority}</priority></url>"
+        for path, lastmod, changefreq, priority in static_urls
+    ]
+    return HttpResponse("".join(iter_urlset(rows)), content_type=XML_CONTENT_TYPE)
+
+
+def sitemap_cards_view(request, shard):
+    """
+    Serve one card shard, from the prebuilt brotli or gzip file when it
+    exists.
+    """
+    path = shard_path(shard)
+
+    if path.exists():
+        br_path = brotli_shard_path(shard)
+        coding = negotiate(request, (GZIP, BROTLI) if br_path.exists() else (GZIP,))
+        if coding:
+            response = FileResponse(open(br_path if coding == BROTLI else path, "rb"), content_type=XML_CONTENT_TYPE)
+            response["Content-Encoding"] = coding
+        else:
+            response = StreamingHttpResponse(iter_gzip_file(path), content_type=XML_CONTENT_TYPE)
+    else:
+        if shard < 0:
+            raise Http404("Sitemap shard not found.")
+        rows = iter_card_urls(_base_url(request), shard)
+        response = StreamingHttpResponse(iter_urlset(rows), content_type=XML_CONTENT_TYPE)
 
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,77 @@
+from django.apps import apps
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from Billing.models import Plan
+from core.services.cache_keys import SITE_CONTEXT_KEY, SITE_TOKEN_KEY, TEMPLATE_CATALOG_KEY, landing_data_key
+
+
+def site_context_keys():
+    return [SITE_CONTEXT_KEY, SITE_TOKEN_KEY]
+
+
+def landing_keys():
+    return [landing_data_key(period) for period in Plan.Period.values]
+
+
+def template_catalog_keys():
+    return [TEMPLATE_CATALOG_KEY]
+
+
+# Model label -> builders of the cache keys whose contents are read from it.
+# Entries are evicted on every write, so these keys can be cached without a TTL.
+CACHE_DEPENDENCIES = {
+    # Landing data versions the rendered landing page, which shows both.
+    "site_management.SiteContext": (site_context_keys, landing_keys),
+    "site_management.Banners": (site_context_keys, landing_keys),
+    "site_management.Customer": (landing_keys,),
+    "Billing.Plan": (landing_keys,),
+    "Billing.Feature": (landing_keys,),
+    "Billing.Discount": (landing_keys,),
+    "Billing.Template": (landing_keys, template_catalog_keys),
+    "Billing.UserPlan": (template_catalog_keys,),
+}
+
+# Many-to-many fields whose changes affect the same keys as their model.
+M2M_DEPENDENCIES = {
+    "Billing.Template": ("allowed_plans",),
+}
+
+M2M_WRITE_ACTIONS = frozenset({"post_add", "post_remove", "post_clear"})
+
+
+def invalidate_keys(key_builders):
+    cache.delete_many([key for build in key_builders for key in build()])
+
+
+def _model_invalidator(key_builders):
+    def invalidate(sender, **kwargs):
+        invalidate_keys(key_builders)
+    return invalidate
+
+
+def _m2m_invalidator(key_builders):
+    def invalidate(sender, action, **kwargs):
+        if action in M2M_WRITE_ACTIONS:
+            invalidate_keys(key_builders)
+    return invalidate
+
+
+def connect_cache_invalidation():
+    """
+    Connect save/delete/m2m signals for every model in CACHE_DEPENDENCIES.
+    """
+    for label, key_builders in CACHE_DEPENDENCIES.items():
+        model = apps.get_model(label)
+        receiver = _model_invalidator(key_builders)
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f"cache_save:{label}")
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f"cache_delete:{label}")
+
+        for field_name in M2M_DEPENDENCIES.get(label, ()):
+            through = getattr(model, field_name).through
+            m2m_changed.connect(
+                _m2m_invalidator(key_builders),
+                sender=through,
+                weak=False,
+                dispatch_uid=f"cache_m2m:{label}.{field_name}",
+            )
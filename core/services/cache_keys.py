@@ -0,0 +1,39 @@
+import hashlib
+
+# Cache keys shared by every worker. The backend adds KEY_PREFIX and
+# VERSION from settings.CACHES, so bumping CACHE_VERSION drops them all.
+
+SITE_CONTEXT_KEY = "site_context_data"
+# Replaced whenever the site context changes; versions rendered pages.
+SITE_TOKEN_KEY = "site_context_token"
+
+# v2 catalogs carry their by_id index
+TEMPLATE_CATALOG_KEY = "template_catalog:v2"
+
+
+def landing_data_key(period):
+    return f"landing_data_{period}"
+
+
+def landing_page_key(period, version, origin):
+    # Versioned by the landing data it was rendered from, so evicting the
+    # data orphans every rendered page. ``origin`` is scheme://host, which
+    # the page's canonical links are built from.
+    digest = hashlib.md5(origin.encode(), usedforsecurity=False).hexdigest()
+    return f"landing_page_{period}_{version}_{digest}"
+
+
+def otp_code_key(phone):
+    return f"otp_code_{phone}"
+
+
+def otp_attempts_key(phone):
+    return f"otp_attempts_{phone}"
+
+
+def otp_sends_key(phone):
+    return f"otp_sends_{phone}"
+
+
+def otp_cooldown_key(phone):
+    return f"otp_cooldown_{phone}"
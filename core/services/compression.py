@@ -0,0 +1,109 @@
+import gzip
+import secrets
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip variants are produced without it
+    brotli = None
+
+
+IDENTITY = ""
+GZIP = "gzip"
+BROTLI = "br"
+
+# Preferred first when the client accepts several.
+PREFERENCE = (BROTLI, GZIP)
+
+# Not worth a Content-Encoding header below this.
+MIN_COMPRESS_SIZE = 200
+
+
+def compress_level(level):
+    """
+    Set the gzip level CompressionMiddleware uses for a view's responses;
+    0 sends them uncompressed.
+    """
+    def decorator(view_func):
+        view_func.compression_level = level
+        return view_func
+    return decorator
+
+
+def accepted_encodings(request):
+    """
+    Returns:
+        set: content codings the client accepts (q > 0)
+    """
+    accepted = set()
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        try:
+            quality = float(params.strip().removeprefix("q=")) if params else 1.0
+        except ValueError:
+            quality = 1.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    if "*" in accepted:
+        accepted.update(PREFERENCE)
+    return accepted
+
+
+def negotiate(request, offered):
+    """
+    Returns:
+        str: the best of ``offered`` the client accepts, IDENTITY if none
+    """
+    accepted = accepted_encodings(request)
+    return next((coding for coding in PREFERENCE if coding in offered and coding in accepted), IDENTITY)
+
+
+def gzip_bytes(content, level, max_random_bytes=0):
+    """
+    Gzip ``content``. With ``max_random_bytes`` the output length is
+    randomized the way GZipMiddleware does it, against BREACH.
+    """
+    compressed = gzip.compress(content, compresslevel=level, mtime=0)
+    if not max_random_bytes:
+        return compressed
+    header = bytearray(compressed[:10])
+    header[3] = gzip.FNAME
+    return bytes(header) + b"a" * secrets.randbelow(max_random_bytes) + b"\x00" + compressed[10:]
+
+
+def compress_variants(content):
+    """
+    Compress a page once for storage next to it in a cache.
+
+    Only for responses without per-user secrets: stored variants skip the
+    BREACH padding since every client gets the same bytes.
+
+    Returns:
+        dict: content coding -> body, always including IDENTITY
+    """
+    variants = {IDENTITY: content}
+    if len(content) < MIN_COMPRESS_SIZE:
+        return variants
+
+    variants[GZIP] = gzip_bytes(content, getattr(settings, "COMPRESSION_GZIP_LEVEL", 9))
+    if brotli is not None:
+        variants[BROTLI] = brotli.compress(content, quality=getattr(settings, "COMPRESSION_BROTLI_QUALITY", 9))
+    return {coding: body for coding, body in variants.items() if coding == IDENTITY or len(body) < len(content)}
+
+
+def variant_response(request, variants, **kwargs):
+    """
+    Send the stored variant the client accepts best.
+
+    The Content-Encoding header tells CompressionMiddleware to leave the
+    body alone.
+    """
+    coding = negotiate(request, variants)
+    response = HttpResponse(variants[coding], **kwargs)
+    if coding:
+        response.headers["Content-Encoding"] = coding
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,119 @@
+import functools
+import hashlib
+import secrets
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from core.services.cache_keys import SITE_TOKEN_KEY
+
+
+def _packed_ref(git_dir, ref):
+    # After ``git gc`` (or on a fresh clone) refs live in packed-refs only.
+    try:
+        lines = (git_dir / "packed-refs").read_text().splitlines()
+    except OSError:
+        return ""
+    for line in lines:
+        sha, _, name = line.partition(" ")
+        if name == ref:
+            return sha
+    return ""
+
+
+def _git_head():
+    git_dir = Path(settings.BASE_DIR) / ".git"
+    try:
+        head = (git_dir / "HEAD").read_text().strip()
+    except OSError:
+        return ""
+    if not head.startswith("ref: "):
+        return head
+    ref = head.removeprefix("ref: ")
+    try:
+        return (git_dir / ref).read_text().strip()
+    except OSError:
+        return _packed_ref(git_dir, ref)
+
+
+@functools.cache
+def release_token():
+    """
+    Returns:
+        str: token for the deployed code and collected static files, from
+        RELEASE_VERSION (or the git HEAD) and the staticfiles manifest
+    """
+    release = getattr(settings, "RELEASE_VERSION", "") or _git_head()
+    manifest = getattr(staticfiles_storage, "manifest_hash", "")
+    return hashlib.md5(f"{release}|{manifest}".encode(), usedforsecurity=False).hexdigest()[:12]
+
+
+def get_site_token():
+    """
+    Returns:
+        str: token replaced whenever the site context (logo, footer,
+        banners) changes, shared by every worker through the cache
+    """
+    token = cache.get(SITE_TOKEN_KEY)
+    if token is None:
+        token = secrets.token_hex(4)
+        if not cache.add(SITE_TOKEN_KEY, token, None):
+            token = cache.get(SITE_TOKEN_KEY) or token
+    return token
+
+
+async def aget_site_token():
+    token = await cache.aget(SITE_TOKEN_KEY)
+    if token is None:
+        token = secrets.token_hex(4)
+        if not await cache.aadd(SITE_TOKEN_KEY, token, None):
+            token = await cache.aget(SITE_TOKEN_KEY) or token
+    return token
+
+
+def version_etag(*parts):
+    """
+    Returns:
+        str: weak ETag derived from ``parts`` (ids, timestamps, ...); weak
+        because it versions the content, whatever its Content-Encoding
+    """
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return "W/" + quote_etag(digest.hexdigest())
+
+
+def is_conditional(request):
+    """
+    Whether ``request`` is a GET/HEAD revalidation worth a version lookup.
+    """
+    return request.method in ("GET", "HEAD") and "HTTP_IF_NONE_MATCH" in request.META
+
+
+def not_modified_response(request, etag):
+    """
+    Returns:
+        HttpResponseNotModified or None: a 304 if the client's copy is
+        still current
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def set_version_headers(response, etag):
+    """
+    Add an ETag to a fresh response and ask clients to revalidate it.
+
+    No Last-Modified: the page also changes with a release or a site context
+    edit, which the row's updated_at doesn't see, so If-Modified-Since alone
+    would keep answering 304 with an outdated page.
+    """
+    response.headers["ETag"] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
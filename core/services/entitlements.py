@@ -0,0 +1,149 @@
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from Billing.models import UserPlan
+from core.services.request_metrics import record_cache_lookup
+from core.services.template_catalog import get_template_catalog
+
+
+ENTITLEMENTS_KEY_PREFIX = "entitlements"
+
+# Attribute holding the per-request copy on the user object, the way
+# Django memoizes permissions in ``_perm_cache``.
+MEMO_ATTR = "_entitlements_cache"
+
+PRODUCT_LIMITS = {
+    UserPlan.PlanChoices.Pro: 30,
+    UserPlan.PlanChoices.Basic: 15,
+}
+FREE_PRODUCT_LIMIT = 5
+FREE_SHOP_LIMIT = 1
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    plans: tuple
+    plan_ids: frozenset
+
+    @property
+    def has_free_plan(self):
+        return UserPlan.PlanChoices.Free in self.plans
+
+    @property
+    def has_basic_plan(self):
+        return UserPlan.PlanChoices.Basic in self.plans
+
+    @property
+    def has_pro_plan(self):
+        return UserPlan.PlanChoices.Pro in self.plans
+
+    @property
+    def has_paid_plan(self):
+        return self.has_basic_plan or self.has_pro_plan
+
+    @property
+    def can_use_custom_colors(self):
+        return self.has_paid_plan
+
+    @property
+    def can_use_premium_effects(self):
+        """Black/stars backgrounds and the blue tick."""
+        return self.has_pro_plan
+
+    @property
+    def product_limit(self):
+        return max(
+            (PRODUCT_LIMITS.get(plan, FREE_PRODUCT_LIMIT) for plan in self.plans),
+            default=FREE_PRODUCT_LIMIT,
+        )
+
+    @property
+    def shop_limit(self):
+        """Maximum number of shops, or ``None`` when unlimited."""
+        return None if self.has_paid_plan else FREE_SHOP_LIMIT
+
+    def can_use_color(self, color):
+        return color == "default" or self.can_use_custom_colors
+
+    @property
+    def allowed_template_ids(self):
+        """Ids of the templates these plans unlock, from the shared catalog."""
+        return get_template_catalog().allowed_ids(self.plan_ids)
+
+    def can_use_template(self, template):
+        """
+        Check a template against the plans allowed to use it.
+        """
+        return template.id in self.allowed_template_ids
+
+
+NO_ENTITLEMENTS = Entitlements(plans=(), plan_ids=frozenset())
+
+
+def _timeout():
+    return getattr(settings, "ENTITLEMENTS_CACHE_TIMEOUT", 60 * 60)
+
+
+def entitlements_key(user_id):
+    return f"{ENTITLEMENTS_KEY_PREFIX}:{user_id}"
+
+
+def _build(user):
+    rows = list(user.plan.order_by("id").values_list("id", "value"))
+    return Entitlements(
+        plans=tuple(value for _id, value in rows),
+        plan_ids=frozenset(plan_id for plan_id, _value in rows),
+    )
+
+
+def _cache_timeout(user):
+    timeout = _timeout()
+    if user.plan_expires_at is None:
+        return timeout
+
+    # Never serve a cached plan past the moment it expires
+    remaining = int((user.plan_expires_at - timezone.now()).total_seconds())
+    return max(min(timeout, remaining), 1) if timeout else max(remaining, 1)
+
+
+def get_entitlements(user):
+    """
+    Return what ``user``'s plans allow, computed once per request.
+
+    The result is memoized on the user object and cached per user until
+    their plans change (see core.signals).
+
+    Returns:
+        Entitlements: plan set and the limits/flags derived from it
+    """
+    if user is None or not user.is_authenticated:
+        return NO_ENTITLEMENTS
+
+    memo = getattr(user, MEMO_ATTR, None)
+    if memo is not None:
+        return memo
+
+    key = entitlements_key(user.pk)
+    entitlements = record_cache_lookup(cache.get(key))
+    if entitlements is None:
+        entitlements = _build(user)
+        cache.set(key, entitlements, _cache_timeout(user))
+
+    setattr(user, MEMO_ATTR, entitlements)
+    return entitlements
+
+
+def invalidate_entitlements(*user_ids, user=None):
+    """
+    Drop cached entitlements for ``user_ids`` and the memo on ``user``.
+    """
+    if user is not None:
+        try:
+            delattr(user, MEMO_ATTR)
+        except AttributeError:
+            pass
+        user_ids += (user.pk,)
+    cache.delete_many([entitlements_key(user_id) for user_id in user_ids if user_id])
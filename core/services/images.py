@@ -0,0 +1,218 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANT_ROOT = "variants"
+
+# Model label -> (image field, JSON field that stores its variants)
+IMAGE_FIELDS = {
+    "cards.UserCard": ("profile_picture", "profile_picture_variants"),
+    "cards.Portfolio": ("image", "image_variants"),
+    "shop.Product": ("image", "image_variants"),
+    "shop.UserShop": ("logo", "logo_variants"),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _flatten(image):
+    """Drop alpha onto a white background for JPEG output."""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def build_variants(source_path, media_root, stem, widths, quality):
+    """
+    Write resized WebP and JPEG copies of ``source_path``.
+
+    Runs in a worker process, so it only touches Pillow and the file
+    system. Images are never upscaled, and since Pillow only writes
+    EXIF when asked to, metadata is stripped from every variant.
+
+    Returns:
+        dict: ``{"webp": {width: name}, "jpeg": {width: name}}`` with
+        storage-relative names
+    """
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("LA", "P") else "RGB")
+
+    targets = sorted({width for width in widths if width < image.width}) or [image.width]
+    output_dir = os.path.join(media_root, VARIANT_ROOT, os.path.dirname(stem))
+    os.makedirs(output_dir, exist_ok=True)
+
+    result = {"webp": {}, "jpeg": {}}
+    for width in targets:
+        height = max(round(image.height * width / image.width), 1)
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+
+        for fmt, ext, prepared in (
+            ("webp", "webp", resized),
+            ("jpeg", "jpg", _flatten(resized)),
+        ):
+            name = f"{VARIANT_ROOT}/{stem}-{width}.{ext}"
+            options = {"quality": quality}
+            if fmt == "jpeg":
+                options.update(optimize=True, progressive=True)
+            else:
+                options.update(method=4)
+            prepared.save(os.path.join(media_root, name), fmt.upper(), **options)
+            result[fmt][str(width)] = name
+
+    return result
+
+
+def _get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            # Spawned (not forked) children: request workers are threaded.
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PIPELINE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _store_variants(label, pk, source_name, result):
+    model = apps.get_model(label)
+    field_name, variants_field = IMAGE_FIELDS[label]
+
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or getattr(instance, field_name).name != source_name:
+        # Deleted or re-uploaded while the variants were being built.
+        _delete_files(result)
+        return
+
+    _delete_files(getattr(instance, variants_field) or {})
+    setattr(instance, variants_field, {"source": source_name, **result})
+    update_fields = [variants_field]
+    if any(field.name == "updated_at" for field in model._meta.concrete_fields):
+        # Validators and fragment keys go by updated_at; rows without it
+        # touch their card or shop from their own post_save handlers.
+        update_fields.append("updated_at")
+    instance.save(update_fields=update_fields)
+
+
+def _delete_files(variants):
+    for fmt in ("webp", "jpeg"):
+        for name in (variants.get(fmt) or {}).values():
+            default_storage.delete(name)
+
+
+def _on_done(label, pk, source_name, future):
+    try:
+        _store_variants(label, pk, source_name, future.result())
+    except Exception:
+        logger.exception("Image variants failed for %s #%s (%s)", label, pk, source_name)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(label, pk, source_name):
+    """
+    Build variants for one stored image, in the process pool when enabled.
+    """
+    try:
+        source_path = default_storage.path(source_name)
+    except NotImplementedError:
+        return
+
+    stem, _ext = os.path.splitext(source_name)
+    job = (
+        source_path,
+        str(settings.MEDIA_ROOT),
+        stem,
+        tuple(settings.IMAGE_VARIANT_WIDTHS),
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+
+    if settings.IMAGE_PIPELINE_WORKERS <= 0:
+        try:
+            _store_variants(label, pk, source_name, build_variants(*job))
+        except Exception:
+            logger.exception("Image variants failed for %s #%s (%s)", label, pk, source_name)
+        return
+
+    future = _get_executor().submit(build_variants, *job)
+    future.add_done_callback(partial(_on_done, label, pk, source_name))
+
+
+def _drop_variants(label, pk, variants):
+    model = apps.get_model(label)
+    _field_name, variants_field = IMAGE_FIELDS[label]
+
+    _delete_files(variants)
+    # Unless a newer image's variants were stored in the meantime
+    if model.objects.filter(pk=pk).values_list(variants_field, flat=True).first() == variants:
+        model.objects.filter(pk=pk).update(**{variants_field: {}})
+
+
+def _variants_scheduler(label):
+    field_name, variants_field = IMAGE_FIELDS[label]
+
+    def schedule(sender, instance, **kwargs):
+        source_name = getattr(instance, field_name).name
+        variants = getattr(instance, variants_field) or {}
+        if source_name and variants.get("source") == source_name:
+            return
+        if variants:
+            # The image was replaced or cleared; its variants are orphans.
+            transaction.on_commit(partial(_drop_variants, label, instance.pk, variants))
+        if source_name:
+            transaction.on_commit(partial(schedule_variants, label, instance.pk, source_name))
+
+    return schedule
+
+
+def _variants_cleaner(label):
+    _field_name, variants_field = IMAGE_FIELDS[label]
+
+    def clean(sender, instance, **kwargs):
+        variants = getattr(instance, variants_field) or {}
+        if variants:
+            transaction.on_commit(partial(_delete_files, variants))
+
+    return clean
+
+
+def connect_image_pipeline():
+    """
+    Build variants whenever a model in IMAGE_FIELDS stores a new image,
+    and delete them once the image is replaced, cleared or deleted.
+    """
+    for label in IMAGE_FIELDS:
+        model = apps.get_model(label)
+        post_save.connect(
+            _variants_scheduler(label),
+            sender=model,
+            weak=False,
+            dispatch_uid=f"image_variants:{label}",
+        )
+        post_delete.connect(
+            _variants_cleaner(label),
+            sender=model,
+            weak=False,
+            dispatch_uid=f"image_variants_cleanup:{label}",
+        )
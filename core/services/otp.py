@@ -0,0 +1,133 @@
+import hashlib
+import hmac
+import secrets
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.models import OTP
+from core.services.cache_keys import otp_attempts_key, otp_code_key, otp_cooldown_key, otp_sends_key
+from core.utils import send_sms
+
+
+# verify_otp() outcomes
+VALID = "valid"
+INVALID = "invalid"
+EXPIRED = "expired"
+LOCKED = "locked"
+
+
+@dataclass(frozen=True)
+class OTPIssue:
+    sent: bool
+    reason: str
+    code: str = ""
+
+
+def _hash_code(phone, code):
+    # Keyed hash so a leaked cache dump doesn't reveal live codes.
+    return hmac.new(settings.SECRET_KEY.encode(), f"{phone}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+def _increment(key, timeout):
+    """
+    Bump a counter, starting a new ``timeout`` window if the key doesn't
+    exist yet.
+
+    Only as atomic as the cache backend's incr(): Redis and Memcached are,
+    so the send and attempt limits hold across workers. FileBasedCache
+    reads and rewrites the file, so concurrent requests can lose
+    increments and slip a few guesses past OTP_MAX_ATTEMPTS; production
+    should set CACHE_URL to Redis.
+    """
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr(); start a fresh window.
+        cache.set(key, 1, timeout)
+        return 1
+
+
+def issue_otp(phone):
+    """
+    Create a code for ``phone`` unless it is rate limited.
+
+    Only the hashed code is kept, in the cache, for OTP_TTL seconds; a new
+    code replaces the previous one and resets its attempt counter.
+
+    Returns:
+        OTPIssue: ``code`` is set when ``sent`` is True, otherwise
+        ``reason`` is "cooldown" or "rate_limited"
+    """
+    if not cache.add(otp_cooldown_key(phone), 1, getattr(settings, "OTP_RESEND_COOLDOWN", 60)):
+        return OTPIssue(sent=False, reason="cooldown")
+    sends = _increment(otp_sends_key(phone), getattr(settings, "OTP_SEND_WINDOW", 60 * 60))
+    if sends > getattr(settings, "OTP_MAX_SENDS", 5):
+        return OTPIssue(sent=False, reason="rate_limited")
+
+    code = f"{secrets.randbelow(10 ** 6):06d}"
+    ttl = getattr(settings, "OTP_TTL", 120)
+    cache.set_many({otp_code_key(phone): _hash_code(phone, code), otp_attempts_key(phone): 0}, ttl)
+    return OTPIssue(sent=True, reason="", code=code)
+
+
+def send_otp(phone):
+    """
+    Issue a code for ``phone`` and queue it as an SMS.
+
+    Returns:
+        OTPIssue: see issue_otp(); ``code`` is cleared
+    """
+    issued = issue_otp(phone)
+    if issued.sent:
+        send_sms(phone, f"کد ورود شما به X-Link: {issued.code}", sensitive=True)
+    return OTPIssue(sent=issued.sent, reason=issued.reason)
+
+
+def verify_otp(phone, code):
+    """
+    Check ``code`` against the live code for ``phone``.
+
+    A matching code is consumed. After OTP_MAX_ATTEMPTS wrong guesses the
+    code is discarded and a new one has to be requested.
+
+    Returns:
+        str: VALID, INVALID, EXPIRED or LOCKED
+    """
+    code_key = otp_code_key(phone)
+    expected = cache.get(code_key)
+    if expected is None:
+        return EXPIRED
+
+    attempts = _increment(otp_attempts_key(phone), getattr(settings, "OTP_TTL", 120))
+    if attempts > getattr(settings, "OTP_MAX_ATTEMPTS", 5):
+        cache.delete(code_key)
+        return LOCKED
+
+    if not hmac.compare_digest(expected, _hash_code(phone, str(code))):
+        return INVALID
+
+    cache.delete_many([code_key, otp_attempts_key(phone)])
+    return VALID
+
+
+def purge_expired_otps(batch_size=5000):
+    """
+    Delete expired rows left in the legacy OTP table, ``batch_size`` at a
+    time so no single DELETE holds locks for long.
+
+    Returns:
+        int: Number of rows removed
+    """
+    expired = OTP.objects.filter(expires_at__lt=timezone.now()).order_by().values_list("id", flat=True)
+    removed = 0
+    while True:
+        ids = list(expired[:batch_size])
+        if not ids:
+            return removed
+        count, _ = OTP.objects.filter(id__in=ids).delete()
+        removed += count
@@ -0,0 +1,277 @@
+import logging
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, TextField, Value, When
+from django.utils import timezone
+
+from core.models import OutboundMessage
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects sendMessage texts longer than this.
+TELEGRAM_MESSAGE_LIMIT = 4096
+TELEGRAM_SEPARATOR = "\n\n"
+
+_session = None
+
+
+@dataclass(frozen=True)
+class DeliveryResult:
+    sent: int
+    retried: int
+    failed: int
+
+    def __bool__(self):
+        return bool(self.sent or self.retried or self.failed)
+
+
+class DeliveryError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def enqueue_sms(phone, content, sensitive=False):
+    """
+    Queue an SMS for the outbound worker.
+
+    The row is part of the caller's transaction, so nothing is sent for
+    work that gets rolled back. A ``sensitive`` body (an OTP) is blanked
+    as soon as the message is delivered or given up on.
+
+    Returns:
+        OutboundMessage
+    """
+    return OutboundMessage.objects.create(
+        channel=OutboundMessage.Channel.SMS,
+        recipient=phone,
+        body=content,
+        sensitive=sensitive,
+    )
+
+
+def enqueue_telegram(text, chat_ids=None):
+    """
+    Queue a Telegram message for each of ``chat_ids``, the admin chats by
+    default.
+
+    Returns:
+        list: the queued OutboundMessage rows
+    """
+    if chat_ids is None:
+        chat_ids = getattr(settings, "TELEGRAM_ADMIN_CHAT_IDS", [])
+    return OutboundMessage.objects.bulk_create([
+        OutboundMessage(channel=OutboundMessage.Channel.TELEGRAM, recipient=str(chat_id), body=text)
+        for chat_id in chat_ids
+    ])
+
+
+def get_session():
+    """
+    Return the worker's shared HTTP session, keeping provider connections
+    alive between messages.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=getattr(settings, "OUTBOUND_HTTP_POOL_SIZE", 10))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
+def _post(url, data):
+    try:
+        response = get_session().post(url, data=data, timeout=getattr(settings, "OUTBOUND_HTTP_TIMEOUT", 10))
+    except requests.RequestException as exc:
+        raise DeliveryError(str(exc)) from exc
+
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = {}
+    if response.status_code >= 400:
+        retry_after = (payload.get("parameters") or {}).get("retry_after") if isinstance(payload, dict) else None
+        raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", retry_after=retry_after)
+    return payload
+
+
+def send_sms_message(message):
+    """
+    Deliver one SMS through the Melipayamak REST API.
+    """
+    if not settings.MELIPAYAMAK_USERNAME or not settings.MELIPAYAMAK_APIKEY:
+        raise DeliveryError("Melipayamak credentials are not configured")
+
+    payload = _post(settings.SMS_API_URL, {
+        "username": settings.MELIPAYAMAK_USERNAME,
+        "password": settings.MELIPAYAMAK_APIKEY,
+        "to": message.recipient,
+        "from": settings.MELIPAYAMAK_NUMBER,
+        "text": message.body,
+        "isFlash": "false",
+    })
+    if payload.get("RetStatus") != 1:
+        raise DeliveryError(f"Melipayamak rejected the message: {payload.get('StrRetStatus', payload)}")
+
+
+def send_telegram_text(chat_id, text):
+    """
+    Deliver one sendMessage call to ``chat_id``.
+    """
+    token = getattr(settings, "TELEGRAM_BOT_TOKEN", "")
+    if not token:
+        raise DeliveryError("TELEGRAM_BOT_TOKEN is not configured")
+
+    payload = _post(f"{settings.TELEGRAM_API_URL}/bot{token}/sendMessage", {
+        "chat_id": chat_id,
+        "text": text,
+        "parse_mode": "Markdown",
+    })
+    if not payload.get("ok"):
+        raise DeliveryError(f"Telegram rejected the message: {payload.get('description', payload)}")
+
+
+def telegram_batches(messages):
+    """
+    Pack messages into as few sendMessage texts as fit Telegram's length
+    limit, one list per chat, preserving order.
+
+    Returns:
+        list: (chat_id, text, messages) tuples
+    """
+    batches = []
+    open_batches = {}
+    for message in messages:
+        body = message.body[:TELEGRAM_MESSAGE_LIMIT]
+        current = open_batches.get(message.recipient)
+        if current is not None and len(current[1]) + len(TELEGRAM_SEPARATOR) + len(body) <= TELEGRAM_MESSAGE_LIMIT:
+            current[1] = f"{current[1]}{TELEGRAM_SEPARATOR}{body}"
+            current[2].append(message)
+            continue
+        current = [message.recipient, body, [message]]
+        open_batches[message.recipient] = current
+        batches.append(current)
+    return [tuple(batch) for batch in batches]
+
+
+def retry_delay(attempts, retry_after=None):
+    """
+    Exponential backoff with jitter for a message that has failed
+    ``attempts`` times.
+    """
+    base = getattr(settings, "OUTBOUND_RETRY_BASE_DELAY", 30)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, "OUTBOUND_RETRY_MAX_DELAY", 60 * 60))
+    delay += random.uniform(0, delay / 10)
+    return timedelta(seconds=max(delay, retry_after or 0))
+
+
+def claim_due_messages(limit):
+    """
+    Lease up to ``limit`` due messages to this worker.
+
+    Claimed rows are pushed past OUTBOUND_LEASE_SECONDS so concurrent
+    workers skip them; a worker that dies mid-batch leaves them to be
+    retried once the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboundMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboundMessage.Status.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        if messages:
+            lease = timedelta(seconds=getattr(settings, "OUTBOUND_LEASE_SECONDS", 120))
+            OutboundMessage.objects.filter(id__in=[m.id for m in messages]).update(next_attempt_at=now + lease)
+    return messages
+
+
+def _mark_sent(messages):
+    OutboundMessage.objects.filter(id__in=[m.id for m in messages]).update(
+        status=OutboundMessage.Status.SENT,
+        sent_at=timezone.now(),
+        attempts=F("attempts") + 1,
+        last_error="",
+        body=Case(When(sensitive=True, then=Value("")), default=F("body"), output_field=TextField()),
+    )
+
+
+def _mark_failed(messages, error):
+    max_attempts = getattr(settings, "OUTBOUND_MAX_ATTEMPTS", 6)
+    now = timezone.now()
+    retried = failed = 0
+    for message in messages:
+        message.attempts += 1
+        message.last_error = str(error)
+        if message.attempts >= max_attempts:
+            message.status = OutboundMessage.Status.FAILED
+            if message.sensitive:
+                message.body = ""
+            failed += 1
+        else:
+            message.next_attempt_at = now + retry_delay(message.attempts, error.retry_after)
+            retried += 1
+    OutboundMessage.objects.bulk_update(messages, ["attempts", "last_error", "status", "next_attempt_at", "body"])
+    logger.warning("Outbound delivery failed for %d message(s): %s", len(messages), error)
+    return retried, failed
+
+
+def deliver_due_messages(limit=None):
+    """
+    Send one batch of due messages.
+
+    Telegram messages to the same chat are joined into a single
+    sendMessage call; SMS go out one request each over the pooled session.
+
+    Returns:
+        DeliveryResult: messages sent, scheduled for retry and given up on
+    """
+    messages = claim_due_messages(limit or getattr(settings, "OUTBOUND_BATCH_SIZE", 100))
+    sms = [m for m in messages if m.channel == OutboundMessage.Channel.SMS]
+    telegram = [m for m in messages if m.channel == OutboundMessage.Channel.TELEGRAM]
+
+    groups = [(send_sms_message, (m,), [m]) for m in sms]
+    groups += [(send_telegram_text, (chat_id, text), batch) for chat_id, text, batch in telegram_batches(telegram)]
+
+    sent = retried = failed = 0
+    for send, args, batch in groups:
+        try:
+            send(*args)
+        except DeliveryError as exc:
+            batch_retried, batch_failed = _mark_failed(batch, exc)
+            retried += batch_retried
+            failed += batch_failed
+        else:
+            _mark_sent(batch)
+            sent += len(batch)
+    return DeliveryResult(sent=sent, retried=retried, failed=failed)
+
+
+def purge_finished_messages(max_age=None):
+    """
+    Delete messages delivered, or given up on, more than ``max_age``
+    seconds ago.
+
+    Returns:
+        int: Number of rows removed
+    """
+    max_age = max_age if max_age is not None else getattr(settings, "OUTBOUND_RETENTION", 60 * 60 * 24 * 7)
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    removed, _ = OutboundMessage.objects.filter(
+        Q(status=OutboundMessage.Status.SENT, sent_at__lt=cutoff)
+        # Failed rows stop being retried; their last attempt was scheduled
+        # no later than next_attempt_at.
+        | Q(status=OutboundMessage.Status.FAILED, next_attempt_at__lt=cutoff)
+    ).delete()
+    return removed
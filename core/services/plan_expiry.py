@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cards.models import UserCard
+from cards.services.page_cache import invalidate_card_page
+from cards.services.snapshots import rebuild_card_snapshots
+from core.models import CustomUser, UserPlan
+from core.services.entitlements import invalidate_entitlements
+
+
+# Card options only paid plans may use; reset when a plan expires.
+PREMIUM_CARD_DEFAULTS = {
+    "black_background": False,
+    "stars_background": False,
+    "blue_tick": False,
+    "color": "default",
+}
+
+
+@dataclass(frozen=True)
+class PlanExpiryResult:
+    users: int
+    cards: int
+    chunks: int
+
+
+def _chunk_size():
+    return getattr(settings, "PLAN_EXPIRY_CHUNK_SIZE", 2000)
+
+
+def expired_plan_users(now=None):
+    now = now or timezone.now()
+    return CustomUser.objects.filter(plan_expires_at__lt=now)
+
+
+def _premium_cards(user_ids):
+    uses_premium = Q()
+    for field, default in PREMIUM_CARD_DEFAULTS.items():
+        uses_premium |= ~Q(**{field: default})
+    return UserCard.objects.filter(uses_premium, user_id__in=user_ids)
+
+
+def _expire_chunk(after_id, free_plan_id, now, chunk_size):
+    through = CustomUser.plan.through
+
+    with transaction.atomic():
+        user_ids = list(
+            expired_plan_users(now)
+            .select_for_update()
+            .filter(id__gt=after_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            return user_ids, 0
+
+        through.objects.filter(customuser_id__in=user_ids).delete()
+        through.objects.bulk_create(
+            [through(customuser_id=user_id, userplan_id=free_plan_id) for user_id in user_ids]
+        )
+        CustomUser.objects.filter(id__in=user_ids).update(plan_expires_at=None)
+
+        card_ids = list(_premium_cards(user_ids).order_by().values_list("id", flat=True))
+        UserCard.objects.filter(id__in=card_ids).update(updated_at=now, **PREMIUM_CARD_DEFAULTS)
+        rebuild_card_snapshots(card_ids)
+
+        def evict():
+            invalidate_entitlements(*user_ids)
+            for card_id in card_ids:
+                invalidate_card_page(card_id)
+
+        transaction.on_commit(evict)
+
+    return user_ids, len(card_ids)
+
+
+def expire_plans(now=None, chunk_size=None):
+    """
+    Move every user whose plan has expired back to the Free plan.
+
+    Works set-based in chunks of ``chunk_size`` users, each in its own short
+    transaction: plan links are replaced with two statements and premium
+    card options are reset with a single UPDATE, bypassing per-row saves
+    (and signals, so cached entitlements, card pages and card snapshots are
+    refreshed here).
+
+    Returns:
+        PlanExpiryResult: number of users expired, cards reset and chunks run
+    """
+    now = now or timezone.now()
+    chunk_size = chunk_size or _chunk_size()
+    free_plan, _ = UserPlan.objects.get_or_create(value=UserPlan.PlanChoices.Free)
+
+    users = cards = chunks = 0
+    last_id = 0
+    while True:
+        user_ids, chunk_cards = _expire_chunk(last_id, free_plan.id, now, chunk_size)
+        if not user_ids:
+            break
+
+        users += len(user_ids)
+        cards += chunk_cards
+        chunks += 1
+        if len(user_ids) < chunk_size:
+            break
+        last_id = user_ids[-1]
+
+    return PlanExpiryResult(users=users, cards=cards, chunks=chunks)
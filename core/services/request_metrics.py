@@ -0,0 +1,154 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Metrics of the request being served, shared with sync_to_async threads.
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Per-request counters collected by RequestMetricsMiddleware.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        # Only lookups wrapped in record_cache_lookup, not every cache call
+        self.lookup_hits = 0
+        self.lookup_misses = 0
+        self.query_budget = None
+        self.view_name = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def over_budget(self):
+        return self.query_budget is not None and self.queries > self.query_budget
+
+    def server_timing(self):
+        """
+        Returns:
+            str: ``Server-Timing`` header value, durations in milliseconds
+        """
+        return ", ".join([
+            f"db;dur={self.sql_time * 1000:.1f};desc=\"{self.queries} queries\"",
+            f"tpl;dur={self.template_time * 1000:.1f}",
+            f"lookups;desc=\"{self.lookup_hits} hits, {self.lookup_misses} misses\"",
+            f"total;dur={self.elapsed * 1000:.1f}",
+        ])
+
+    def log_fields(self):
+        return {
+            "view": self.view_name,
+            "queries": self.queries,
+            "query_budget": self.query_budget,
+            "sql_ms": round(self.sql_time * 1000, 1),
+            "template_ms": round(self.template_time * 1000, 1),
+            "lookup_hits": self.lookup_hits,
+            "lookup_misses": self.lookup_misses,
+            "total_ms": round(self.elapsed * 1000, 1),
+        }
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def collect_metrics():
+    """
+    Collect metrics for everything run inside the block.
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def record_cache_lookup(value):
+    """
+    Count a cached lookup (page, listing, catalog, entitlements...) for the
+    current request and return ``value`` unchanged.
+
+    Other cache calls, such as template fragments and sessions, are not
+    counted; the metrics call these "lookups" rather than cache hits.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        if value is None:
+            metrics.lookup_misses += 1
+        else:
+            metrics.lookup_hits += 1
+    return value
+
+
+@contextmanager
+def timed(attribute):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - start)
+
+
+def query_counter(execute, sql, params, many, context):
+    """
+    Database execute wrapper installed on every connection (see core.apps).
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if query_counter not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_counter)
+
+
+def query_budget(budget, **method_budgets):
+    """
+    Declare the most queries a view may run per request.
+
+    Keyword arguments override the budget for one HTTP method, e.g.
+    ``query_budget(12, post=40)`` for a view whose form submissions do
+    more work than its page renders.
+
+    Requests over budget are logged by RequestMetricsMiddleware, and tests
+    assert against it with ``XLinkTestCase.assert_within_query_budget``.
+    """
+    def decorator(view):
+        view.query_budget = budget
+        view.method_query_budgets = {
+            method.upper(): value for method, value in method_budgets.items()
+        }
+        return view
+    return decorator
+
+
+def budget_for(view_func, method):
+    """
+    Returns:
+        The query budget ``view_func`` declared for ``method``, or None.
+    """
+    budgets = getattr(view_func, "method_query_budgets", {})
+    return budgets.get(method, getattr(view_func, "query_budget", None))
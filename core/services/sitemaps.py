@@ -0,0 +1,229 @@
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.urls import reverse
+from django.utils import timezone
+
+from cards.models import UserCard
+from core.services.compression import brotli
+
+
+XML_CONTENT_TYPE = "application/xml; charset=utf-8"
+URLSET_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+)
+URLSET_CLOSE = "</urlset>"
+INDEX_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+)
+INDEX_CLOSE = "</sitemapindex>"
+MANIFEST_NAME = "manifest.json"
+USERNAME_PLACEHOLDER = "__username__"
+
+
+def shard_size():
+    return getattr(settings, "SITEMAP_SHARD_SIZE", 50000)
+
+
+def chunk_size():
+    return getattr(settings, "SITEMAP_CHUNK_SIZE", 2000)
+
+
+def sitemap_root():
+    return Path(settings.SITEMAP_ROOT)
+
+
+def shard_path(shard):
+    return sitemap_root() / f"sitemap-cards-{shard}.xml.gz"
+
+
+def brotli_shard_path(shard):
+    return sitemap_root() / f"sitemap-cards-{shard}.xml.br"
+
+
+def _published_cards():
+    return UserCard.objects.filter(is_published=True)
+
+
+def card_shards():
+    """
+    Summarise published cards per shard with a single GROUP BY query.
+
+    Shards are fixed id ranges of ``SITEMAP_SHARD_SIZE`` so a card never
+    moves between shards and each shard stays under the 50,000 URL limit.
+
+    Returns:
+        list: ``(shard, lastmod, count)`` tuples ordered by shard
+    """
+    rows = (
+        _published_cards()
+        .annotate(shard=F("id") / shard_size())
+        .values("shard")
+        .annotate(lastmod=Max("updated_at"), count=Count("id"))
+        .order_by("shard")
+    )
+    return [(row["shard"], row["lastmod"], row["count"]) for row in rows]
+
+
+def iter_card_urls(base_url, shard):
+    """
+    Yield ``<url>`` rows for one shard, keyset-paginated on id.
+    """
+    size = shard_size()
+    path_template = reverse("view_card", kwargs={"username": USERNAME_PLACEHOLDER})
+    queryset = (
+        _published_cards()
+        .filter(id__lt=(shard + 1) * size)
+        .order_by("id")
+        .values_list("id", "username", "updated_at")
+    )
+
+    last_id = shard * size - 1
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size()])
+        if not chunk:
+            return
+
+        for _card_id, username, updated_at in chunk:
+            loc = base_url + path_template.replace(USERNAME_PLACEHOLDER, username)
+            yield (
+                f"<url><loc>{loc}</loc><lastmod>{updated_at.date().isoformat()}</lastmod>"
+                "<changefreq>weekly</changefreq><priority>0.6</priority></url>"
+            )
+        last_id = chunk[-1][0]
+
+
+def iter_urlset(rows):
+    yield URLSET_OPEN
+    yield from rows
+    yield URLSET_CLOSE
+
+
+def render_index(entries):
+    """
+    Render a sitemap index from ``(loc, lastmod)`` pairs.
+    """
+    rows = [
+        f"<sitemap><loc>{loc}</loc><lastmod>{lastmod}</lastmod></sitemap>"
+        for loc, lastmod in entries
+    ]
+    return f"{INDEX_OPEN}{''.join(rows)}{INDEX_CLOSE}"
+
+
+def iter_gzip_file(path, block_size=64 * 1024):
+    with gzip.open(path, "rb") as fh:
+        while True:
+            block = fh.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def load_manifest():
+    """
+    Load the manifest written by ``build_sitemaps``.
+
+    Returns:
+        dict or None: Manifest data, or None if shards were never built
+    """
+    try:
+        with open(sitemap_root() / MANIFEST_NAME, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write_json(path, data):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, path)
+
+
+def _write_brotli_copy(path, br_path):
+    # Built offline, so use the slowest, smallest setting.
+    with gzip.open(path, "rb") as fh:
+        content = brotli.compress(fh.read(), quality=11)
+    tmp_path = br_path.with_name(f"{br_path.name}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, br_path)
+
+
+def build_card_shards(base_url, force=False):
+    """
+    Write every card shard gzip-compressed to ``SITEMAP_ROOT``, plus a
+    brotli copy when the brotli package is installed.
+
+    Shards whose lastmod and URL count match the previous manifest are kept
+    as they are unless ``force`` is set.
+
+    Returns:
+        tuple: ``(written, skipped)`` shard counts
+    """
+    root = sitemap_root()
+    root.mkdir(parents=True, exist_ok=True)
+
+    previous = load_manifest() or {}
+    previous_shards = {}
+    if previous.get("base_url") == base_url:
+        previous_shards = {item["shard"]: item for item in previous.get("shards", [])}
+
+    shards = []
+    written = skipped = 0
+    for shard, lastmod, count in card_shards():
+        entry = {"shard": shard, "lastmod": lastmod.isoformat(), "count": count}
+        shards.append(entry)
+
+        path = shard_path(shard)
+        br_path = brotli_shard_path(shard)
+        if (
+            not force
+            and previous_shards.get(shard) == entry
+            and path.exists()
+            and (brotli is None or br_path.exists())
+        ):
+            skipped += 1
+            continue
+
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+            for part in iter_urlset(iter_card_urls(base_url, shard)):
+                fh.write(part)
+        os.replace(tmp_path, path)
+        if brotli is not None:
+            _write_brotli_copy(path, br_path)
+        written += 1
+
+    live_names = {shard_path(entry["shard"]).name for entry in shards}
+    if brotli is not None:
+        live_names |= {brotli_shard_path(entry["shard"]).name for entry in shards}
+    for stale in (*root.glob("sitemap-cards-*.xml.gz"), *root.glob("sitemap-cards-*.xml.br")):
+        if stale.name not in live_names:
+            stale.unlink()
+
+    _atomic_write_json(root / MANIFEST_NAME, {
+        "base_url": base_url,
+        "generated_at": timezone.now().isoformat(),
+        "shards": shards,
+    })
+    return written, skipped
+
+
+def shard_entries():
+    """
+    Get ``(shard, lastmod date)`` pairs, preferring the prebuilt manifest.
+    """
+    manifest = load_manifest()
+    if manifest is not None:
+        return [
+            (item["shard"], datetime.fromisoformat(item["lastmod"]).date())
+            for item in manifest.get("shards", [])
+        ]
+    return [(shard, lastmod.date()) for shard, lastmod, _count in card_shards()]
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from core.models import UserSubdomain
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    ``might_contain`` never returns False for an added item, so a negative
+    answer is definitive while a positive one must be confirmed elsewhere.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TakenSubdomainFilter:
+    """
+    Per-process membership filter of registered subdomains.
+
+    Built from the database in a background thread, started by ``warm()``
+    when the server loads or on first use, and extended by the
+    UserSubdomain post_save signal. Until the first build finishes every
+    name counts as possibly taken, so callers fall back to the database
+    instead of waiting for it. Renames and deletes cannot be removed from
+    a Bloom filter, so the filter is rebuilt once too many entries went
+    stale or ``SUBDOMAIN_FILTER_MAX_AGE`` has passed (which also picks up
+    names registered by other workers).
+    """
+
+    def __init__(self):
+        self._filter = None
+        self._built_at = 0.0
+        self._stale = 0
+        self._capacity = 0
+        self._building = False
+        # Names added while a build reads the database, replayed into the
+        # new filter so they are not lost by the swap.
+        self._added_during_build = None
+        self._lock = threading.Lock()
+
+    def _max_age(self):
+        return getattr(settings, "SUBDOMAIN_FILTER_MAX_AGE", 60 * 10)
+
+    def _in_background(self):
+        return getattr(settings, "SUBDOMAIN_FILTER_BUILD_IN_BACKGROUND", True)
+
+    def _needs_rebuild(self):
+        if self._filter is None:
+            return True
+        if time.monotonic() - self._built_at > self._max_age():
+            return True
+        return self._stale > self._capacity // 10
+
+    def _build(self):
+        with self._lock:
+            self._added_during_build = []
+            stale = self._stale
+
+        names = UserSubdomain.objects.values_list("subdomain", flat=True)
+        count = names.count()
+        # Leave headroom for signups between rebuilds.
+        capacity = max(count * 2, 10000)
+        bloom = BloomFilter(capacity)
+        for name in names.iterator(chunk_size=5000):
+            bloom.add(name)
+
+        with self._lock:
+            for name in self._added_during_build:
+                bloom.add(name)
+            self._filter = bloom
+            self._capacity = capacity
+            self._built_at = time.monotonic()
+            # Releases during the build may not be in the rows read
+            self._stale -= stale
+
+    def _run_build(self):
+        try:
+            self._build()
+        except Exception:
+            logger.exception("Building the taken-subdomain filter failed")
+        finally:
+            with self._lock:
+                self._building = False
+                self._added_during_build = None
+            if self._in_background():
+                connection.close()
+
+    def warm(self):
+        """
+        Start a build unless one is running or the filter is still fresh.
+        """
+        with self._lock:
+            if self._building or not self._needs_rebuild():
+                return
+            self._building = True
+
+        if self._in_background():
+            threading.Thread(target=self._run_build, name="subdomain-filter-build", daemon=True).start()
+        else:
+            self._run_build()
+
+    def might_be_taken(self, name):
+        if self._needs_rebuild():
+            self.warm()
+        bloom = self._filter
+        return bloom is None or bloom.might_contain(name)
+
+    def add(self, name):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(name)
+            if self._added_during_build is not None:
+                self._added_during_build.append(name)
+
+    def mark_stale(self):
+        with self._lock:
+            self._stale += 1
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+            self._stale = 0
+            self._building = False
+
+
+taken_subdomains = TakenSubdomainFilter()
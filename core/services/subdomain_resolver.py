@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from cards.models import CardSnapshot, UserCard
+
+
+class SubdomainResolver:
+    """
+    Bounded per-process LRU cache mapping subdomain -> published card id.
+
+    Unknown, inactive and unpublished subdomains are cached as negative
+    (``None``) entries with a shorter TTL, so scans of random names are
+    answered without a database query. Entries are evicted by the
+    UserSubdomain/UserCard signals in ``cards.signals``; other workers
+    pick changes up once their entry's TTL runs out. Until then a positive
+    entry is only a hint: the subdomain views load and revalidate the card
+    by ``CardSnapshot.subdomain``, so a moved or deactivated subdomain is
+    never served from a stale card id.
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _snapshot_queryset(self, subdomain):
+        # Snapshots exist only for published cards and carry the active
+        # subdomain, so the unique column answers without a join.
+        return CardSnapshot.objects.filter(subdomain=subdomain).values_list("card_id", flat=True)
+
+    def _queryset(self, subdomain):
+        # Cards whose snapshot has not been built yet
+        return (
+            UserCard.objects.filter(
+                user__subdomain__subdomain=subdomain,
+                user__subdomain__is_active=True,
+                is_published=True,
+            )
+            .values_list("id", flat=True)
+        )
+
+    def _cached(self, subdomain, now):
+        with self._lock:
+            entry = self._entries.get(subdomain)
+            if entry is None:
+                return False, None
+
+            card_id, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(subdomain)
+                return True, card_id
+            del self._entries[subdomain]
+            return False, None
+
+    def _store(self, subdomain, card_id, now):
+        ttl = self.ttl if card_id is not None else self.negative_ttl
+        with self._lock:
+            self._entries[subdomain] = (card_id, now + ttl)
+            self._entries.move_to_end(subdomain)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def resolve(self, subdomain):
+        """
+        Resolve a subdomain to its published card id.
+
+        Returns:
+            int or None: Card id, or None if nothing is published there
+        """
+        now = time.monotonic()
+        found, card_id = self._cached(subdomain, now)
+        if not found:
+            card_id = self._snapshot_queryset(subdomain).first() or self._queryset(subdomain).first()
+            self._store(subdomain, card_id, now)
+        return card_id
+
+    async def aresolve(self, subdomain):
+        now = time.monotonic()
+        found, card_id = self._cached(subdomain, now)
+        if not found:
+            card_id = await self._snapshot_queryset(subdomain).afirst() or await self._queryset(subdomain).afirst()
+            self._store(subdomain, card_id, now)
+        return card_id
+
+    def invalidate(self, subdomain=None, card_id=None):
+        with self._lock:
+            if subdomain is not None:
+                self._entries.pop(subdomain, None)
+            if card_id is not None:
+                stale = [name for name, (cid, _) in self._entries.items() if cid == card_id]
+                for name in stale:
+                    del self._entries[name]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+subdomain_resolver = SubdomainResolver(
+    max_size=getattr(settings, "SUBDOMAIN_RESOLVER_MAX_SIZE", 10000),
+    ttl=getattr(settings, "SUBDOMAIN_RESOLVER_TTL", 300),
+    negative_ttl=getattr(settings, "SUBDOMAIN_RESOLVER_NEGATIVE_TTL", 60),
+)
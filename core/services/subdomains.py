@@ -1,8 +1,11 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 
 from django.db import IntegrityError, transaction
 
 from core.models import UserSubdomain
+from core.services.subdomain_filter import taken_subdomains
 from core.subdomains import (
     is_reserved_subdomain,
     normalize_subdomain_name,
@@ -10,6 +13,10 @@ from core.subdomains import (
 )
 
 
+# Subdomain -> owner user id (or None) looked up during the current request.
+_owner_memo = ContextVar("subdomain_owner_memo", default=None)
+
+
 @dataclass(frozen=True)
 class SubdomainResult:
     available: bool
@@ -17,7 +24,48 @@ class SubdomainResult:
     name: str
 
 
-def check_subdomain_availability(name, user=None):
+@contextmanager
+def subdomain_check_memo():
+    """
+    Share subdomain owner lookups between checks made in one request.
+    """
+    token = _owner_memo.set({})
+    try:
+        yield
+    finally:
+        _owner_memo.reset(token)
+
+
+def _lookup_owner_id(name):
+    memo = _owner_memo.get()
+    if memo is not None and name in memo:
+        return memo[name]
+
+    owner_id = (
+        UserSubdomain.objects.filter(subdomain=name)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    if memo is not None:
+        memo[name] = owner_id
+    return owner_id
+
+
+def _remember_owner(name, user_id):
+    memo = _owner_memo.get()
+    if memo is not None:
+        memo[name] = user_id
+
+
+def check_subdomain_availability(name, user=None, allow_stale=False):
+    """
+    Check whether ``name`` can be used as ``user``'s subdomain.
+
+    With ``allow_stale`` a name missing from the in-memory taken-subdomain
+    filter is reported available without a query. That answer can miss
+    names registered by another worker since its last rebuild, so only
+    advisory callers (the live availability API) should pass it.
+    """
     normalized = normalize_subdomain_name(name)
 
     if not validate_subdomain_format(normalized):
@@ -26,12 +74,14 @@ def check_subdomain_availability(name, user=None):
     if is_reserved_subdomain(normalized):
         return SubdomainResult(available=False, reason="reserved", name=normalized)
 
-    existing = UserSubdomain.objects.filter(subdomain=normalized).only("id", "user_id").first()
-    if existing and user is not None and existing.user_id == user.id:
+    if allow_stale and not taken_subdomains.might_be_taken(normalized):
+        return SubdomainResult(available=True, reason="ok", name=normalized)
+
+    owner_id = _lookup_owner_id(normalized)
+    if owner_id is not None and user is not None and owner_id == user.id:
         return SubdomainResult(available=True, reason="ok", name=normalized)
 
-    exists = existing is not None
-    if exists:
+    if owner_id is not None:
         return SubdomainResult(available=False, reason="taken", name=normalized)
 
     return SubdomainResult(available=True, reason="ok", name=normalized)
@@ -53,4 +103,5 @@ def assign_subdomain_to_user(user, name):
     except IntegrityError:
         return SubdomainResult(available=False, reason="taken", name=normalized)
 
+    _remember_owner(normalized, user.id)
     return SubdomainResult(available=True, reason="ok", name=normalized)
@@ -0,0 +1,129 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+
+from Billing.models import Template, UserPlan
+from core.services.cache_keys import TEMPLATE_CATALOG_KEY
+from core.services.request_metrics import record_cache_lookup
+
+
+# Catalog already fetched during the current request (template_catalog_memo)
+_catalog_memo = ContextVar("template_catalog_memo", default=None)
+
+
+@dataclass(frozen=True)
+class CatalogTemplate:
+    id: int
+    name: str
+    image_url: str
+    is_active: bool
+    # Empty when every plan may use the template
+    allowed_plan_ids: frozenset
+    allowed_plan_values: tuple
+    allowed_plan_labels: tuple
+
+
+@dataclass(frozen=True)
+class TemplateCatalog:
+    """
+    Every card template with its plan restrictions, precomputed.
+
+    ``allowed_by_plan`` maps each plan id to the restricted templates it
+    unlocks; ``open_ids`` are the templates every plan may use.
+    """
+
+    templates: tuple
+    open_ids: frozenset
+    allowed_by_plan: dict
+    by_id: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "by_id", {entry.id: entry for entry in self.templates})
+
+    def get(self, template_id):
+        return self.by_id.get(template_id)
+
+    def allowed_ids(self, plan_ids):
+        """
+        Returns:
+            frozenset: ids of the templates a user with ``plan_ids`` may use
+        """
+        return self.open_ids.union(*(self.allowed_by_plan.get(plan_id, ()) for plan_id in plan_ids))
+
+
+def build_template_catalog():
+    """
+    Read every template and its allowed plans in two queries.
+    """
+    templates = list(Template.objects.order_by("name"))
+    links = list(
+        Template.allowed_plans.through.objects
+        .order_by("userplan_id")
+        .values_list("template_id", "userplan_id", "userplan__value")
+    )
+    labels = dict(UserPlan.PlanChoices.choices)
+
+    plans_by_template = {}
+    allowed_by_plan = {}
+    for template_id, plan_id, value in links:
+        plans_by_template.setdefault(template_id, []).append((plan_id, value))
+        allowed_by_plan.setdefault(plan_id, set()).add(template_id)
+
+    entries = []
+    for template in templates:
+        plans = plans_by_template.get(template.id, ())
+        entries.append(CatalogTemplate(
+            id=template.id,
+            name=template.name,
+            image_url=template.image.url if template.image else "",
+            is_active=template.is_active,
+            allowed_plan_ids=frozenset(plan_id for plan_id, _value in plans),
+            allowed_plan_values=tuple(value for _plan_id, value in plans),
+            allowed_plan_labels=tuple(labels.get(value, value) for _plan_id, value in plans),
+        ))
+
+    return TemplateCatalog(
+        templates=tuple(entries),
+        open_ids=frozenset(entry.id for entry in entries if not entry.allowed_plan_ids),
+        allowed_by_plan={plan_id: frozenset(ids) for plan_id, ids in allowed_by_plan.items()},
+    )
+
+
+@contextmanager
+def template_catalog_memo():
+    """
+    Fetch the catalog from the cache at most once inside the block, e.g.
+    for every row of an admin changelist.
+    """
+    token = _catalog_memo.set({})
+    try:
+        yield
+    finally:
+        _catalog_memo.reset(token)
+
+
+def get_template_catalog():
+    """
+    Return the shared template catalog, building it on a cache miss.
+
+    The entry is evicted whenever a Template or its allowed plans change
+    (see core.services.cache_invalidation). Inside template_catalog_memo()
+    the catalog is fetched once.
+
+    Returns:
+        TemplateCatalog
+    """
+    memo = _catalog_memo.get()
+    if memo:
+        return memo["catalog"]
+
+    catalog = record_cache_lookup(cache.get(TEMPLATE_CATALOG_KEY))
+    if catalog is None:
+        catalog = build_template_catalog()
+        cache.set(TEMPLATE_CATALOG_KEY, catalog, getattr(settings, "TEMPLATES_CACHE_TIMEOUT", 60 * 60))
+    if memo is not None:
+        memo["catalog"] = catalog
+    return catalog
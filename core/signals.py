@@ -1,6 +1,8 @@
 from django.dispatch import Signal, receiver
-from django.db.models.signals import post_save
-from .models import CustomUser, UserPlan
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from .models import CustomUser, UserPlan, UserSubdomain
+from .services.entitlements import invalidate_entitlements
+from .services.subdomain_filter import taken_subdomains
 
 # Signal sent when a new user is registered via custom signup view
 user_registered = Signal()
@@ -19,3 +21,42 @@ def assign_free_plan(sender, instance, created, **kwargs):
             CustomUser.objects.filter(id=instance.id).update(plan_expires_at=None)
         except Exception as e:
             print(f"Error assigning free plan to user {instance.username}: {e}")
+
+
+@receiver(m2m_changed, sender=CustomUser.plan.through)
+def invalidate_plan_entitlements(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop cached entitlements of users whose plans were added or removed.
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_entitlements(user=instance)
+    elif action == "pre_clear":
+        invalidate_entitlements(*instance.customuser_set.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove") and pk_set:
+        invalidate_entitlements(*pk_set)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_entitlements(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Entitlements are cached until ``plan_expires_at``; re-read it on change.
+    """
+    if not created and (update_fields is None or "plan_expires_at" in update_fields):
+        invalidate_entitlements(user=instance)
+
+
+@receiver(post_save, sender=UserSubdomain)
+def add_taken_subdomain(sender, instance, created, **kwargs):
+    """
+    Keep the in-memory taken-subdomain filter in sync with new names.
+    """
+    taken_subdomains.add(instance.subdomain)
+    if not created:
+        # The previous name may have been released; it stays in the filter.
+        taken_subdomains.mark_stale()
+
+
+@receiver(post_delete, sender=UserSubdomain)
+def release_taken_subdomain(sender, instance, **kwargs):
+    taken_subdomains.mark_stale()
@@ -0,0 +1,128 @@
+import logging
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+
+from core.services.compression import brotli, gzip_bytes
+
+try:
+    import rcssmin
+except ImportError:  # optional, CSS is shipped unminified without it
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:  # optional, JS is shipped unminified without it
+    rjsmin = None
+
+
+logger = logging.getLogger(__name__)
+
+PRECOMPRESS_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt", ".xml", ".html", ".map", ".ico")
+# Below this, the .gz/.br saves less than a packet.
+PRECOMPRESS_MIN_SIZE = 512
+
+
+def _minifier(name):
+    if name.endswith(".css"):
+        return rcssmin.cssmin if rcssmin else None
+    if name.endswith(".js") and not name.endswith(".min.js"):
+        return rjsmin.jsmin if rjsmin else None
+    return None
+
+
+def compress_variants(content):
+    """
+    Returns:
+        dict: suffix -> compressed bytes, only for encodings that shrink
+        ``content``
+    """
+    variants = {".gz": gzip_bytes(content, 9)}
+    # Built once per deploy, so use the slowest, smallest settings.
+    if brotli is not None:
+        variants[".br"] = brotli.compress(content, quality=11)
+    return {suffix: data for suffix, data in variants.items() if len(data) < len(content)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also minifies, bundles and pre-compresses.
+
+    ``collectstatic`` then leaves, next to every hashed file, ``.gz`` (and
+    ``.br`` with the brotli package) copies for nginx's ``gzip_static`` /
+    ``brotli_static``. Bundles from STATIC_BUNDLES are built from the
+    collected sources before hashing, so they get hashed names too.
+    """
+
+    def stored_name(self, name):
+        # Without a manifest (development, tests) collectstatic hasn't run;
+        # serve the plain names instead of failing every {% static %}.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+
+        if getattr(settings, "STATICFILES_MINIFY", True):
+            self._minify(paths)
+        self._build_bundles(paths)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        self._precompress(self.hashed_files.values())
+
+    def _read(self, paths, name):
+        storage, path = paths[name]
+        with storage.open(path) as source:
+            return source.read()
+
+    def _minify(self, paths):
+        for name in list(paths):
+            minify = _minifier(name)
+            if minify is None:
+                continue
+            content = self._read(paths, name).decode()
+            self._replace(name, minify(content).encode())
+            # Hash and post-process the minified copy, not the source.
+            paths[name] = (self, name)
+
+    def _build_bundles(self, paths):
+        for bundle, sources in getattr(settings, "STATIC_BUNDLES", {}).items():
+            separator = b";\n" if bundle.endswith(".js") else b"\n"
+            content = separator.join(self._read(paths, source).strip() for source in sources)
+            self._replace(bundle, content + b"\n")
+            paths[bundle] = (self, bundle)
+
+    def _replace(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content))
+
+    def _precompress(self, names):
+        compressed = 0
+        for name in set(names):
+            if not name.endswith(PRECOMPRESS_EXTENSIONS) or not self.exists(name):
+                continue
+            with self.open(name) as source:
+                content = source.read()
+            if len(content) < PRECOMPRESS_MIN_SIZE:
+                continue
+            for suffix, data in compress_variants(content).items():
+                self._replace(f"{name}{suffix}", data)
+                compressed += 1
+        logger.info("Pre-compressed %d static file variants", compressed)
+
+
+def bundle_urls(bundle):
+    """
+    Returns:
+        list: the hashed bundle URL once collectstatic has built it,
+        otherwise the URLs of its source files
+    """
+    if bundle in getattr(staticfiles_storage, "hashed_files", ()):
+        return [staticfiles_storage.url(bundle)]
+    return [staticfiles_storage.url(source) for source in settings.STATIC_BUNDLES[bundle]]
@@ -0,0 +1,24 @@
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from django.template.backends.django import Template as BaseTemplate
+
+from core.services.request_metrics import timed
+
+
+class Template(BaseTemplate):
+    def render(self, context=None, request=None):
+        # Includes and extends render inside this call, so they are not
+        # counted twice.
+        with timed("template_time"):
+            return super().render(context, request)
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """
+    The standard Django backend, timing renders for RequestMetricsMiddleware.
+    """
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
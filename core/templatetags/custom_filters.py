@@ -1,4 +1,9 @@
 from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from core.staticfiles import bundle_urls
 
 register = template.Library()
 
@@ -13,3 +18,45 @@ def mul(value, arg):
         return f"{res:.2f}".rstrip('0').rstrip('.')
     except (ValueError, TypeError):
         return 0
+
+@register.filter
+def srcset(variants, fmt):
+    """
+    Build a ``srcset`` value from stored image variants (see core.services.images).
+    """
+    entries = (variants or {}).get(fmt) or {}
+    return ", ".join(
+        f"{default_storage.url(name)} {width}w"
+        for width, name in sorted(entries.items(), key=lambda item: int(item[0]))
+    )
+
+@register.simple_tag
+def picture(image, variants, sizes="100vw", **attrs):
+    """
+    Render ``image`` as a <picture> with WebP and JPEG variants when they exist.
+
+    Falls back to a plain <img> of the original upload until the variants
+    have been generated, and while the stored ones belong to a replaced image.
+    """
+    if (variants or {}).get("source") != image.name:
+        variants = None
+    webp = srcset(variants, "webp")
+    jpeg = srcset(variants, "jpeg")
+    attributes = flatatt({key: value for key, value in attrs.items() if value not in (None, "")})
+
+    if not webp:
+        return format_html('<img src="{}"{}>', image.url, attributes)
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        webp, sizes, image.url, jpeg, sizes, attributes,
+    )
+
+
+@register.simple_tag
+def static_bundle(name):
+    """
+    URLs to include for a STATIC_BUNDLES entry (see core.staticfiles).
+    """
+    return bundle_urls(name)
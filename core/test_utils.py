@@ -1,17 +1,30 @@
 """
 Test utilities and helper functions for Django testing.
 """
+import secrets
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, override_settings
 
-from cards.models import UserCard
+from cards.models import Portfolio, Service, Skill, UserCard
+from cards.services.snapshots import rebuild_card_snapshots
+from cards.services.view_counter import discard_pending_views
+from core.models import UserSubdomain
+from core.services.subdomain_filter import taken_subdomains
+from core.services.subdomain_resolver import subdomain_resolver
 from Billing.models import UserPlan, Template, Discount, Plan
+from shop.models import Product, UserShop
 
 User = get_user_model()
 
 
-@override_settings(SECURE_SSL_REDIRECT=False)
+@override_settings(SECURE_SSL_REDIRECT=False, CARD_VIEWS_FLUSH_INTERVAL=0)
 class XLinkTestCase(TestCase):
     """
     Base test case class with common test utilities for X-Link project.
@@ -20,6 +33,11 @@ class XLinkTestCase(TestCase):
     def setUp(self):
         """Set up common test data"""
         super().setUp()
+        cache.clear()
+        discard_pending_views()
+        self.addCleanup(discard_pending_views)
+        subdomain_resolver.clear()
+        taken_subdomains.reset()
         self.test_image = SimpleUploadedFile(
             "test.jpg",
             b"test_image_content",
@@ -106,6 +124,21 @@ class XLinkTestCase(TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect to login
         self.assertIn('/login', response['Location'])
 
+    def assert_within_query_budget(self, response):
+        """Assert the view declared a query budget and stayed within it"""
+        metrics = response.wsgi_request.request_metrics
+        self.assertIsNotNone(
+            metrics.query_budget,
+            f"{metrics.view_name} does not declare a query budget",
+        )
+        self.assertLessEqual(
+            metrics.queries,
+            metrics.query_budget,
+            f"{metrics.view_name} ran {metrics.queries} queries "
+            f"(budget {metrics.query_budget})",
+        )
+        return metrics
+
 
 def create_authenticated_client(user=None):
     """
@@ -194,3 +227,112 @@ def create_complete_user_card(user):
     )
 
     return user_card
+
+
+def seed_benchmark_data(users=100, items_per_card=3, products_per_shop=6, prefix="bench", password=None):
+    """
+    Bulk-create users with published cards, subdomains and one shop each.
+
+    Rows are inserted with ``bulk_create`` so large datasets seed in
+    seconds; model signals do not run, so the Free plan links, card
+    snapshots and shop product counts are created here and the subdomain
+    filter is reset afterwards. Every user logs in with ``password``,
+    random unless given. Used by ``benchmarks.endpoints`` and
+    ``manage.py populate_fake_data --users``.
+
+    Returns:
+        dict: ``usernames``, ``password``, ``shop_ids`` and the shared
+        ``template``
+    """
+    placeholder = default_storage.save(
+        f"{prefix}/placeholder.gif",
+        ContentFile(b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01"
+                    b"\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"),
+    )
+    free_plan, _ = UserPlan.objects.get_or_create(value="Free")
+    template, _ = Template.objects.get_or_create(
+        name=f"{prefix} template",
+        defaults={"image": placeholder, "delay": 0, "is_active": True},
+    )
+
+    password = password or secrets.token_urlsafe(12)
+    password_hash = make_password(password)
+    usernames = [f"{prefix}{index}" for index in range(users)]
+    created_users = User.objects.bulk_create(
+        [User(username=name, full_name=f"Bench User {name}", password=password_hash) for name in usernames],
+        batch_size=1000,
+    )
+    # SQLite and PostgreSQL return primary keys from bulk_create
+    user_ids = [user.pk for user in created_users]
+
+    User.plan.through.objects.bulk_create(
+        [User.plan.through(customuser_id=user_id, userplan_id=free_plan.id) for user_id in user_ids],
+        batch_size=1000,
+    )
+    UserSubdomain.objects.bulk_create(
+        [UserSubdomain(user_id=user_id, subdomain=name) for user_id, name in zip(user_ids, usernames)],
+        batch_size=1000,
+    )
+    cards = UserCard.objects.bulk_create(
+        [
+            UserCard(
+                user_id=user_id,
+                username=name,
+                name=f"Bench User {name}",
+                short_bio="Benchmark card",
+                template=template,
+                profile_picture=placeholder,
+                is_published=True,
+            )
+            for user_id, name in zip(user_ids, usernames)
+        ],
+        batch_size=1000,
+    )
+
+    children = range(items_per_card)
+    Skill.objects.bulk_create(
+        [Skill(user_card=card, name=f"Skill {index}") for card in cards for index in children],
+        batch_size=1000,
+    )
+    Service.objects.bulk_create(
+        [Service(user_card=card, title=f"Service {index}", description="Benchmark service")
+         for card in cards for index in children],
+        batch_size=1000,
+    )
+    Portfolio.objects.bulk_create(
+        [Portfolio(user_card=card, title=f"Project {index}", image=placeholder)
+         for card in cards for index in children],
+        batch_size=1000,
+    )
+
+    shops = UserShop.objects.bulk_create(
+        [UserShop(user_id=user_id, name=f"Shop {name}", logo=placeholder,
+                  active_product_count=products_per_shop)
+         for user_id, name in zip(user_ids, usernames)],
+        batch_size=1000,
+    )
+    Product.objects.bulk_create(
+        [
+            Product(
+                shop=shop,
+                name=f"Product {index}",
+                image=placeholder,
+                short_description="Benchmark product",
+                price=Decimal("100000"),
+                final_price=Decimal("100000"),
+            )
+            for shop in shops
+            for index in range(products_per_shop)
+        ],
+        batch_size=1000,
+    )
+
+    rebuild_card_snapshots(card.pk for card in cards)
+    taken_subdomains.reset()
+    subdomain_resolver.clear()
+    return {
+        "usernames": usernames,
+        "password": password,
+        "shop_ids": [shop.pk for shop in shops],
+        "template": template,
+    }
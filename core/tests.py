@@ -1,14 +1,46 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
 from datetime import timedelta
-from django.test import TestCase, Client
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from .models import CustomUser, OTP
-from cards.models import UserCard
+from .middleware import CompressionMiddleware
+from .models import CustomUser, OTP, OutboundMessage, UserSubdomain
+from cards.models import CardSnapshot, UserCard
+from cards.services.page_cache import invalidate_card_page
+from shop.models import Product, UserShop
 from Billing.models import UserPlan
-from .test_utils import XLinkTestCase
+from .services.cache_keys import SITE_CONTEXT_KEY
+from .staticfiles import bundle_urls
+from .services.compression import compress_level
+from .services.conditional import _git_head
+from .services.entitlements import get_entitlements
+from .services.otp import EXPIRED, INVALID, LOCKED, VALID, issue_otp, purge_expired_otps, send_otp, verify_otp
+from .services.outbound import deliver_due_messages, enqueue_sms, enqueue_telegram, purge_finished_messages
+from .services.plan_expiry import expire_plans, expired_plan_users
+from .services.template_catalog import get_template_catalog, template_catalog_memo
+from .services import subdomain_filter
+from .services.subdomain_filter import BloomFilter, taken_subdomains
+from .services.subdomains import check_subdomain_availability, subdomain_check_memo
+from .utils import send_sms
+from .test_utils import XLinkTestCase, seed_benchmark_data
 
 User = get_user_model()
 
@@ -127,6 +159,73 @@ class OTPModelTestCase(XLinkTestCase):
         self.assertTrue(otp.is_expired())
 
 
+class CachedOTPTestCase(XLinkTestCase):
+    """Test cases for cache-backed OTP issue and verification"""
+
+    phone = "09120000000"
+
+    def test_issue_and_verify_without_queries(self):
+        """Test the OTP hot path never queries the database"""
+        with self.assertNumQueries(0):
+            issued = issue_otp(self.phone)
+            self.assertTrue(issued.sent)
+            self.assertEqual(verify_otp(self.phone, "x"), INVALID)
+            self.assertEqual(verify_otp(self.phone, issued.code), VALID)
+
+        # Codes are single use
+        self.assertEqual(verify_otp(self.phone, issued.code), EXPIRED)
+
+    def test_code_is_stored_hashed(self):
+        """Test the raw code never reaches the cache"""
+        issued = issue_otp(self.phone)
+        self.assertNotIn(issued.code, str(cache.get(f"otp_code_{self.phone}")))
+
+    @override_settings(OTP_MAX_ATTEMPTS=2)
+    def test_code_locks_after_max_attempts(self):
+        """Test the code is discarded after too many wrong guesses"""
+        issued = issue_otp(self.phone)
+        wrong = "000000" if issued.code != "000000" else "111111"
+
+        self.assertEqual(verify_otp(self.phone, wrong), INVALID)
+        self.assertEqual(verify_otp(self.phone, wrong), INVALID)
+        self.assertEqual(verify_otp(self.phone, issued.code), LOCKED)
+        self.assertEqual(verify_otp(self.phone, issued.code), EXPIRED)
+
+    @override_settings(OTP_RESEND_COOLDOWN=60, OTP_MAX_SENDS=2)
+    def test_send_rate_limits(self):
+        """Test resend cooldown and per-window send limit"""
+        self.assertTrue(issue_otp(self.phone).sent)
+        self.assertEqual(issue_otp(self.phone).reason, "cooldown")
+
+        for _ in range(2):
+            cache.delete(f"otp_cooldown_{self.phone}")
+            issued = issue_otp(self.phone)
+        self.assertEqual(issued.reason, "rate_limited")
+
+    def test_send_otp_queues_sms(self):
+        """Test send_otp queues the code without returning it"""
+        issued = send_otp(self.phone)
+
+        self.assertTrue(issued.sent)
+        self.assertEqual(issued.code, "")
+        message = OutboundMessage.objects.get()
+        self.assertEqual(message.recipient, self.phone)
+        self.assertTrue(message.sensitive)
+
+    def test_purge_expired_rows(self):
+        """Test the purge removes only expired legacy OTP rows"""
+        user = User.objects.create_user(username="otpuser")
+        for minutes in (-10, -5, -1):
+            OTP.objects.create(user=user, code="123456", expires_at=timezone.now() + timedelta(minutes=minutes))
+        live = OTP.objects.create(user=user, code="123456", expires_at=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual(purge_expired_otps(batch_size=2), 3)
+        self.assertEqual(list(OTP.objects.values_list("id", flat=True)), [live.id])
+
+        out = io.StringIO()
+        call_command("purge_expired_otps", stdout=out)
+        self.assertIn("Removed 0", out.getvalue())
+
 class AuthenticationViewsTestCase(XLinkTestCase):
     """Test cases for authentication views"""
 
@@ -174,3 +273,724 @@ class AuthenticationViewsTestCase(XLinkTestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'core/dashboard.html')
+
+
+class SharedCacheTestCase(XLinkTestCase):
+    """Test cases for the cross-worker cache configuration"""
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared_cache = override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+                "KEY_PREFIX": "xlink",
+                "VERSION": 1,
+            }
+        })
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        super().setUp()
+
+    def test_site_context_invalidation_visible_across_workers(self):
+        """Test a delete from one worker evicts the entry for the others"""
+        self.client.get(reverse('login'))
+        other_worker = caches.create_connection("default")
+        self.assertIsNotNone(other_worker.get(SITE_CONTEXT_KEY))
+
+        other_worker.delete(SITE_CONTEXT_KEY)
+        self.assertIsNone(cache.get(SITE_CONTEXT_KEY))
+
+
+class SitemapTestCase(XLinkTestCase):
+    """Test cases for the sharded sitemap"""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        sitemap_settings = override_settings(SITEMAP_ROOT=root, SITEMAP_SHARD_SIZE=2)
+        sitemap_settings.enable()
+        self.addCleanup(sitemap_settings.disable)
+
+        self.cards = []
+        for index in range(3):
+            user = self.create_test_user(username=f"mapuser{index}")
+            self.cards.append(self.create_test_user_card(user=user, username=f"mapcard{index}"))
+
+    def _shard_content(self, card, **headers):
+        shard = card.id // 2
+        response = self.client.get(reverse('sitemap_cards', kwargs={'shard': shard}), **headers)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_index_lists_static_and_card_shards(self):
+        """Test the index links the static sitemap and each card shard"""
+        response = self.client.get(reverse('sitemap_xml'))
+        content = response.content.decode()
+
+        self.assertIn("<sitemapindex", content)
+        self.assertIn("/sitemap-static.xml", content)
+        shards = {card.id // 2 for card in self.cards}
+        for shard in shards:
+            self.assertIn(f"/sitemap-cards-{shard}.xml", content)
+
+    def test_shard_streams_its_cards(self):
+        """Test a shard contains only the cards in its id range"""
+        card = self.cards[-1]
+        response, content = self._shard_content(card)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f"/{card.username}/", content)
+        for other in self.cards:
+            if other.id // 2 != card.id // 2:
+                self.assertNotIn(f"/{other.username}/", content)
+
+    def test_prebuilt_shards_served_compressed(self):
+        """Test build_sitemaps output is served as stored gzip bytes"""
+        call_command("build_sitemaps", base_url="https://x-link.ir", stdout=io.StringIO())
+        card = self.cards[0]
+
+        response = self.client.get(
+            reverse('sitemap_cards', kwargs={'shard': card.id // 2}),
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertIn(f"https://x-link.ir/{card.username}/", content)
+
+        _response, plain = self._shard_content(card)
+        self.assertIn(f"https://x-link.ir/{card.username}/", plain)
+
+
+class SubdomainResolutionTestCase(XLinkTestCase):
+    """Test cases for cached subdomain -> card resolution"""
+
+    def _get(self, subdomain):
+        return self.client.get("/", HTTP_HOST=f"{subdomain}.{settings.BASE_DOMAIN}")
+
+    def test_unknown_subdomain_negatively_cached(self):
+        """Test repeated requests for an unknown subdomain skip the database"""
+        self.assertEqual(self._get("nobodyhere").status_code, 404)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get("nobodyhere").status_code, 404)
+
+    def test_new_card_clears_negative_entry(self):
+        """Test creating a card makes a negatively cached subdomain resolve"""
+        user = self.create_test_user(username="latecomer")
+        UserSubdomain.objects.create(user=user, subdomain="latecomer")
+        self.assertEqual(self._get("latecomer").status_code, 404)
+
+        self.create_test_user_card(user=user, username="latecomer")
+        self.assertEqual(self._get("latecomer").status_code, 200)
+
+    def test_deactivated_subdomain_stops_resolving(self):
+        """Test deactivating a subdomain evicts its cached card id"""
+        user = self.create_test_user(username="leaver")
+        subdomain = UserSubdomain.objects.create(user=user, subdomain="leaver")
+        self.create_test_user_card(user=user, username="leaver")
+        self.assertEqual(self._get("leaver").status_code, 200)
+
+        subdomain.is_active = False
+        subdomain.save()
+        self.assertEqual(self._get("leaver").status_code, 404)
+
+    def test_stale_positive_entry_is_not_served(self):
+        """Test a card id cached before another worker's change is re-checked"""
+        user = self.create_test_user(username="mover")
+        UserSubdomain.objects.create(user=user, subdomain="mover")
+        card = self.create_test_user_card(user=user, username="mover")
+        etag = self._get("mover")["ETag"]
+
+        # Another worker's change: no signal reaches this process's resolver
+        UserSubdomain.objects.filter(user=user).update(subdomain="moved")
+        CardSnapshot.objects.filter(card=card).update(subdomain="moved")
+        invalidate_card_page(card.id)
+
+        self.assertEqual(self._get("mover").status_code, 404)
+        response = self.client.get("/", HTTP_HOST=f"mover.{settings.BASE_DOMAIN}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_subdomain_card_loads_one_snapshot_row(self):
+        """Test a subdomain page reads the snapshot by subdomain, not the card join"""
+        user = self.create_test_user(username="direct")
+        UserSubdomain.objects.create(user=user, subdomain="direct")
+        self.create_test_user_card(user=user, username="direct")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._get("direct").status_code, 200)
+
+        lookups = [q["sql"] for q in queries if "UPDATE" not in q["sql"] and "INSERT" not in q["sql"]]
+        self.assertFalse(any("core_usersubdomain" in sql for sql in lookups))
+        self.assertEqual(sum("cards_cardsnapshot" in sql for sql in lookups), 2)
+
+
+class SubdomainAvailabilityTestCase(XLinkTestCase):
+    """Test cases for the subdomain availability fast paths"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user(username="owner")
+        UserSubdomain.objects.create(user=self.user, subdomain="taken-name")
+
+    def _check(self, name):
+        response = self.client.get(reverse('check_subdomain'), {"name": name})
+        return response.json()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test every added name is reported as possibly present"""
+        bloom = BloomFilter(capacity=100)
+        names = [f"name-{index}" for index in range(100)]
+        for name in names:
+            bloom.add(name)
+        self.assertTrue(all(bloom.might_contain(name) for name in names))
+
+    def test_free_name_answered_without_query(self):
+        """Test a name missing from the filter needs no database query"""
+        self._check("warmup")
+
+        with self.assertNumQueries(0):
+            result = self._check("brand-new")
+        self.assertEqual(result, {"available": True, "reason": "ok"})
+
+    def test_taken_name_confirmed_against_database(self):
+        """Test names in the filter are still reported as taken"""
+        self.assertEqual(self._check("taken-name")["reason"], "taken")
+
+        other = self.create_test_user(username="other")
+        UserSubdomain.objects.create(user=other, subdomain="fresh-name")
+        self.assertEqual(self._check("fresh-name")["reason"], "taken")
+
+    @override_settings(SUBDOMAIN_FILTER_BUILD_IN_BACKGROUND=True)
+    def test_build_does_not_block_the_request(self):
+        """Test a missing filter is built in a thread while the check hits the database"""
+        with mock.patch.object(subdomain_filter.threading, "Thread") as thread:
+            with self.assertNumQueries(1):
+                self.assertEqual(self._check("brand-new"), {"available": True, "reason": "ok"})
+            self._check("other-name")
+
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+    def test_names_added_during_build_are_kept(self):
+        """Test a name registered while the filter is rebuilt survives the swap"""
+        real_bloom = subdomain_filter.BloomFilter
+
+        def bloom_with_signup(capacity):
+            # Another request registers a name while the rows are read
+            taken_subdomains.add("late-name")
+            return real_bloom(capacity)
+
+        with mock.patch.object(subdomain_filter, "BloomFilter", side_effect=bloom_with_signup):
+            taken_subdomains.warm()
+
+        self.assertTrue(taken_subdomains.might_be_taken("late-name"))
+
+    def test_memo_reuses_lookup_within_request(self):
+        """Test repeated checks of one name in a request share a query"""
+        with subdomain_check_memo():
+            with self.assertNumQueries(1):
+                check_subdomain_availability("taken-name")
+                check_subdomain_availability("taken-name")
+                result = check_subdomain_availability("taken-name", user=self.user)
+        self.assertTrue(result.available)
+
+
+class PlanExpiryTestCase(XLinkTestCase):
+    """Test cases for the set-based plan expiry run by check_user_plans"""
+
+    def setUp(self):
+        super().setUp()
+        self.free_plan = UserPlan.objects.get(value="Free")
+        self.pro_plan = self.create_test_user_plan("Pro")
+        self.expired_at = timezone.now() - timedelta(days=1)
+
+    def _pro_user(self, username, expires_at):
+        user = self.create_test_user(username=username)
+        user.plan.set([self.pro_plan])
+        CustomUser.objects.filter(pk=user.pk).update(plan_expires_at=expires_at)
+        return user
+
+    def test_expired_users_moved_to_free_plan(self):
+        """Test expired users lose paid plans and premium card options in batches"""
+        expired = [self._pro_user(f"expired{index}", self.expired_at) for index in range(5)]
+        active = self._pro_user("active", timezone.now() + timedelta(days=10))
+        card = self.create_test_user_card(
+            user=expired[0], black_background=True, blue_tick=True, color="blue",
+        )
+        untouched_card = self.create_test_user_card(user=expired[1], username="plaincard")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = expire_plans(chunk_size=2)
+
+        self.assertEqual((result.users, result.cards, result.chunks), (5, 1, 3))
+        for user in expired:
+            user.refresh_from_db()
+            self.assertIsNone(user.plan_expires_at)
+            self.assertEqual(user.get_active_plans(), ["Free"])
+        self.assertEqual(active.get_active_plans(), ["Pro"])
+
+        card.refresh_from_db()
+        self.assertEqual(
+            (card.black_background, card.blue_tick, card.color),
+            (False, False, "default"),
+        )
+        self.assertEqual(UserCard.objects.get(pk=untouched_card.pk).updated_at, untouched_card.updated_at)
+
+    def test_expiry_query_count_independent_of_users(self):
+        """Test one batch costs a fixed number of queries"""
+        for index in range(20):
+            self._pro_user(f"expired{index}", self.expired_at)
+
+        with self.assertNumQueries(8):
+            expire_plans(chunk_size=100)
+
+    def test_command_reports_counts(self):
+        """Test check_user_plans summarises the batch run"""
+        self._pro_user("expired", self.expired_at)
+        out = io.StringIO()
+
+        call_command("check_user_plans", "--dry-run", stdout=out)
+        self.assertIn("Would process 1 users", out.getvalue())
+
+        call_command("check_user_plans", stdout=out)
+        self.assertIn("Successfully processed 1 users", out.getvalue())
+        self.assertFalse(expired_plan_users().exists())
+
+
+class EntitlementsTestCase(XLinkTestCase):
+    """Test cases for cached per-user plan entitlements"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.pro_plan = self.create_test_user_plan("Pro")
+
+    def _fresh_user(self):
+        return CustomUser.objects.get(pk=self.user.pk)
+
+    def test_free_user_limits(self):
+        """Test limits derived from the Free plan"""
+        entitlements = get_entitlements(self.user)
+        self.assertEqual(entitlements.plans, ("Free",))
+        self.assertEqual(entitlements.product_limit, 5)
+        self.assertEqual(entitlements.shop_limit, 1)
+        self.assertFalse(entitlements.can_use_color("blue"))
+        self.assertTrue(entitlements.can_use_color("default"))
+
+    def test_cached_across_requests(self):
+        """Test entitlements are read from the cache on later requests"""
+        get_entitlements(self._fresh_user())
+
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_plan("Free"))
+            self.assertFalse(user.has_plan("Pro"))
+            self.assertEqual(user.get_active_plans(), ["Free"])
+
+    def test_plan_change_invalidates(self):
+        """Test adding or removing plans refreshes entitlements"""
+        self.assertFalse(self.user.has_plan("Pro"))
+
+        self.user.plan.add(self.pro_plan)
+        self.assertTrue(self.user.has_plan("Pro"))
+        self.assertEqual(get_entitlements(self._fresh_user()).product_limit, 30)
+
+        self.pro_plan.customuser_set.clear()
+        self.assertFalse(self._fresh_user().has_plan("Pro"))
+
+    def test_expiry_change_invalidates(self):
+        """Test saving plan_expires_at drops the cached entitlements"""
+        get_entitlements(self.user)
+        self.user.plan_expires_at = timezone.now() + timedelta(days=30)
+        self.user.save()
+
+        user = self._fresh_user()
+        with self.assertNumQueries(1):
+            get_entitlements(user)
+
+    def test_dashboard_reads_plans_once(self):
+        """Test a logged-in page makes at most one entitlement query"""
+        self.login_user(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard'))
+        plan_queries = [q for q in queries.captured_queries if "core_customuser_plan" in q["sql"]]
+        self.assertLessEqual(len(plan_queries), 1)
+
+
+class TemplateCatalogTestCase(XLinkTestCase):
+    """Test cases for the cached template access matrix"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.pro_plan = self.create_test_user_plan("Pro")
+        self.open_template = self.create_test_template(name="Open")
+        self.pro_template = self.create_test_template(name="Pro Only")
+        self.pro_template.allowed_plans.add(self.pro_plan)
+
+    def test_allowed_ids_by_plan_set(self):
+        """Test restricted templates are unlocked only by their plans"""
+        catalog = get_template_catalog()
+        free_ids = {plan.id for plan in UserPlan.objects.filter(value="Free")}
+
+        self.assertEqual(catalog.allowed_ids(free_ids), {self.open_template.id})
+        self.assertEqual(
+            catalog.allowed_ids(free_ids | {self.pro_plan.id}),
+            {self.open_template.id, self.pro_template.id},
+        )
+        self.assertEqual(catalog.get(self.pro_template.id).allowed_plan_labels, ("پرمیوم",))
+
+    def test_reads_are_query_free(self):
+        """Test template checks hit the cache, not the database"""
+        get_template_catalog()
+        get_entitlements(self.user)
+
+        with self.assertNumQueries(0):
+            self.assertFalse(get_entitlements(self.user).can_use_template(self.pro_template))
+            self.assertEqual(self.pro_template.get_allowed_plan_values(), ["Pro"])
+            self.assertTrue(self.open_template.is_allowed_for_plan("Free"))
+
+    def test_memo_fetches_catalog_once(self):
+        """Test per-row template checks in one request share a single cache read"""
+        get_template_catalog()
+
+        with template_catalog_memo(), mock.patch.object(cache, 'get', wraps=cache.get) as cache_get:
+            for template in (self.open_template, self.pro_template) * 3:
+                template.get_allowed_plan_values()
+
+        self.assertEqual(cache_get.call_count, 1)
+
+    def test_rebuilt_on_allowed_plan_change(self):
+        """Test changing a template's plans refreshes the catalog"""
+        get_template_catalog()
+        basic_plan = self.create_test_user_plan("Basic")
+        self.open_template.allowed_plans.add(basic_plan)
+
+        self.assertEqual(get_template_catalog().get(self.open_template.id).allowed_plan_values, ("Basic",))
+        self.assertFalse(self.open_template.is_allowed_for_plan("Free"))
+
+    def test_builder_locks_restricted_templates(self):
+        """Test the card builder disables templates outside the user's plans"""
+        self.login_user(self.user)
+        response = self.client.get(reverse('card_builder'))
+
+        self.assertContains(response, f'value="{self.pro_template.id}"')
+        self.assertContains(response, '<div class="template-lock-overlay">', count=1)
+
+
+class StaticPipelineTestCase(XLinkTestCase):
+    """Test cases for the hashed, bundled and pre-compressed static build"""
+
+    def setUp(self):
+        super().setUp()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root, ignore_errors=True)
+
+    def test_collectstatic_builds_hashed_compressed_bundle(self):
+        """Test collectstatic hashes the bundle and writes a .gz copy"""
+        with override_settings(STATIC_ROOT=self.static_root):
+            call_command("collectstatic", interactive=False, verbosity=0)
+
+            with open(f"{self.static_root}/staticfiles.json") as manifest:
+                bundle = json.load(manifest)["paths"]["site.bundle.js"]
+            self.assertRegex(bundle, r"^site\.bundle\.[0-9a-f]{12}\.js$")
+            self.assertEqual(bundle_urls("site.bundle.js"), [f"{settings.STATIC_URL}{bundle}"])
+
+        with open(f"{self.static_root}/{bundle}", "rb") as bundled:
+            content = bundled.read()
+        with open(f"{self.static_root}/{bundle}.gz", "rb") as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), content)
+        self.assertIn(b"initializePricingToggle", content)
+
+    def test_sources_served_before_collectstatic(self):
+        """Test pages fall back to the unhashed source files without a manifest"""
+        with override_settings(STATIC_ROOT=self.static_root):
+            urls = bundle_urls("site.bundle.js")
+
+        self.assertEqual(urls, [f"{settings.STATIC_URL}{name}" for name in settings.STATIC_BUNDLES["site.bundle.js"]])
+
+    def test_release_reads_packed_refs(self):
+        """Test the git HEAD is found when its branch ref is only in packed-refs"""
+        git_dir = f"{self.static_root}/.git"
+        os.makedirs(git_dir)
+        with open(f"{git_dir}/HEAD", "w") as head:
+            head.write("ref: refs/heads/main\n")
+        with open(f"{git_dir}/packed-refs", "w") as packed:
+            packed.write("# pack-refs with: peeled fully-peeled sorted\nabc123 refs/heads/main\n")
+
+        with override_settings(BASE_DIR=self.static_root):
+            self.assertEqual(_git_head(), "abc123")
+
+
+class CompressionMiddlewareTestCase(XLinkTestCase):
+    """Test cases for per-view response compression"""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.body = b"<html>" + b"x-link " * 200 + b"</html>"
+
+    def _compress(self, view):
+        middleware = CompressionMiddleware(lambda request: view(request))
+        request = self.factory.get("/", HTTP_ACCEPT_ENCODING="gzip")
+        middleware.process_view(request, view, (), {})
+        return middleware.process_response(request, view(request))
+
+    def test_dynamic_response_gzipped_with_weak_etag(self):
+        """Test uncached responses are gzipped and their ETag weakened"""
+        def view(request):
+            response = HttpResponse(self.body)
+            response["ETag"] = '"abc"'
+            return response
+
+        response = self._compress(view)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_compress_level_zero_skips_view(self):
+        """Test compress_level(0) leaves a view's responses uncompressed"""
+        @compress_level(0)
+        def view(request):
+            return HttpResponse(self.body)
+
+        response = self._compress(view)
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.body)
+
+
+class DashboardQueryBudgetTestCase(XLinkTestCase):
+    """Test cases keeping the dashboard within its query budget"""
+
+    def test_dashboard_budget(self):
+        """Test the dashboard does not query per shop or product"""
+        user = self.create_test_user()
+        self.create_test_user_card(user=user)
+        for index in range(3):
+            shop = UserShop.objects.create(user=user, name=f"Shop {index}", logo=self.test_image)
+            for product_index in range(3):
+                Product.objects.create(
+                    shop=shop,
+                    name=f"Product {product_index}",
+                    image=self.test_image,
+                    short_description="Product",
+                    price=1000,
+                )
+
+        self.login_user(user)
+        self.assert_within_query_budget(self.client.get(reverse('dashboard')))
+
+
+class BenchmarkSeedTestCase(XLinkTestCase):
+    """Test cases for the benchmark data factory"""
+
+    def test_seed_creates_servable_cards(self):
+        """Test seeded users own a card, subdomain, shop and the Free plan"""
+        seeded = seed_benchmark_data(users=3, items_per_card=2, products_per_shop=2)
+
+        self.assertEqual(len(seeded['usernames']), 3)
+        self.assertEqual(UserCard.objects.filter(username__in=seeded['usernames']).count(), 3)
+        self.assertEqual(UserSubdomain.objects.filter(subdomain__in=seeded['usernames']).count(), 3)
+        self.assertEqual(Product.objects.filter(shop_id__in=seeded['shop_ids']).count(), 6)
+
+        user = User.objects.get(username=seeded['usernames'][0])
+        self.assertTrue(user.has_plan('Free'))
+        self.assertTrue(self.client.login(username=user.username, password=seeded['password']))
+
+        response = self.client.get(reverse('view_card', kwargs={'username': user.username}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_seeded_passwords_are_random(self):
+        """Test each seeding run gets its own password"""
+        first = seed_benchmark_data(users=1, prefix="one")
+        second = seed_benchmark_data(users=1, prefix="two")
+        self.assertNotEqual(first['password'], second['password'])
+
+    def test_populate_refuses_users_without_debug(self):
+        """Test benchmark users are never seeded into a production database"""
+        with self.assertRaises(CommandError):
+            call_command("populate_fake_data", users=1, stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username__startswith="bench").exists())
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    """Records posted forms and answers with the server's queued responses"""
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+        self.server.received.append((self.path, form))
+        status, payload = self.server.responses.pop(0) if self.server.responses else self.server.default
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboundQueueTestCase(XLinkTestCase):
+    """Test cases for the outbound SMS and Telegram queue"""
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubProviderHandler)
+        self.server.received = []
+        self.server.responses = []
+        self.server.default = (200, {'ok': True, 'RetStatus': 1, 'StrRetStatus': 'Ok'})
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        overrides = override_settings(
+            SMS_API_URL=f'{base_url}/sms',
+            TELEGRAM_API_URL=base_url,
+            TELEGRAM_BOT_TOKEN='token',
+            TELEGRAM_ADMIN_CHAT_IDS=['100'],
+            MELIPAYAMAK_USERNAME='user',
+            MELIPAYAMAK_APIKEY='key',
+            MELIPAYAMAK_NUMBER='3000',
+            OUTBOUND_MAX_ATTEMPTS=2,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_send_sms_only_enqueues(self):
+        """Test send_sms queues the message instead of calling the provider"""
+        self.assertTrue(send_sms('09120000000', 'Your code is 1234'))
+
+        message = OutboundMessage.objects.get()
+        self.assertEqual(message.status, OutboundMessage.Status.PENDING)
+        self.assertEqual(self.server.received, [])
+
+    def test_worker_delivers_sms(self):
+        """Test the worker posts queued SMS to the provider"""
+        enqueue_sms('09120000000', 'Your code is 1234')
+
+        result = deliver_due_messages()
+
+        self.assertEqual(result.sent, 1)
+        path, form = self.server.received[0]
+        self.assertEqual(path, '/sms')
+        self.assertEqual(form['to'], '09120000000')
+        self.assertEqual(form['text'], 'Your code is 1234')
+        message = OutboundMessage.objects.get()
+        self.assertEqual(message.status, OutboundMessage.Status.SENT)
+        self.assertEqual(message.attempts, 1)
+
+    def test_telegram_messages_are_batched(self):
+        """Test messages to one chat go out in a single sendMessage call"""
+        for index in range(3):
+            enqueue_telegram(f'event {index}')
+
+        result = deliver_due_messages()
+
+        self.assertEqual(result.sent, 3)
+        self.assertEqual(len(self.server.received), 1)
+        path, form = self.server.received[0]
+        self.assertEqual(path, '/bottoken/sendMessage')
+        self.assertEqual(form['chat_id'], '100')
+        self.assertEqual(form['text'], 'event 0\n\nevent 1\n\nevent 2')
+
+    def test_long_telegram_batches_are_split(self):
+        """Test batches respect Telegram's message length limit"""
+        enqueue_telegram('a' * 3000)
+        enqueue_telegram('b' * 3000)
+
+        deliver_due_messages()
+
+        self.assertEqual(len(self.server.received), 2)
+
+    def test_failed_delivery_backs_off_then_gives_up(self):
+        """Test failures are retried later and dropped after the last attempt"""
+        self.server.responses = [(500, {'ok': False})]
+        enqueue_sms('09120000000', 'Your code is 1234')
+
+        result = deliver_due_messages()
+
+        self.assertEqual(result.retried, 1)
+        message = OutboundMessage.objects.get()
+        self.assertEqual(message.status, OutboundMessage.Status.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertIn('HTTP 500', message.last_error)
+
+        # Not due yet
+        self.assertFalse(deliver_due_messages())
+
+        self.server.responses = [(200, {'RetStatus': 0, 'StrRetStatus': 'InvalidData'})]
+        OutboundMessage.objects.update(next_attempt_at=timezone.now())
+        result = deliver_due_messages()
+
+        self.assertEqual(result.failed, 1)
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboundMessage.Status.FAILED)
+        self.assertIn('InvalidData', message.last_error)
+
+    def test_sensitive_bodies_are_blanked(self):
+        """Test OTP bodies are cleared once delivered or given up on"""
+        delivered = enqueue_sms('09120000000', 'Your code is 1234', sensitive=True)
+        deliver_due_messages()
+        delivered.refresh_from_db()
+        self.assertEqual(delivered.body, '')
+
+        self.server.default = (500, {'ok': False})
+        failed = enqueue_sms('09120000001', 'Your code is 5678', sensitive=True)
+        for _attempt in range(2):
+            OutboundMessage.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+            deliver_due_messages()
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, OutboundMessage.Status.FAILED)
+        self.assertEqual(failed.body, '')
+
+    def test_purge_removes_old_sent_and_failed_messages(self):
+        """Test delivered and failed rows past the retention are deleted"""
+        old = timezone.now() - timedelta(days=30)
+        sent = enqueue_sms('09120000000', 'sent')
+        failed = enqueue_sms('09120000001', 'failed')
+        pending = enqueue_sms('09120000002', 'pending')
+        OutboundMessage.objects.filter(pk=sent.pk).update(status=OutboundMessage.Status.SENT, sent_at=old)
+        OutboundMessage.objects.filter(pk=failed.pk).update(status=OutboundMessage.Status.FAILED, next_attempt_at=old)
+
+        self.assertEqual(purge_finished_messages(), 2)
+        self.assertEqual(list(OutboundMessage.objects.values_list('pk', flat=True)), [pending.pk])
+
+    def test_worker_command_drains_queue(self):
+        """Test send_outbound_messages --once delivers everything due"""
+        enqueue_sms('09120000000', 'one')
+        enqueue_sms('09120000001', 'two')
+
+        call_command('send_outbound_messages', once=True, batch_size=1, stdout=io.StringIO())
+
+        self.assertEqual(OutboundMessage.objects.filter(status=OutboundMessage.Status.SENT).count(), 2)
+
+    @override_settings(OUTBOUND_PURGE_INTERVAL=0)
+    def test_worker_purges_while_polling(self):
+        """Test the running worker keeps purging finished rows, not only at startup"""
+        polls = []
+
+        def sleep(seconds):
+            if polls:
+                raise KeyboardInterrupt
+            polls.append(seconds)
+            # A message given up on long ago shows up after startup
+            message = enqueue_sms('09120000000', 'late')
+            OutboundMessage.objects.filter(pk=message.pk).update(
+                status=OutboundMessage.Status.FAILED,
+                next_attempt_at=timezone.now() - timedelta(days=30),
+            )
+
+        with mock.patch('core.management.commands.send_outbound_messages.time') as clock:
+            clock.monotonic.return_value = 0
+            clock.sleep.side_effect = sleep
+            call_command('send_outbound_messages', stdout=io.StringIO())
+
+        self.assertFalse(OutboundMessage.objects.exists())
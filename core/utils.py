@@ -1,16 +1,13 @@
 import logging
-from melipayamak import Api
-from environs import Env
-# Logger setup
-logger = logging.getLogger(__name__)
+from datetime import datetime
 
-# Env setup
-env = Env()
-env.read_env()
+from django.conf import settings
 
+from core.services.outbound import enqueue_sms, enqueue_telegram
+
+# Logger setup
+logger = logging.getLogger(__name__)
 
-import requests
-from datetime import datetime
 
 def get_client_ip(request):
     """
@@ -26,46 +23,24 @@ def get_client_ip(request):
 
 def send_telegram_notification(message: str):
     """
-    Send notification to Telegram admin channel
+    Queue a notification for the Telegram admin chats
     """
-    token = env("TELEGRAM_BOT_TOKEN")
-    chat_id = env("TELEGRAM_ADMIN_CHAT_IDS")
-    
-    if not token or not chat_id:
+    if not settings.TELEGRAM_BOT_TOKEN or not settings.TELEGRAM_ADMIN_CHAT_IDS:
         return
-    
+
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     formatted_message = f"🔔 **اعلان سیستم**\n\n{message}\n\n🕒 زمان: `{timestamp}`"
-    
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    try:
-        requests.post(url, data={
-            "chat_id": chat_id,
-            "text": formatted_message,
-            "parse_mode": "Markdown"
-        }, timeout=5)
-    except Exception as e:
-        logger.error("Telegram notification failed: %s", e)
+    enqueue_telegram(formatted_message)
 
 
-def send_sms(phone: str, content: str) -> bool:
+def send_sms(phone: str, content: str, sensitive: bool = False) -> bool:
     """
-    Send OTP SMS via Melipayamak
+    Queue an SMS for delivery via Melipayamak; pass ``sensitive`` for OTPs
     """
     try:
-        username = env("MELIPAYAMAK_USERNAME")
-        password = env("MELIPAYAMAK_APIKEY")
-        sender = env("MELIPAYAMAK_NUMBER")
-
-        api = Api(username, password)
-        sms = api.sms()
-
-
-        sms.send(phone, sender, content)
+        enqueue_sms(phone, content, sensitive=sensitive)
         return True
 
     except Exception as e:
-        logger.error("SMS send failed for %s: %s", phone, e)
+        logger.error("SMS enqueue failed for %s: %s", phone, e)
         return False
-
-
@@ -1,22 +1,19 @@
 import logging
-from datetime import timedelta
 
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
-from django.utils.crypto import get_random_string
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.decorators.http import require_GET, require_POST
-from environs import Env
-from melipayamak import Api
 
 from cards.models import UserCard
 from core.models import CustomUser
 from core.serializers import SubdomainAvailabilitySerializer
+from core.services.entitlements import get_entitlements
+from core.services.request_metrics import query_budget
 from core.services.subdomains import assign_subdomain_to_user, check_subdomain_availability
 from shop.models import UserShop
 from .forms import UserLoginForm, UserSignupForm
@@ -108,6 +105,7 @@ def logout_view(request):
 
 
 @login_required
+@query_budget(8)
 def dashboard_view(request):
     user_card = UserCard.objects.filter(user=request.user).first()
     user_shops = list(UserShop.objects.filter(user=request.user).prefetch_related("products"))
@@ -118,11 +116,8 @@ def dashboard_view(request):
         scheme = "https" if request.is_secure() else "http"
         card_url = f"{scheme}://{user_subdomain.subdomain}.{request.get_host()}"
 
-    user_plans = set(request.user.plan.values_list("value", flat=True))
-    has_basic_plan = "Basic" in user_plans
-    has_pro_plan = "Pro" in user_plans
-    has_free_plan = "Free" in user_plans
-    can_create_more_shops = has_basic_plan or has_pro_plan or len(user_shops) == 0
+    entitlements = get_entitlements(request.user)
+    can_create_more_shops = entitlements.shop_limit is None or len(user_shops) < entitlements.shop_limit
 
     context = {
         "user_card": user_card,
@@ -130,9 +125,9 @@ def dashboard_view(request):
         "card_url": card_url,
         "user_subdomain_name": user_subdomain.subdomain if user_subdomain else "",
         "can_create_more_shops": can_create_more_shops,
-        "has_basic_plan": has_basic_plan,
-        "has_pro_plan": has_pro_plan,
-        "has_free_plan": has_free_plan,
+        "has_basic_plan": entitlements.has_basic_plan,
+        "has_pro_plan": entitlements.has_pro_plan,
+        "has_free_plan": entitlements.has_free_plan,
     }
 
     return render(request, "core/dashboard.html", context)
@@ -142,5 +137,6 @@ def dashboard_view(request):
 def check_subdomain_view(request):
     name = request.GET.get("name", "")
     user = request.user if request.user.is_authenticated else None
-    result = check_subdomain_availability(name, user=user)
+    # Advisory check on every keystroke; signup re-checks against the database.
+    result = check_subdomain_availability(name, user=user, allow_stale=True)
     return JsonResponse(SubdomainAvailabilitySerializer.serialize(result))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usershop',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
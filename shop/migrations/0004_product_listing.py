@@ -0,0 +1,38 @@
+# Generated by Django 5.2.9 on 2026-10-18 01:57
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_active_products(apps, schema_editor):
+    UserShop = apps.get_model('shop', 'UserShop')
+    Product = apps.get_model('shop', 'Product')
+    active = (
+        Product.objects.filter(shop=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('shop')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    UserShop.objects.update(active_product_count=Coalesce(Subquery(active), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_usershop_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usershop',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['shop', 'is_active', '-created_at', '-id'], name='shop_product_listing_idx'),
+        ),
+        migrations.RunPython(count_active_products, migrations.RunPython.noop),
+    ]
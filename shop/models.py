@@ -13,8 +13,13 @@ class UserShop(models.Model):
     )
     name = models.CharField(max_length=120)
     logo = models.ImageField(upload_to="shops/logos/")
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also bumped on product changes; versions the shop page fragments.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by shop.signals on product changes; read by the public listing.
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
@@ -31,6 +36,7 @@ class Product(models.Model):
     )
     name = models.CharField(max_length=150)
     image = models.ImageField(upload_to="shops/products/")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     short_description = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=12, decimal_places=2)
     discount_percent = models.PositiveSmallIntegerField(
@@ -44,6 +50,13 @@ class Product(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination of a shop's public listing (shop.services.listing)
+            models.Index(
+                fields=["shop", "is_active", "-created_at", "-id"],
+                name="shop_product_listing_idx",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         price = self.price or Decimal("0")
@@ -0,0 +1 @@
+# Services package for public shop listing logic.
@@ -0,0 +1,133 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signing import BadSignature, Signer
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.services.request_metrics import record_cache_lookup
+from shop.models import Product
+
+
+LISTING_KEY_PREFIX = "shop_products"
+
+# Newest first; id breaks ties between products created in the same instant.
+LISTING_ORDER = ("-created_at", "-id")
+
+
+@dataclass(frozen=True)
+class ProductPage:
+    products: list
+    # Identifies this page within the shop; used in cache and fragment keys.
+    key: str
+    next_cursor: str = None
+    previous_cursor: str = None
+
+
+def active_product_count():
+    """
+    Returns:
+        Expression: active products of the outer UserShop row, for ``update()``
+    """
+    active = (
+        Product.objects.filter(shop=OuterRef("pk"), is_active=True)
+        .order_by()
+        .values("shop")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    return Coalesce(Subquery(active), Value(0))
+
+
+# Cursors are signed so only positions this site handed out reach the
+# page cache; a client can't fill it with made-up ones.
+_cursor_signer = Signer(salt="shop.listing.cursor")
+
+
+def encode_cursor(product):
+    raw = f"{product.created_at.isoformat()}|{product.pk}".encode()
+    return _cursor_signer.sign(base64.urlsafe_b64encode(raw).decode().rstrip("="))
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple or None: ``(created_at, id)``, or None for a missing,
+        unsigned or malformed cursor
+    """
+    if not cursor:
+        return None
+    try:
+        cursor = _cursor_signer.unsign(cursor)
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (BadSignature, ValueError, UnicodeDecodeError):
+        return None
+
+
+def _per_page():
+    return getattr(settings, "SHOP_PRODUCTS_PER_PAGE", 9)
+
+
+def _fetch_page(shop_id, after, before, per_page):
+    products = Product.objects.filter(shop_id=shop_id, is_active=True)
+
+    if before is not None:
+        created_at, pk = before
+        rows = list(
+            products
+            .filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by("created_at", "id")[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return rows, bool(rows), has_previous
+
+    if after is not None:
+        created_at, pk = after
+        products = products.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    rows = list(products.order_by(*LISTING_ORDER)[:per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return rows, has_next, after is not None and bool(rows)
+
+
+def get_product_page(shop, after=None, before=None):
+    """
+    Return one page of a shop's active products using keyset pagination.
+
+    ``after`` and ``before`` are cursors from a previous page; each page is
+    one range scan of ``shop_product_listing_idx`` however deep it is.
+    Pages are cached under the shop's ``updated_at``, which every product
+    change bumps, so stale pages are never served and need no eviction.
+
+    Returns:
+        ProductPage
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before is not None:
+        position = f"before:{before[0].isoformat()}:{before[1]}"
+    elif after is not None:
+        position = f"after:{after[0].isoformat()}:{after[1]}"
+    else:
+        position = "first"
+
+    version = int(shop.updated_at.timestamp() * 1_000_000)
+    key = f"{LISTING_KEY_PREFIX}:{shop.pk}:{version}:{position}"
+    page = record_cache_lookup(cache.get(key))
+    if page is not None:
+        return page
+
+    rows, has_next, has_previous = _fetch_page(shop.pk, after, before, _per_page())
+    page = ProductPage(
+        products=rows,
+        key=position,
+        next_cursor=encode_cursor(rows[-1]) if has_next else None,
+        previous_cursor=encode_cursor(rows[0]) if has_previous else None,
+    )
+    cache.set(key, page, getattr(settings, "SHOP_LISTING_CACHE_TIMEOUT", 60 * 60 * 24))
+    return page
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Product, UserShop
+from .services.listing import active_product_count
+
+
+@receiver([post_save, post_delete], sender=Product)
+def touch_shop_on_product_change(sender, instance, **kwargs):
+    # Template fragments and cached listing pages are keyed by the shop's
+    # updated_at; the count is recomputed in the same statement.
+    UserShop.objects.filter(id=instance.shop_id).update(
+        updated_at=timezone.now(),
+        active_product_count=active_product_count(),
+    )
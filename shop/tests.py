@@ -1,9 +1,14 @@
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from core.test_utils import XLinkTestCase
+
 from .models import Product, UserShop
+from .services.listing import get_product_page
 
 
 class ShopModelTests(TestCase):
@@ -70,3 +75,123 @@ class ShopViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Visible Product")
         self.assertNotContains(response, "Hidden Product")
+
+
+    def test_product_changes_refresh_cached_listing(self):
+        self.client.get(reverse("shop_view", args=[self.shop.id]))
+        Product.objects.create(
+            shop=self.shop,
+            name="New Product",
+            image=SimpleUploadedFile("p3.png", b"img", content_type="image/png"),
+            short_description="New",
+            price=1000,
+        )
+
+        response = self.client.get(reverse("shop_view", args=[self.shop.id]))
+        self.assertContains(response, "New Product")
+
+
+class ShopQueryBudgetTests(XLinkTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.shop = UserShop.objects.create(user=self.user, name="Budget Shop", logo=self.test_image)
+        for index in range(12):
+            Product.objects.create(
+                shop=self.shop,
+                name=f"Product {index}",
+                image=self.test_image,
+                short_description="Product",
+                price=1000,
+            )
+
+    def test_shop_view_budget(self):
+        response = self.client.get(reverse("shop_view", args=[self.shop.id]))
+        self.assert_within_query_budget(response)
+
+    def test_manage_shop_budget(self):
+        self.login_user(self.user)
+        response = self.client.get(reverse("shop_manage", args=[self.shop.id]))
+        self.assert_within_query_budget(response)
+
+
+class ShopListingTests(XLinkTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_test_user()
+        self.shop = UserShop.objects.create(user=self.user, name="Listing Shop", logo=self.test_image)
+        self.products = [
+            Product.objects.create(
+                shop=self.shop,
+                name=f"Item {index:02d}",
+                image=self.test_image,
+                short_description="Product",
+                price=1000,
+            )
+            for index in range(12)
+        ]
+        self.shop.refresh_from_db()
+
+    def test_keyset_pages_walk_forward_and_back(self):
+        first = get_product_page(self.shop)
+        self.assertEqual(len(first.products), 9)
+        self.assertIsNone(first.previous_cursor)
+
+        second = get_product_page(self.shop, after=first.next_cursor)
+        self.assertEqual(len(second.products), 3)
+        self.assertIsNone(second.next_cursor)
+        seen = [product.pk for product in first.products + second.products]
+        self.assertEqual(sorted(seen), sorted(product.pk for product in self.products))
+
+        back = get_product_page(self.shop, before=second.previous_cursor)
+        self.assertEqual([p.pk for p in back.products], [p.pk for p in first.products])
+        self.assertIsNone(back.previous_cursor)
+
+    def test_malformed_cursor_returns_first_page(self):
+        page = get_product_page(self.shop, after="not-a-cursor")
+        self.assertEqual(page.key, "first")
+
+    def test_unsigned_cursor_returns_first_page(self):
+        signed = get_product_page(self.shop).next_cursor
+        unsigned, _, signature = signed.rpartition(":")
+        self.assertEqual(get_product_page(self.shop, after=unsigned).key, "first")
+        self.assertEqual(get_product_page(self.shop, after=f"{unsigned}:{signature[::-1]}").key, "first")
+
+    def test_pages_cached_until_products_change(self):
+        url = reverse("shop_view", args=[self.shop.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q for q in queries if "shop_product" in q["sql"]])
+
+        Product.objects.filter(pk=self.products[-1].pk).get().delete()
+        self.assertNotContains(self.client.get(url), "Item 11")
+
+    def test_active_product_count_maintained(self):
+        self.assertEqual(self.shop.active_product_count, 12)
+
+        product = self.products[0]
+        product.is_active = False
+        product.save()
+        self.products[1].delete()
+
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.active_product_count, 10)
+
+
+    def test_revalidation_returns_304_from_shop_timestamp(self):
+        url = reverse("shop_view", args=[self.shop.id])
+        first = self.client.get(url)
+        self.assertIn("no-cache", first["Cache-Control"])
+
+        with self.assertNumQueries(1):
+            revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+
+        next_page = self.client.get(url, {"after": "x"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(next_page.status_code, 200)
+
+        self.products[0].delete()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
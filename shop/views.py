@@ -1,13 +1,24 @@
-﻿from django.contrib import messages
+﻿from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.forms import inlineformset_factory
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
 
+from core.services.conditional import (
+    get_site_token,
+    is_conditional,
+    not_modified_response,
+    release_token,
+    set_version_headers,
+    version_etag,
+)
+from core.services.entitlements import get_entitlements
+from core.services.request_metrics import query_budget
 from core.services.subdomains import assign_subdomain_to_user, check_subdomain_availability
 from .forms import ProductForm, UserShopForm
 from .models import Product, UserShop
+from .services.listing import get_product_page
 
 
 ProductInlineFormSet = inlineformset_factory(
@@ -19,41 +30,54 @@ ProductInlineFormSet = inlineformset_factory(
 )
 
 
-def _get_product_limit_for_user(user):
-    plans = set(user.plan.values_list("value", flat=True))
-    if "Pro" in plans:
-        return 30
-    if "Basic" in plans:
-        return 15
-    return 5
+def _shop_etag(shop_id, updated_at, after, before):
+    # Product writes bump the shop's updated_at (shop.signals); the release
+    # and site tokens cover templates, static names and the site logo.
+    return version_etag(
+        "shop", shop_id, updated_at.isoformat(), after or "", before or "", release_token(), get_site_token()
+    )
 
 
+@query_budget(5)
 def shop_view(request, shop_id):
+    after = request.GET.get("after")
+    before = request.GET.get("before")
+
+    if is_conditional(request):
+        # Revalidate from the shop's timestamp alone before loading anything.
+        updated_at = (
+            UserShop.objects.filter(id=shop_id, is_active=True)
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        if updated_at is not None:
+            response = not_modified_response(request, _shop_etag(shop_id, updated_at, after, before))
+            if response is not None:
+                return response
+
     shop = get_object_or_404(UserShop.objects.select_related("user"), id=shop_id, is_active=True)
-    products_qs = shop.products.filter(is_active=True).order_by("-created_at")
-    paginator = Paginator(products_qs, 9)
-    page_obj = paginator.get_page(request.GET.get("page"))
+    page = get_product_page(shop, after=after, before=before)
 
-    return render(
+    response = render(
         request,
         "shop/shop_view.html",
         {
             "shop": shop,
-            "products": page_obj.object_list,
-            "page_obj": page_obj,
+            "products": page.products,
+            "page": page,
+            "fragment_timeout": settings.FRAGMENT_CACHE_TIMEOUT,
         },
     )
+    return set_version_headers(response, _shop_etag(shop.id, shop.updated_at, after, before))
 
 
 @login_required
 @require_POST
 def create_shop_view(request):
-    user_plan_values = set(request.user.plan.values_list("value", flat=True))
-    has_paid_plan = "Basic" in user_plan_values or "Pro" in user_plan_values
-    shop_count = UserShop.objects.filter(user=request.user).count()
+    shop_limit = get_entitlements(request.user).shop_limit
 
     # Free users can create only one shop. More shops require Basic/Pro.
-    if shop_count >= 1 and not has_paid_plan:
+    if shop_limit is not None and UserShop.objects.filter(user=request.user).count() >= shop_limit:
         messages.error(
             request,
             "پلن رایگان فقط اجازه ساخت یک سایت فروشگاهی را دارد. برای سایت بیشتر پلن پایه یا پرو تهیه کنید.",
@@ -88,13 +112,14 @@ def create_shop_view(request):
 
 
 @login_required
+@query_budget(8)
 def manage_shop_view(request, shop_id):
     shop = get_object_or_404(
         UserShop.objects.prefetch_related("products"),
         id=shop_id,
         user=request.user,
     )
-    product_limit = _get_product_limit_for_user(request.user)
+    product_limit = get_entitlements(request.user).product_limit
 
     if request.method == "POST":
         requested_subdomain = (request.POST.get("subdomain") or "").strip().lower()
@@ -1,6 +1,8 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.core.files.uploadedfile import SimpleUploadedFile
 from .models import SiteContext, Customer, Banners
+from core.services.cache_keys import SITE_CONTEXT_KEY
 from core.test_utils import XLinkTestCase
 
 class SiteContextModelTestCase(XLinkTestCase):
@@ -63,3 +65,28 @@ class BannersModelTestCase(XLinkTestCase):
         )
         self.assertEqual(banner.title, "Banner Title")
         self.assertEqual(str(banner), "Banner Title")
+
+
+class SiteContextCacheTestCase(XLinkTestCase):
+    """Test cases for site context cache invalidation"""
+
+    def test_banner_change_evicts_site_context(self):
+        """Test creating a banner evicts the cached site context"""
+        cache.set(SITE_CONTEXT_KEY, {"banners": []})
+        Banners.objects.create(title="New", description="Banner")
+        self.assertIsNone(cache.get(SITE_CONTEXT_KEY))
+
+    def test_site_context_change_evicts_site_context(self):
+        """Test saving the site context evicts the cached copy"""
+        context = SiteContext.objects.create(
+            site_name="X-Link",
+            logo=SimpleUploadedFile("logo.png", b"logo_content", content_type="image/png"),
+            hero_section_text_part1="Part 1",
+            hero_section_text_part2="Part 2",
+            hero_section_text_description="Desc",
+            footer_section_text_part1="Footer"
+        )
+        cache.set(SITE_CONTEXT_KEY, {"site_context": context})
+        context.site_name = "Renamed"
+        context.save()
+        self.assertIsNone(cache.get(SITE_CONTEXT_KEY))